@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+嵌入并发与重试基准测试 - 通过本地 OpenAI 兼容替身服务 (embedding_stub_server.py) 压测
+
+不访问网络、不产生费用: 在进程内启动替身服务 (或用 --base-url 指向已运行的服务)，
+对每种批处理方式/并发数/批大小组合运行 FileIndexer.generate_embeddings，报告吞吐量 (文本/秒)、请求数、
+相对固定批大小节省的往返次数、重试次数、失败文本数、每批延迟 p50/p99 和服务端观察到的最大并发与状态码；最后把向量写入临时集合，
+测量 SemanticSearchEngine.search (vector 模式，查询缓存关闭) 的延迟。替身的延迟和错误注入由种子决定，结果可重复。
+进程内的替身与客户端共用 GIL，高并发测试时建议单独启动 embedding_stub_server.py 并使用 --base-url。
+
+用法:
+    python benchmarks/bench_embedding_stub.py --files 20000 --concurrency 1,4,8,16 --latency lognormal:150,0.3
+    python benchmarks/bench_embedding_stub.py --error-429 0.05 --error-500 0.02 --retry-after 0.2 --json stub.json
+    python benchmarks/bench_embedding_stub.py --tpm 600000 --batch-size 100,500   # 测试限速下的表现
+    python benchmarks/bench_embedding_stub.py --batching fixed,adaptive --ms-per-1k-tokens 20
+    python benchmarks/bench_embedding_stub.py --base-url http://127.0.0.1:8766/v1 --concurrency 8,16,32
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+import metrics
+from embedding_providers import create_embedding_provider
+from embedding_stub_server import EmbeddingStubServer, add_stub_arguments, stub_from_args
+from file_indexer import FileIndexer
+from sharded_search import ShardedSearchEngine
+from bench_vectors import load_corpus, make_queries, percentile
+
+
+def parse_list(text: str):
+    return [int(value) for value in text.split(',') if value.strip()]
+
+
+def run_embed(files, batching: str, concurrency: int, batch_size: int, server) -> tuple:
+    """One generate_embeddings run; returns (result row, embeddings_data)"""
+    Config.EMBEDDING_BATCHING = batching
+    Config.EMBEDDING_CONCURRENCY = concurrency
+    Config.EMBEDDING_BATCH_SIZE = batch_size
+    metrics.REGISTRY.reset()
+    if server:
+        server.stub.reset_stats()
+
+    indexer = FileIndexer(create_embedding_provider(Config))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        embeddings_data = indexer.generate_embeddings(files, verbose=False)
+    elapsed = time.perf_counter() - start
+
+    batch = metrics.EMBED_BATCH_SECONDS.summary(outcome='ok')
+    dispatcher = indexer.dispatcher.stats()
+    result = {
+        'batching': batching,
+        'concurrency': concurrency,
+        'batch_size': batch_size,
+        'seconds': elapsed,
+        'texts_per_second': len(embeddings_data) / elapsed if elapsed else 0.0,
+        'embedded': len(embeddings_data),
+        'failed': len(indexer.last_failures),
+        'requests': int(metrics.EMBED_REQUESTS.total()),
+        'batches': dispatcher['batches'],
+        'round_trips_saved': dispatcher['round_trips_saved'],
+        'final_batch_size': dispatcher['batch_size'],
+        'retries': int(metrics.EMBED_RETRIES.total()),
+        'batch_p50_ms': batch['p50'] * 1000,
+        'batch_p99_ms': batch['p99'] * 1000,
+        'server': server.stub.stats() if server else None
+    }
+    return result, embeddings_data
+
+
+def run_search(embeddings_data, queries, db_path: str) -> dict:
+    """Vector-mode search latency with every query embedded by the stand-in"""
+    Config.CHROMA_DB_PATH = db_path
+    provider = create_embedding_provider(Config)
+    with contextlib.redirect_stdout(sys.stderr):
+        engine = ShardedSearchEngine(provider)
+        shard = engine.shard_for_root(os.path.abspath('synthetic'))
+        shard.apply_incremental_update(embeddings_data, [], [], save_state=False)
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            engine.search(query, mode='vector')
+            samples.append(time.perf_counter() - start)
+    return {
+        'queries': len(samples),
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通过本地替身服务压测嵌入并发、重试和搜索")
+    parser.add_argument('--files', type=int, default=10000, help="合成文件名数量")
+    parser.add_argument('--directory', help="使用真实目录的文件名")
+    parser.add_argument('--concurrency', default='1,4,8', help="逗号分隔的 EMBEDDING_CONCURRENCY 取值")
+    parser.add_argument('--batching', default='fixed,adaptive', help="逗号分隔的 EMBEDDING_BATCHING 取值")
+    parser.add_argument('--batch-size', default='100', help="逗号分隔的 EMBEDDING_BATCH_SIZE 取值 (adaptive 的起始值)")
+    parser.add_argument('--queries', type=int, default=200, help="搜索阶段的查询数 (0 跳过)")
+    parser.add_argument('--model', default=Config.EMBEDDING_MODEL)
+    parser.add_argument('--dimensions', type=int, default=None, help="请求的向量维度 (默认模型原生维度)")
+    parser.add_argument('--client-rpm', type=int, default=None, help="客户端 EMBEDDING_REQUESTS_PER_MINUTE (默认不限)")
+    parser.add_argument('--client-tpm', type=int, default=None, help="客户端 EMBEDDING_TOKENS_PER_MINUTE (默认不限)")
+    parser.add_argument('--retry-base-delay', type=float, default=0.1, help="EMBEDDING_RETRY_BASE_DELAY (秒)")
+    parser.add_argument('--base-url', help="使用已运行的替身服务，而不是在进程内启动")
+    parser.add_argument('--json', help="把结果写入 JSON 文件")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if not args.base_url:
+        server = EmbeddingStubServer(stub_from_args(args)).start()
+    base_url = args.base_url or server.base_url
+
+    Config.EMBEDDING_PROVIDER = 'openai'
+    Config.OPENAI_BASE_URL = base_url
+    Config.EMBEDDING_MODEL = args.model
+    Config.EMBEDDING_DIMENSIONS = args.dimensions
+    Config.EMBEDDING_CACHE_ENABLED = False
+    Config.QUERY_CACHE_ENABLED = False
+    Config.EMBEDDING_REQUESTS_PER_MINUTE = args.client_rpm
+    Config.EMBEDDING_TOKENS_PER_MINUTE = args.client_tpm
+    Config.EMBEDDING_RETRY_BASE_DELAY = args.retry_base_delay
+    Config.VECTOR_STORE = 'numpy'
+
+    indexer = FileIndexer(create_embedding_provider(Config))
+    files = load_corpus(indexer, args.directory, args.files)
+    print(f"替身服务: {base_url}, {len(files)} 个文件, 延迟 {args.latency}, "
+          f"429 {args.error_429:.0%}, 500 {args.error_500:.0%}")
+    print(f"\n{'批处理':>8} {'并发':>4} {'批大小':>6} {'文本/秒':>9} {'请求':>6} {'节省往返':>8} {'重试':>6} "
+          f"{'失败':>6} {'批p50 ms':>9} {'批p99 ms':>9} {'服务端并发':>10}")
+
+    results = []
+    embeddings_data = []
+    try:
+        for batching in [value.strip() for value in args.batching.split(',') if value.strip()]:
+            for batch_size in parse_list(args.batch_size):
+                for concurrency in parse_list(args.concurrency):
+                    result, embeddings_data = run_embed(files, batching, concurrency, batch_size, server)
+                    results.append(result)
+                    server_concurrency = result['server']['max_in_flight'] if result['server'] else '-'
+                    print(f"{batching:>8} {concurrency:>4} {batch_size:>6} {result['texts_per_second']:>9.0f} "
+                          f"{result['requests']:>6} {result['round_trips_saved']:>8} {result['retries']:>6} "
+                          f"{result['failed']:>6} {result['batch_p50_ms']:>9.1f} {result['batch_p99_ms']:>9.1f} "
+                          f"{server_concurrency:>10}")
+
+        search = None
+        if args.queries and embeddings_data:
+            db_path = tempfile.mkdtemp(prefix='semantic_stub_')
+            try:
+                queries = make_queries(indexer, files, args.queries)
+                search = run_search(embeddings_data, queries, db_path)
+            finally:
+                shutil.rmtree(db_path, ignore_errors=True)
+            print(f"\n搜索 (vector, 每个查询经替身服务嵌入): {search['queries']} 次, "
+                  f"p50 {search['p50_ms']:.1f} ms / p99 {search['p99_ms']:.1f} ms")
+    finally:
+        if server:
+            server.stop()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'files': len(files), 'embedding': results, 'search': search},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
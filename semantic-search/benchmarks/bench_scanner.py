@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+文件扫描基准测试 - 对比原 Path.rglob 实现与 os.scandir 并行扫描器
+
+用法:
+    python benchmarks/bench_scanner.py --files 50000
+    python benchmarks/bench_scanner.py --root \\\\server\\share\\Project   # 测试真实目录（如 SMB 共享）
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from fast_scanner import scan_tree
+from synthetic_tree import create_synthetic_tree
+
+
+def legacy_discover(root_path: str, extensions) -> int:
+    """The original FileIndexer.discover_files scanning loop (rglob + is_file + 2x stat)"""
+    count = 0
+    for file_path in Path(root_path).rglob('*'):
+        if file_path.is_file():
+            file_ext = file_path.suffix.lower()
+            if not extensions or file_ext in extensions:
+                _ = (str(file_path.absolute()), file_path.stat().st_size, file_path.stat().st_mtime)
+                count += 1
+    return count
+
+
+def scandir_discover(root_path: str, extensions, workers: int) -> int:
+    return sum(1 for _ in scan_tree(root_path, extensions=extensions, max_workers=workers))
+
+
+def best_of(repeats: int, fn, *args):
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="扫描器基准测试")
+    parser.add_argument('--files', type=int, default=20000, help="合成目录树的文件数")
+    parser.add_argument('--root', help="使用已有目录代替合成目录树")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16], help="并行扫描线程数")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    extensions = Config.INDEXED_EXTENSIONS
+    temp_dir = None
+    root = args.root
+    if not root:
+        temp_dir = tempfile.mkdtemp(prefix='scan_bench_')
+        root = temp_dir
+        print(f"生成合成目录树: {args.files} 个文件 -> {root}")
+        create_synthetic_tree(root, args.files)
+
+    try:
+        legacy_time, legacy_count = best_of(args.repeats, legacy_discover, root, extensions)
+        print(f"\n{'实现':<24}{'文件数':>10}{'耗时(秒)':>12}{'文件/秒':>14}{'加速比':>10}")
+        print(f"{'Path.rglob (原实现)':<24}{legacy_count:>10}{legacy_time:>12.3f}{legacy_count / legacy_time:>14.0f}{1.0:>10.2f}")
+
+        for workers in args.workers:
+            elapsed, count = best_of(args.repeats, scandir_discover, root, extensions, workers)
+            label = f"scandir x{workers}"
+            print(f"{label:<24}{count:>10}{elapsed:>12.3f}{count / elapsed:>14.0f}{legacy_time / elapsed:>10.2f}")
+            if count != legacy_count:
+                print(f"    警告: 文件数不一致 ({count} != {legacy_count})")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+启动性能基准测试 - 测量冷启动各阶段耗时 (每次都是新进程)
+
+测量项:
+    import main          导入耗时，以及 python -X importtime 中最慢的模块
+    --help               参数解析即退出
+    首个提示符           交互模式从启动到显示主菜单 "请选择"
+    首个结果 (交互)      启动后立即搜索，直到结果列表显示
+    首个结果 (命令行)    search 命令: 精确文件名 (本地索引快速路径) 与语义查询
+
+用法:
+    python benchmarks/bench_startup.py --files 5000 --runs 5
+    python benchmarks/bench_startup.py --json startup.json   # 保存结果，便于不同提交间对比
+"""
+
+import os
+import sys
+import json
+import time
+import select
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+MAIN = os.path.join(APP_DIR, 'main.py')
+
+sys.path.insert(0, APP_DIR)
+
+from config import Config
+from synthetic_tree import create_synthetic_tree
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def bench_env() -> dict:
+    env = dict(os.environ)
+    env['EMBEDDING_PROVIDER'] = 'local'
+    env['PYTHONUNBUFFERED'] = '1'
+    env['PYTHONPATH'] = APP_DIR
+    return env
+
+
+def timed_run(args, workspace: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=workspace, env=bench_env(),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def slowest_imports(workspace: str, count: int = 8):
+    """Direct imports of main ordered by cumulative time (microseconds)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=workspace,
+                            env=bench_env(), capture_output=True, text=True, check=True)
+    imports, children = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Depth is encoded as indentation (top level at 1, their imports at 3) and
+        # children are listed before their parent; skip site's, keep main's
+        depth = len(name) - len(name.lstrip())
+        if depth == 3:
+            children.append((name.strip(), int(cumulative)))
+        elif depth == 1:
+            if name.strip() == 'main':
+                imports = children + [('main (合计)', int(cumulative))]
+            children = []
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return imports[:count]
+
+
+class _Interactive:
+    """Drives the interactive menu over pipes, recording when markers appear on stdout"""
+
+    def __init__(self, workspace: str):
+        self.start = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, MAIN], cwd=workspace, env=bench_env(),
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL)
+        self.output = b''
+
+    def wait_for(self, marker: str, timeout: float = 120.0) -> float:
+        expected = marker.encode('utf-8')
+        deadline = time.monotonic() + timeout
+        fd = self.process.stdout.fileno()
+        while expected not in self.output:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"等待 {marker!r} 超时")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    raise RuntimeError(f"进程在输出 {marker!r} 之前退出")
+                self.output += chunk
+        # Later markers are searched for in new output only
+        self.output = self.output[self.output.index(expected) + len(expected):]
+        return time.perf_counter() - self.start
+
+    def send(self, line: str):
+        self.process.stdin.write((line + '\n').encode('utf-8'))
+        self.process.stdin.flush()
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+
+
+def interactive_run(workspace: str, query: str):
+    """Returns (time to first prompt, time to first result) for one cold start"""
+    session = _Interactive(workspace)
+    try:
+        first_prompt = session.wait_for('请选择')
+        session.send('2')
+        session.wait_for('搜索:')
+        session.send(query)
+        first_result = session.wait_for('选择:')
+        return first_prompt, first_result
+    finally:
+        session.close()
+
+
+def summarize(samples):
+    return {
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动性能基准测试")
+    parser.add_argument('--files', type=int, default=5000, help="合成文件数")
+    parser.add_argument('--runs', type=int, default=5, help="每项测量的冷启动次数")
+    parser.add_argument('--exact-query', default=None, help="精确文件名查询 (默认取索引中的第一个文件)")
+    parser.add_argument('--semantic-query', default='stone wall texture', help="语义查询")
+    parser.add_argument('--json', dest='json_path', help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix='semantic_startup_')
+    try:
+        tree = os.path.join(workspace, 'tree')
+        print(f"生成 {args.files} 个合成文件并建立索引 (本地嵌入)...")
+        create_synthetic_tree(tree, args.files)
+        subprocess.run([sys.executable, MAIN, 'index', tree], cwd=workspace, env=bench_env(),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+        exact_query = args.exact_query
+        if exact_query is None:
+            extensions = set(Config.INDEXED_EXTENSIONS)
+            for _, _, names in os.walk(tree):
+                indexed = sorted(name for name in names if os.path.splitext(name)[1].lower() in extensions)
+                if indexed:
+                    exact_query = os.path.splitext(indexed[0])[0]
+                    break
+
+        measurements = {
+            'import main': lambda: timed_run(['-c', 'import main'], workspace),
+            '--help': lambda: timed_run([MAIN, '--help'], workspace),
+            'stats': lambda: timed_run([MAIN, 'stats'], workspace),
+            f'search (精确: {exact_query})': lambda: timed_run([MAIN, 'search', exact_query], workspace),
+            f'search (语义: {args.semantic_query})': lambda: timed_run([MAIN, 'search', args.semantic_query],
+                                                                    workspace),
+        }
+        results = {}
+        for label, measure in measurements.items():
+            measure()  # warm the OS file cache
+            results[label] = summarize([measure() for _ in range(args.runs)])
+
+        prompts, first_results = [], []
+        for _ in range(args.runs):
+            prompt_time, result_time = interactive_run(workspace, args.semantic_query)
+            prompts.append(prompt_time)
+            first_results.append(result_time)
+        results['交互: 首个提示符'] = summarize(prompts)
+        results['交互: 首个结果'] = summarize(first_results)
+
+        imports = slowest_imports(workspace)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    print(f"\n{'测量项':<40}{'平均(ms)':>10}{'p50(ms)':>10}{'最慢(ms)':>10}")
+    for label, summary in results.items():
+        print(f"{label:<40}{summary['mean_ms']:>10.1f}{summary['p50_ms']:>10.1f}{summary['max_ms']:>10.1f}")
+
+    print("\nimport main 中最慢的直接导入 (-X importtime, 累计):")
+    for name, cumulative in imports:
+        print(f"  {name:<30}{cumulative / 1000:>8.1f} ms")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': args.files, 'runs': args.runs, 'python': sys.version.split()[0],
+                       'results': results, 'imports_us': dict(imports)}, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
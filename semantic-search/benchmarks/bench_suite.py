@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+索引与搜索全流程基准测试 - 在 1 万 / 10 万 / 100 万文件的合成目录树上测量每个阶段
+
+每个规模在独立的子进程中运行 (峰值内存互不影响)，使用确定性的本地嵌入器 (local，无需 API)，
+嵌入缓存与查询缓存关闭。阶段:
+    generate         生成合成目录树 (Unreal 风格命名与目录深度，使用 --workdir 时可复用)
+    discover         FileIndexer.discover_files 扫描目录
+    searchable_text  FileIndexer.create_searchable_text
+    embed            FileIndexer.generate_embeddings (按 --chunk-size 分批，与流式索引相同)
+    index            写入向量存储 (apply_incremental_update) 并保存索引清单和本地索引
+    reopen           新进程状态下打开引擎并完成第一个语义查询
+    search_*         各检索方式的查询延迟 p50/p95/p99 (hybrid、vector、lexical、带过滤条件、输入提示)
+
+每个阶段报告耗时、吞吐量 (条/秒) 和阶段内的峰值 RSS。结果写入 JSON (含提交号)，
+用 --compare 与另一次的结果逐项对比。
+
+用法:
+    python benchmarks/bench_suite.py                                  # 10k,100k
+    python benchmarks/bench_suite.py --sizes 10k,100k,1m --workdir D:/bench --json suite.json
+    python benchmarks/bench_suite.py --sizes 10k --store numpy --json numpy.json --compare suite.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+import subprocess
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, APP_DIR)
+
+SUITE_VERSION = 1
+SEARCH_MODES = ('hybrid', 'vector', 'lexical')
+
+
+def parse_size(text: str) -> int:
+    """10k -> 10000, 1m -> 1000000"""
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, None when it can't be read"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def process_peak_rss() -> Optional[int]:
+    """High-water RSS of the whole process in bytes"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    except ImportError:
+        return None
+
+
+def git_revision() -> Dict:
+    """Commit of the measured tree, and whether it had uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--', '.'], cwd=APP_DIR, capture_output=True,
+                                    text=True, check=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+class StageRecorder:
+    """Times stages and samples RSS in the background, attributing each sample to the running stage"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stages: Dict[str, Dict] = {}
+        self._stage: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+        self._thread.start()
+
+    def _observe(self):
+        rss = current_rss()
+        with self._lock:
+            if rss is not None and self._stage is not None:
+                entry = self.stages[self._stage]
+                entry['peak_rss_bytes'] = max(entry['peak_rss_bytes'] or 0, rss)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._observe()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, items: Optional[int] = None):
+        """Time one (possibly repeated) stage; seconds and items accumulate across repeats"""
+        with self._lock:
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'items': 0, 'peak_rss_bytes': None})
+            self._stage = name
+        self._observe()
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            elapsed = time.perf_counter() - start
+            self._observe()
+            with self._lock:
+                entry['seconds'] += elapsed
+                entry['items'] += items or 0
+                self._stage = None
+
+    def report(self) -> Dict:
+        self._stop.set()
+        self._thread.join()
+        for entry in self.stages.values():
+            entry['items_per_second'] = entry['items'] / entry['seconds'] if entry['seconds'] > 0 else 0.0
+        return self.stages
+
+
+def latency_summary(samples: List[float]) -> Dict:
+    return {
+        'queries': len(samples),
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p95_ms': percentile(samples, 0.95) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000
+    }
+
+
+def ensure_tree(workdir: str, file_count: int, seed: int, recorder: StageRecorder) -> str:
+    """Synthetic tree for this size, reused when a previous run completed it"""
+    from synthetic_tree import create_synthetic_tree
+
+    root = os.path.join(workdir, f'tree-{file_count}-seed{seed}')
+    marker = os.path.join(root, '.complete')
+    if not os.path.exists(marker):
+        with recorder.stage('generate', file_count):
+            create_synthetic_tree(root, file_count, seed)
+        open(marker, 'w').close()
+    return root
+
+
+def run_size(file_count: int, args) -> Dict:
+    """Every stage for one tree size; runs in its own process"""
+    from config import Config
+    from embedding_providers import create_embedding_provider
+    from file_indexer import FileIndexer
+    from sharded_search import ShardedSearchEngine
+    from bench_vectors import make_queries
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='semantic_suite_')
+    db_path = os.path.join(workdir, f'db-{file_count}-{args.store}')
+    shutil.rmtree(db_path, ignore_errors=True)
+
+    Config.EMBEDDING_PROVIDER = 'local'
+    Config.LOCAL_EMBEDDING_DIMENSIONS = args.dimensions
+    Config.VECTOR_STORE = args.store
+    Config.CHROMA_DB_PATH = db_path
+    Config.EMBEDDING_CACHE_ENABLED = False
+    Config.QUERY_CACHE_ENABLED = False
+
+    recorder = StageRecorder()
+    try:
+        root = ensure_tree(workdir, file_count, args.seed, recorder)
+        provider = create_embedding_provider(Config)
+        indexer = FileIndexer(provider)
+
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            with recorder.stage('discover') as entry:
+                files = indexer.discover_files(root)
+            entry['items'] = len(files)
+
+            with recorder.stage('searchable_text', len(files)):
+                for file_info in files:
+                    indexer.create_searchable_text(file_info)
+
+            engine = ShardedSearchEngine(provider)
+            shard = engine.shard_for_root(root)
+            for start in range(0, len(files), args.chunk_size):
+                chunk = files[start:start + args.chunk_size]
+                with recorder.stage('embed', len(chunk)):
+                    embeddings_data = indexer.generate_embeddings(chunk, verbose=False)
+                with recorder.stage('index', len(embeddings_data)):
+                    shard.apply_incremental_update(embeddings_data, [], [], save_state=False)
+                del embeddings_data
+            with recorder.stage('index'):
+                shard.save_state()
+            del engine, shard
+
+            queries = make_queries(indexer, files, args.queries, seed=args.seed)
+            prefixes = [query.split()[0][:3] for query in queries]
+            del files
+
+            with recorder.stage('reopen', 1):
+                engine = ShardedSearchEngine(provider)
+                engine.search(queries[0], mode='vector')
+
+            search_latency = {}
+            workloads = [(mode, [(query, mode) for query in queries]) for mode in SEARCH_MODES]
+            workloads.append(('filtered', [(f"{query} ext:tga", 'hybrid') for query in queries]))
+            for name, workload in workloads:
+                samples = []
+                with recorder.stage(f'search_{name}', len(workload)):
+                    for query, mode in workload:
+                        start = time.perf_counter()
+                        engine.search(query, mode=mode)
+                        samples.append(time.perf_counter() - start)
+                search_latency[name] = latency_summary(samples)
+
+            samples = []
+            with recorder.stage('search_suggest', len(prefixes)):
+                for prefix in prefixes:
+                    start = time.perf_counter()
+                    engine.suggest(prefix)
+                    samples.append(time.perf_counter() - start)
+            search_latency['suggest'] = latency_summary(samples)
+
+        stages = recorder.report()
+        disk_bytes = sum(os.path.getsize(os.path.join(parent, name))
+                         for parent, _, names in os.walk(db_path) for name in names)
+        return {
+            'files': file_count,
+            'indexed': stages['index']['items'],
+            'stages': stages,
+            'search': search_latency,
+            'index_disk_bytes': disk_bytes,
+            'peak_rss_bytes': process_peak_rss()
+        }
+    finally:
+        if args.workdir:
+            shutil.rmtree(db_path, ignore_errors=True)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_size_in_subprocess(file_count: int, argv: List[str]) -> Dict:
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--single', str(file_count)] + argv,
+                               capture_output=True, text=True, encoding='utf-8')
+    if completed.returncode != 0:
+        raise RuntimeError(f"{file_count} 个文件的测试失败:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _mb(value: Optional[int]) -> str:
+    return f"{value / 1024 ** 2:.0f}" if value else '-'
+
+
+def print_result(result: Dict):
+    print(f"\n{result['files']} 个文件 (索引 {result['indexed']} 个), 索引大小 {_mb(result['index_disk_bytes'])} MB, "
+          f"进程峰值 RSS {_mb(result['peak_rss_bytes'])} MB")
+    print(f"  {'阶段':<18}{'耗时(s)':>10}{'条/秒':>12}{'峰值RSS(MB)':>13}")
+    for name, stage in result['stages'].items():
+        if name.startswith('search_'):
+            continue
+        print(f"  {name:<18}{stage['seconds']:>10.2f}{stage['items_per_second']:>12.0f}"
+              f"{_mb(stage['peak_rss_bytes']):>13}")
+    print(f"  {'查询':<18}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for name, latency in result['search'].items():
+        print(f"  {name:<18}{latency['p50_ms']:>10.2f}{latency['p95_ms']:>10.2f}{latency['p99_ms']:>10.2f}")
+
+
+def compare(results: List[Dict], settings: Dict, baseline: Dict):
+    """Throughput and latency ratios against an earlier results file (>1 is better)"""
+    previous = {result['files']: result for result in baseline.get('results', [])}
+    label = baseline.get('revision', {}).get('commit') or '基准'
+    changed = {name: (baseline.get('settings', {}).get(name), value) for name, value in settings.items()
+               if baseline.get('settings', {}).get(name) != value}
+    if changed:
+        print("\n注意: 测试设置不同 " + ', '.join(f"{name}: {old} -> {new}" for name, (old, new) in changed.items()))
+    for result in results:
+        old = previous.get(result['files'])
+        if not old:
+            continue
+        print(f"\n{result['files']} 个文件 对比 {label} (>1 表示更快)")
+        for name, stage in result['stages'].items():
+            before = old['stages'].get(name)
+            if before and before['items_per_second'] and not name.startswith('search_'):
+                print(f"  {name:<18}吞吐量 x{stage['items_per_second'] / before['items_per_second']:.2f}")
+        for name, latency in result['search'].items():
+            before = old['search'].get(name)
+            if before and latency['p50_ms']:
+                print(f"  {name:<18}p50 x{before['p50_ms'] / latency['p50_ms']:.2f}  "
+                      f"p99 x{before['p99_ms'] / latency['p99_ms']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="索引与搜索全流程基准测试")
+    parser.add_argument('--sizes', default='10k,100k', help="逗号分隔的文件数，可用 k/m 后缀 (如 10k,100k,1m)")
+    parser.add_argument('--store', choices=['chroma', 'numpy'], default='chroma', help="向量存储后端")
+    parser.add_argument('--dimensions', type=int, default=256, help="本地嵌入维度")
+    parser.add_argument('--chunk-size', type=int, default=20000, help="每批嵌入并写入的文件数")
+    parser.add_argument('--queries', type=int, default=200, help="每种检索方式的查询数")
+    parser.add_argument('--seed', type=int, default=42, help="合成目录树与查询的随机种子")
+    parser.add_argument('--workdir', help="保留合成目录树的目录 (默认使用临时目录，结束后删除)")
+    parser.add_argument('--json', dest='json_path', help="将结果写入 JSON 文件")
+    parser.add_argument('--compare', help="与之前保存的 JSON 结果对比")
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        result = run_size(args.single, args)
+        sys.stdout.write(json.dumps(result) + '\n')
+        return
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    child_argv = ['--store', args.store, '--dimensions', str(args.dimensions), '--chunk-size', str(args.chunk_size),
+                  '--queries', str(args.queries), '--seed', str(args.seed)]
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        child_argv += ['--workdir', os.path.abspath(args.workdir)]
+
+    results = []
+    for file_count in sizes:
+        print(f"正在测试 {file_count} 个文件 (存储 {args.store}, {args.dimensions} 维)...", flush=True)
+        result = run_size_in_subprocess(file_count, child_argv)
+        print_result(result)
+        results.append(result)
+
+    payload = {
+        'suite_version': SUITE_VERSION,
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': {'system': platform.platform(), 'python': platform.python_version(),
+                     'cpus': os.cpu_count()},
+        'settings': {'store': args.store, 'dimensions': args.dimensions, 'chunk_size': args.chunk_size,
+                     'queries': args.queries, 'seed': args.seed},
+        'results': results
+    }
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(results, payload['settings'], json.load(f))
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
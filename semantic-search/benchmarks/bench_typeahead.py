@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+输入提示基准测试 - 模拟逐字输入，测量 TypeaheadIndex.suggest 每次按键的延迟
+
+用法:
+    python benchmarks/bench_typeahead.py --files 1000000
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typeahead_index import TypeaheadIndex
+from synthetic_tree import iter_synthetic_paths
+
+# Typed queries, including a substring and a typo
+QUERIES = ['T_Stone_Normal', 'dragon idle', 'SK_Warrior', 'crystal', 'ormal', 'warior', 'bp_ches']
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输入提示基准测试")
+    parser.add_argument('--files', type=int, default=200000, help="合成文件数")
+    parser.add_argument('--limit', type=int, default=10, help="每次返回的建议数")
+    args = parser.parse_args()
+
+    index = TypeaheadIndex(os.devnull)
+    start = time.perf_counter()
+    for directory, name in iter_synthetic_paths(args.files):
+        path = os.path.join(directory, name)
+        stem = os.path.splitext(name)[0]
+        index.add(hashlib.md5(path.encode()).hexdigest(), {'file_stem': stem, 'file_name': name, 'file_path': path})
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.suggest('warm', 1)  # first lookup sorts the keys
+    sort_time = time.perf_counter() - start
+    print(f"{len(index)} 个文件: 构建 {build_time:.1f} 秒, 排序 {sort_time:.2f} 秒")
+
+    print(f"\n{'查询':<24}{'按键数':>8}{'平均(ms)':>10}{'p99(ms)':>10}{'最慢(ms)':>10}  最终结果")
+    all_samples = []
+    for query in QUERIES:
+        samples, results = [], []
+        for length in range(1, len(query) + 1):
+            start = time.perf_counter()
+            results = index.suggest(query[:length], args.limit)
+            samples.append((time.perf_counter() - start) * 1000)
+        all_samples.extend(samples)
+        top = f"{results[0]['file_stem']} ({results[0]['match']})" if results else "-"
+        print(f"{query:<24}{len(samples):>8}{sum(samples) / len(samples):>10.3f}"
+              f"{percentile(samples, 0.99):>10.3f}{max(samples):>10.3f}  {top}")
+
+    print(f"\n全部按键: 平均 {sum(all_samples) / len(all_samples):.3f} ms, "
+          f"p50 {percentile(all_samples, 0.5):.3f} ms, p99 {percentile(all_samples, 0.99):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
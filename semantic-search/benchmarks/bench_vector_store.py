@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+向量存储基准测试 - 比较 Chroma (HNSW) 与 NumPy (mmap 精确检索) 两种后端
+
+同一组合成文件 (向量与元数据相同) 分别写入两种存储，报告:
+    构建       写入所有记录并持久化的耗时
+    磁盘       存储目录大小
+    冷启动     新进程中打开存储并完成第一个查询的耗时 (含导入)
+    延迟       不带过滤 / 带元数据过滤的单个查询 p50 / p99
+    recall@10  与精确检索结果的重合比例 (过滤查询的参考结果只在匹配的记录中计算)
+
+用法:
+    python benchmarks/bench_vector_store.py --files 50000
+    python benchmarks/bench_vector_store.py --quantization int8       # NumPy 后端使用 int8 + 重新打分
+    python benchmarks/bench_vector_store.py --json stores.json        # 保存结果，便于不同提交间对比
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, APP_DIR)
+
+import numpy as np
+
+from file_indexer import FileIndexer
+from embedding_providers import HashingEmbeddingProvider
+from vector_quantization import top_k
+from chroma_writer import ChunkedWriter
+from vector_store import ChromaVectorStore
+from numpy_vector_store import NumpyVectorStore
+from bench_vectors import load_corpus, make_queries, embed_matrix, recall_at_k, percentile, directory_size
+
+K = 10
+COLLECTION = 'bench'
+
+
+def open_store(backend: str, path: str, quantization=None, rescore_factor: int = 4):
+    if backend == 'chroma':
+        return ChromaVectorStore(path)
+    return NumpyVectorStore(path, quantization=quantization, rescore_factor=rescore_factor)
+
+
+def filter_clause(metadatas):
+    """Where clause on the asset type closest to 10% of the corpus, as a type: filter would produce"""
+    counts = Counter(metadata['asset_type'] for metadata in metadatas)
+    asset_type, _ = min(counts.items(), key=lambda item: abs(item[1] / len(metadatas) - 0.1))
+    return {'asset_type': asset_type}, np.array([metadata['asset_type'] == asset_type for metadata in metadatas])
+
+
+def build(store, corpus: np.ndarray, metadatas) -> float:
+    start = time.perf_counter()
+    collection = store.create_collection(COLLECTION, metadata={'hnsw:space': 'cosine'})
+    rows = list(zip([str(i) for i in range(len(corpus))], corpus.tolist(), metadatas))
+    ChunkedWriter(store.get_max_batch_size()).write(
+        rows, lambda chunk: collection.upsert(ids=[row[0] for row in chunk],
+                                              embeddings=[row[1] for row in chunk],
+                                              metadatas=[row[2] for row in chunk]))
+    store.flush(collection)
+    return time.perf_counter() - start
+
+
+def time_queries(collection, queries: np.ndarray, where=None):
+    query_rows = queries.tolist()
+    collection.query(query_embeddings=query_rows[:1], n_results=K, where=where)  # warm up
+    samples, found = [], []
+    for query in query_rows:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=K, where=where, include=[])
+        samples.append(time.perf_counter() - start)
+        found.append([int(row_id) for row_id in result['ids'][0]])
+    return samples, found
+
+
+def cold_open(backend: str, path: str, query: list, quantization) -> float:
+    """Seconds for a fresh process to import, open the store and answer one query"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.abspath(__file__), '--cold-open', backend, path,
+                    '--quantization', quantization or 'float32'],
+                   input=json.dumps(query), text=True, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def run_cold_open(backend: str, path: str, quantization):
+    store = open_store(backend, path, quantization)
+    collection = store.get_or_create_collection(COLLECTION)
+    collection.query(query_embeddings=[json.loads(sys.stdin.read())], n_results=K)
+
+
+def bench_backend(backend: str, corpus, queries, metadatas, where, truth, filtered_truth, args):
+    workspace = tempfile.mkdtemp(prefix=f'semantic_store_{backend}_')
+    try:
+        store = open_store(backend, workspace, args.quantization, args.rescore_factor)
+        build_seconds = build(store, corpus, metadatas)
+        collection = store.get_or_create_collection(COLLECTION)
+        samples, found = time_queries(collection, queries)
+        filtered_samples, filtered_found = time_queries(collection, queries, where)
+        disk_bytes = directory_size(workspace)
+        del collection, store
+
+        cold = [cold_open(backend, workspace, queries[0].tolist(), args.quantization) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    label = backend if backend == 'chroma' or not args.quantization else f"{backend} ({args.quantization})"
+    return {
+        'store': label,
+        'build_seconds': build_seconds,
+        'disk_bytes': disk_bytes,
+        'cold_open_ms': percentile(cold, 0.5) * 1000,
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'recall_at_10': recall_at_k(np.asarray(found), truth),
+        'filtered_p50_ms': percentile(filtered_samples, 0.5) * 1000,
+        'filtered_p99_ms': percentile(filtered_samples, 0.99) * 1000,
+        'filtered_recall_at_10': recall_at_k(np.asarray(filtered_found), filtered_truth)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量存储基准测试")
+    parser.add_argument('--files', type=int, default=20000, help="合成文件数")
+    parser.add_argument('--queries', type=int, default=200, help="查询数")
+    parser.add_argument('--dimensions', type=int, default=256, help="向量维度 (本地嵌入)")
+    parser.add_argument('--quantization', choices=['float32', 'float16', 'int8'], default=None,
+                        help="NumPy 后端的检索精度 (默认 float32)")
+    parser.add_argument('--rescore-factor', type=int, default=4, help="量化检索重新打分的候选倍数")
+    parser.add_argument('--runs', type=int, default=3, help="冷启动测量次数 (取中位数)")
+    parser.add_argument('--json', dest='json_path', help="将结果写入 JSON 文件")
+    parser.add_argument('--cold-open', nargs=2, metavar=('BACKEND', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_open:
+        run_cold_open(*args.cold_open, args.quantization)
+        return
+
+    indexer = FileIndexer(HashingEmbeddingProvider(dimensions=args.dimensions))
+    files = load_corpus(indexer, None, args.files)
+    queries = make_queries(indexer, files, args.queries)
+    texts = [indexer.create_searchable_text(file_info) for file_info in files]
+    metadatas = [indexer.build_metadata(file_info, text) for file_info, text in zip(files, texts)]
+    corpus = embed_matrix(indexer.provider.embed, texts)
+    query_matrix = embed_matrix(indexer.provider.embed, queries)
+    where, mask = filter_clause(metadatas)
+    print(f"{len(files)} 个文件, {len(queries)} 个查询, {args.dimensions} 维, 过滤条件 {where} "
+          f"(匹配 {int(mask.sum())} 条)")
+
+    scores = query_matrix @ corpus.T
+    truth, _ = top_k(scores, K)
+    scores[:, ~mask] = -np.inf
+    filtered_truth, _ = top_k(scores, min(K, int(mask.sum())))
+
+    results = [bench_backend(backend, corpus, query_matrix, metadatas, where, truth, filtered_truth, args)
+               for backend in ('chroma', 'numpy')]
+
+    print(f"\n{'存储':<18}{'构建(s)':>9}{'磁盘(MB)':>10}{'冷启动(ms)':>12}{'p50(ms)':>9}{'p99(ms)':>9}"
+          f"{'recall':>8}{'过滤p50':>9}{'过滤p99':>9}{'过滤recall':>11}")
+    for result in results:
+        print(f"{result['store']:<18}{result['build_seconds']:>9.2f}{result['disk_bytes'] / 1024 ** 2:>10.1f}"
+              f"{result['cold_open_ms']:>12.0f}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{result['recall_at_10']:>8.3f}{result['filtered_p50_ms']:>9.2f}{result['filtered_p99_ms']:>9.2f}"
+              f"{result['filtered_recall_at_10']:>11.3f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': len(files), 'queries': len(queries), 'dimensions': args.dimensions,
+                       'filter': where, 'filter_matches': int(mask.sum()), 'results': results},
+                      f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
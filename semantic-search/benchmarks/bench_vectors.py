@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+向量维度与量化基准测试 - 比较不同维度/存储方式的大小、查询延迟和 recall@10
+
+参考结果是最大维度下 float32 精确检索的前 10 个结果；每种配置报告:
+    内存       进程内检索时向量占用的内存 (int8+rescore 的 float32 原始向量留在磁盘/mmap 中)
+    磁盘       Chroma 集合 (HNSW, 只支持 float32) 在磁盘上的大小
+    延迟       单个查询的 p50 / p99
+    recall@10  与参考结果的重合比例
+
+OpenAI 的 text-embedding-3 模型只请求一次原生维度，较小维度由截断并重新归一化得到，
+与 API 的 dimensions 参数结果一致 (已缓存的向量不会再次付费)。本地嵌入器按每个维度分别计算。
+
+用法:
+    python benchmarks/bench_vectors.py                                  # 合成文件名, 本地嵌入
+    python benchmarks/bench_vectors.py --directory D:/Project/Content --provider openai --dimensions 1536,512,256
+    python benchmarks/bench_vectors.py --json vectors.json              # 保存结果，便于不同提交间对比
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import Config
+from file_indexer import FileIndexer
+from embedding_providers import OpenAIEmbeddingProvider, HashingEmbeddingProvider, OPENAI_MODEL_DIMENSIONS
+from vector_quantization import QuantizedVectors, truncate_dimensions, top_k
+from chroma_writer import ChunkedWriter, client_max_batch_size
+from synthetic_tree import iter_synthetic_paths
+
+K = 10
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for parent, _, names in os.walk(path):
+        for name in names:
+            total += os.path.getsize(os.path.join(parent, name))
+    return total
+
+
+def load_corpus(indexer: FileIndexer, directory, file_count: int):
+    """File infos of a real directory, or synthetic Unreal-style names"""
+    if directory:
+        return list(indexer.iter_files(directory))
+    root = os.path.abspath('synthetic')
+    return [indexer._build_file_info(os.path.join(root, folder, name), name, os.path.join(root, folder), 0, 0.0)
+            for folder, name in iter_synthetic_paths(file_count)
+            if os.path.splitext(name)[1].lower() in Config.INDEXED_EXTENSIONS]
+
+
+def make_queries(indexer: FileIndexer, files, count: int, seed: int = 7):
+    """Short keyword queries built from words of random file names ("stone normal")"""
+    rng = random.Random(seed)
+    queries = []
+    for file_info in rng.sample(files, min(count, len(files))):
+        words = [word.lower() for word in indexer._split_filename(file_info['stem']) if len(word) > 1]
+        if words:
+            queries.append(' '.join(rng.sample(words, min(2, len(words)))))
+    return queries
+
+
+def embed_matrix(embed, texts, batch_size: int = 256) -> np.ndarray:
+    rows = []
+    for start in range(0, len(texts), batch_size):
+        rows.extend(embed(texts[start:start + batch_size]))
+    return np.asarray(rows, dtype=np.float32)
+
+
+def embedding_sets(provider_name: str, dimensions, files, queries):
+    """{dimensions: (corpus matrix, query matrix)} for every requested size"""
+    texts = None
+    sets = {}
+    if provider_name == 'openai':
+        native = OPENAI_MODEL_DIMENSIONS.get(Config.EMBEDDING_MODEL, 1536)
+        provider = OpenAIEmbeddingProvider(None, Config.EMBEDDING_MODEL, api_key=Config.OPENAI_API_KEY)
+        indexer = FileIndexer(provider)
+        # Goes through the embedding cache, so re-running on the same tree is free
+        embedded = indexer.generate_embeddings(files)
+        corpus = np.asarray([embedding for _, embedding, _ in embedded], dtype=np.float32)
+        query_matrix = embed_matrix(provider.embed, queries, batch_size=100)
+        for size in dimensions:
+            if size > native:
+                raise ValueError(f"{Config.EMBEDDING_MODEL} 最多 {native} 维")
+            sets[size] = (truncate_dimensions(corpus, size), truncate_dimensions(query_matrix, size))
+        return sets
+
+    for size in dimensions:
+        provider = HashingEmbeddingProvider(dimensions=size)
+        if texts is None:
+            indexer = FileIndexer(provider)
+            texts = [indexer.create_searchable_text(file_info) for file_info in files]
+        sets[size] = (embed_matrix(provider.embed, texts), embed_matrix(provider.embed, queries))
+    return sets
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(found.tolist(), truth.tolist()))
+    return hits / max(1, truth.size)
+
+
+def bench_in_process(corpus: np.ndarray, queries: np.ndarray, mode: str, rescore_factor: int, truth: np.ndarray):
+    vectors = QuantizedVectors(corpus, mode, full_precision=corpus if rescore_factor > 1 else None)
+    vectors.search(queries[:1], K, rescore_factor)  # warm up
+    samples, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        indices, _ = vectors.search(query, K, rescore_factor)
+        samples.append(time.perf_counter() - start)
+        found.append(indices[0])
+    return {
+        'memory_bytes': vectors.nbytes,
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'recall_at_10': recall_at_k(np.asarray(found), truth)
+    }
+
+
+def bench_chroma(corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray):
+    import chromadb
+    from chromadb.config import Settings
+
+    workspace = tempfile.mkdtemp(prefix='semantic_vectors_')
+    try:
+        client = chromadb.PersistentClient(path=workspace, settings=Settings(anonymized_telemetry=False))
+        collection = client.create_collection('bench', metadata={'hnsw:space': 'cosine'})
+        rows = [(str(i), vector) for i, vector in enumerate(corpus.tolist())]
+        start = time.perf_counter()
+        ChunkedWriter(client_max_batch_size(client)).write(
+            rows, lambda chunk: collection.add(ids=[row_id for row_id, _ in chunk],
+                                               embeddings=[vector for _, vector in chunk]))
+        build_seconds = time.perf_counter() - start
+
+        query_rows = queries.tolist()
+        collection.query(query_embeddings=query_rows[:1], n_results=K)  # warm up
+        samples, found = [], []
+        for query in query_rows:
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query], n_results=K, include=[])
+            samples.append(time.perf_counter() - start)
+            found.append([int(row_id) for row_id in result['ids'][0]])
+        disk_bytes = directory_size(workspace)
+        del collection, client
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    return {
+        'disk_bytes': disk_bytes,
+        'build_seconds': build_seconds,
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'recall_at_10': recall_at_k(np.asarray(found), truth)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量维度与量化基准测试")
+    parser.add_argument('--directory', help="使用真实目录中的文件 (默认生成合成文件名)")
+    parser.add_argument('--files', type=int, default=20000, help="合成文件数")
+    parser.add_argument('--queries', type=int, default=200, help="查询数")
+    parser.add_argument('--provider', choices=['local', 'openai'], default=None,
+                        help="嵌入提供方 (默认 Config.EMBEDDING_PROVIDER)")
+    parser.add_argument('--dimensions', default=None,
+                        help="逗号分隔的维度 (默认 openai: 1536,1024,512,256; local: 512,256,128)")
+    parser.add_argument('--rescore-factor', type=int, default=4, help="int8 重新打分的候选倍数")
+    parser.add_argument('--no-chroma', action='store_true', help="跳过 Chroma 集合的测量")
+    parser.add_argument('--json', dest='json_path', help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    provider_name = (args.provider or Config.EMBEDDING_PROVIDER or 'openai').lower()
+    if provider_name == 'openai':
+        Config.validate_config()
+    default_dimensions = '1536,1024,512,256' if provider_name == 'openai' else '512,256,128'
+    dimensions = sorted({int(size) for size in (args.dimensions or default_dimensions).split(',')}, reverse=True)
+
+    indexer = FileIndexer(HashingEmbeddingProvider(dimensions=dimensions[-1]))
+    files = load_corpus(indexer, args.directory, args.files)
+    if not files:
+        print("没有找到可索引的文件")
+        return
+    queries = make_queries(indexer, files, args.queries)
+    print(f"{len(files)} 个文件, {len(queries)} 个查询, 提供方 {provider_name}, 维度 {dimensions}")
+
+    sets = embedding_sets(provider_name, dimensions, files, queries)
+    reference_corpus, reference_queries = sets[dimensions[0]]
+    truth, _ = top_k(reference_queries @ reference_corpus.T, K)
+
+    modes = [('float32', 1), ('float16', 1), ('int8', 1), ('int8', args.rescore_factor)]
+    results = []
+    for size in dimensions:
+        corpus, query_matrix = sets[size]
+        for mode, rescore_factor in modes:
+            label = f"{mode}+rescore x{rescore_factor}" if rescore_factor > 1 else mode
+            result = {'dimensions': size, 'storage': label}
+            result.update(bench_in_process(corpus, query_matrix, mode, rescore_factor, truth))
+            results.append(result)
+        if not args.no_chroma:
+            result = {'dimensions': size, 'storage': 'chroma (HNSW, float32)'}
+            result.update(bench_chroma(corpus, query_matrix, truth))
+            results.append(result)
+
+    print(f"\n参考: {dimensions[0]} 维 float32 精确检索\n")
+    print(f"{'维度':>6}  {'存储':<24}{'内存(MB)':>10}{'磁盘(MB)':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'recall@10':>11}")
+    for result in results:
+        memory = f"{result['memory_bytes'] / 1024 ** 2:.1f}" if 'memory_bytes' in result else '-'
+        disk = f"{result['disk_bytes'] / 1024 ** 2:.1f}" if 'disk_bytes' in result else '-'
+        print(f"{result['dimensions']:>6}  {result['storage']:<24}{memory:>10}{disk:>10}"
+              f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['recall_at_10']:>11.3f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'provider': provider_name, 'files': len(files), 'queries': len(queries),
+                       'reference_dimensions': dimensions[0], 'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
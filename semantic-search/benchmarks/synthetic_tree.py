@@ -0,0 +1,67 @@
+"""
+合成测试目录树 - 生成 Unreal Engine 风格命名的大规模文件树，供基准测试使用
+"""
+
+import os
+import random
+from typing import Iterator, Tuple
+
+# Unreal 前缀 -> 扩展名
+ASSET_PREFIXES = [
+    ('T_', '.tga'), ('T_', '.png'), ('M_', '.uasset'), ('MI_', '.uasset'),
+    ('SM_', '.uasset'), ('SK_', '.uasset'), ('BP_', '.uasset'), ('WBP_', '.uasset'),
+    ('A_', '.uasset'), ('VFX_', '.uasset'), ('SFX_', '.wav'), ('L_', '.umap'),
+]
+SUBJECTS = [
+    'Warrior', 'Mage', 'Rogue', 'Dragon', 'Goblin', 'Elf', 'Dwarf', 'Orc', 'Stone', 'Wall',
+    'Grass', 'Wood', 'Metal', 'Crystal', 'Lava', 'Ice', 'Sand', 'Sword', 'Shield', 'Potion',
+    'Gem', 'Coin', 'Scroll', 'Castle', 'Tree', 'Rock', 'Bridge', 'Tavern', 'Torch', 'Chest',
+]
+VARIANTS = [
+    'Diffuse', 'Normal', 'Roughness', 'Metallic', 'Emissive', 'Height', 'Opacity', 'Body',
+    'Idle', 'Walk', 'Run', 'Attack', 'Death', 'Open', 'Close', 'Large', 'Small', 'Broken',
+]
+TOP_DIRS = ['Textures', 'Materials', 'Meshes', 'Audio', 'Animations', 'Blueprints', 'UI', 'VFX', 'Maps']
+SUB_DIRS = ['Characters', 'Environment', 'Props', 'Items', 'Effects', 'Weapons', 'Creatures', 'Dungeon']
+# Files that exist in real projects but are not indexed
+NOISE_FILES = ['.DS_Store', 'Thumbs.db', 'desktop.ini', 'notes.tmp']
+
+
+def iter_synthetic_paths(file_count: int, seed: int = 42, files_per_dir: int = 40) -> Iterator[Tuple[str, str]]:
+    """Yield (relative directory, file name) pairs with realistic depth and naming"""
+    rng = random.Random(seed)
+    dir_index = 0
+    produced = 0
+
+    while produced < file_count:
+        depth = rng.randint(2, 5)
+        parts = [rng.choice(TOP_DIRS), rng.choice(SUB_DIRS)]
+        parts += [f"{rng.choice(SUBJECTS)}{rng.randint(1, 40)}" for _ in range(depth - 2)]
+        parts.append(f"Set{dir_index:05d}")
+        directory = os.path.join(*parts)
+        dir_index += 1
+
+        for _ in range(min(files_per_dir, file_count - produced)):
+            if rng.random() < 0.05:
+                name = rng.choice(NOISE_FILES)
+            else:
+                prefix, ext = rng.choice(ASSET_PREFIXES)
+                name = f"{prefix}{rng.choice(SUBJECTS)}_{rng.choice(VARIANTS)}_{rng.randint(0, 9999):04d}{ext}"
+            produced += 1
+            yield directory, name
+
+
+def create_synthetic_tree(root: str, file_count: int, seed: int = 42) -> int:
+    """Create an on-disk tree of empty files; returns number of files created"""
+    created = 0
+    made_dirs = set()
+    for directory, name in iter_synthetic_paths(file_count, seed):
+        full_dir = os.path.join(root, directory)
+        if full_dir not in made_dirs:
+            os.makedirs(full_dir, exist_ok=True)
+            made_dirs.add(full_dir)
+        path = os.path.join(full_dir, name)
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+            created += 1
+    return created
@@ -0,0 +1,123 @@
+import time
+import random
+import threading
+from typing import List, Dict, Tuple, Optional, Callable, Sequence
+
+from metrics import STORE_WRITE_SECONDS, STORE_WRITE_ROWS, STORE_WRITE_RETRIES
+
+# Used when the client can't report its own limit
+DEFAULT_MAX_BATCH_SIZE = 5000
+
+
+class ChunkWriteError(RuntimeError):
+    """Some chunks still failed after all retries; every other chunk was written"""
+
+    def __init__(self, failed: List[Tuple[list, str]]):
+        self.failed = failed
+        rows = sum(len(chunk) for chunk, _ in failed)
+        super().__init__(f"{rows} 条记录在重试后仍未写入向量数据库: {failed[0][1]}")
+
+
+class WriteStats:
+    """Rows, chunks, retries and time spent writing to the collection (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.chunks = 0
+        self.retries = 0
+        self.failed_rows = 0
+        self.seconds = 0.0
+
+    def record(self, rows: int, seconds: float, retries: int, failed: bool):
+        with self._lock:
+            self.chunks += 1
+            self.retries += retries
+            self.seconds += seconds
+            if failed:
+                self.failed_rows += rows
+            else:
+                self.rows += rows
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'rows': self.rows,
+                'chunks': self.chunks,
+                'retries': self.retries,
+                'failed_rows': self.failed_rows,
+                'seconds': self.seconds,
+                'rows_per_second': self.rows / self.seconds if self.seconds > 0 else 0.0
+            }
+
+
+def client_max_batch_size(client, configured: Optional[int] = None) -> int:
+    """Rows per write: the configured size capped at what the Chroma client accepts"""
+    get_limit = getattr(client, 'get_max_batch_size', None)
+    limit = get_limit() if get_limit else None
+    sizes = [size for size in (configured, limit) if size]
+    return max(1, min(sizes)) if sizes else DEFAULT_MAX_BATCH_SIZE
+
+
+class ChunkedWriter:
+    """
+    Splits collection writes into chunks of at most batch_size rows
+    A single oversized call fails all-or-nothing once it passes the client's
+    max_batch_size; chunks keep each request (and its serialized copy) small.
+    Upsert, update and delete by id are idempotent, so a chunk that failed
+    halfway is simply sent again. Chunks that still fail after max_retries are
+    collected and returned instead of aborting the chunks after them.
+    """
+
+    def __init__(self, batch_size: int, max_retries: int = 3, retry_base_delay: float = 0.5,
+                 retry_max_delay: float = 10.0):
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(0, max_retries)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+
+    def write(self, rows: Sequence, write_chunk: Callable[[list], None],
+              on_written: Optional[Callable[[list], None]] = None,
+              stats: Optional[WriteStats] = None, operation: str = 'write') -> List[Tuple[list, str]]:
+        """
+        Write rows chunk by chunk with write_chunk(chunk)
+        on_written is called after each chunk that reached the collection
+        operation labels the write in the metrics registry (upsert, update, delete)
+        Returns [(chunk, error message)] for chunks that failed permanently
+        """
+        failed = []
+        for offset in range(0, len(rows), self.batch_size):
+            chunk = list(rows[offset:offset + self.batch_size])
+            start = time.perf_counter()
+            attempt = 0
+            error = None
+            while True:
+                try:
+                    with STORE_WRITE_SECONDS.time(operation=operation):
+                        write_chunk(chunk)
+                    error = None
+                    break
+                except Exception as e:
+                    error = e
+                    if attempt >= self.max_retries:
+                        break
+                    time.sleep(self._backoff_delay(attempt))
+                    STORE_WRITE_RETRIES.inc(operation=operation)
+                    attempt += 1
+
+            if stats is not None:
+                stats.record(len(chunk), time.perf_counter() - start, attempt, failed=error is not None)
+            if error is not None:
+                failed.append((chunk, str(error) or type(error).__name__))
+                continue
+            STORE_WRITE_ROWS.inc(len(chunk), operation=operation)
+            if on_written is not None:
+                on_written(chunk)
+        return failed
@@ -10,17 +10,126 @@ except ImportError:
     print("如需从 .env 文件加载配置，请安装: pip install python-dotenv")
 
 class Config:
+    # Embedding Provider: 'openai' (API) or 'local' (offline hashed n-gram embedder, no download)
+    EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'openai')
+    LOCAL_EMBEDDING_DIMENSIONS = 512
+    
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    # Alternative OpenAI-compatible endpoint, e.g. the local stand-in for load tests
+    # (python embedding_stub_server.py -> http://127.0.0.1:8766/v1); no API key needed then
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
     EMBEDDING_MODEL = 'text-embedding-3-small'  # Cost-effective model
+    # Output size requested from the API (text-embedding-3 models only; None = native 1536).
+    # Short file-name strings lose little at 256-512 dims, see benchmarks/bench_vectors.py
+    EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '0')) or None
     
     # Chroma Configuration
     CHROMA_DB_PATH = './chroma_db'
+    # Vector store: 'chroma' (HNSW index in SQLite) or 'numpy' (exact brute-force search over a
+    # memory-mapped .npy matrix with a columnar metadata sidecar, kept in CHROMA_DB_PATH as well)
+    VECTOR_STORE = os.getenv('VECTOR_STORE', 'chroma')
+    # numpy store: None (float32), 'float16' or 'int8' codes in memory, rescored from the .npy file
+    VECTOR_QUANTIZATION = os.getenv('VECTOR_QUANTIZATION') or None
+    VECTOR_RESCORE_FACTOR = 4
     COLLECTION_NAME = 'file_embeddings'
+    # Every indexed root gets its own collection (shard) named after COLLECTION_NAME;
+    # searches fan out to the shards with up to SHARD_SEARCH_WORKERS threads
+    SHARD_SEARCH_WORKERS = 4
+    # Writes are split into chunks of at most CHROMA_WRITE_BATCH_SIZE rows (None: the
+    # client's max_batch_size); a failing chunk is retried on its own with backoff
+    CHROMA_WRITE_BATCH_SIZE = None
+    CHROMA_WRITE_MAX_RETRIES = 3
+    CHROMA_WRITE_RETRY_DELAY = 0.5  # Seconds, doubled per attempt with full jitter
+    # HNSW graph of Chroma collections: M (links per node) and HNSW_CONSTRUCTION_EF are fixed
+    # when a collection is built (re-index with --full to change them); HNSW_SEARCH_EF is applied
+    # every time a collection is opened. HNSW_COLLECTION_PARAMS overrides them per shard, keyed by
+    # collection name or indexed root, e.g. {'D:/Projects/MyGame/Content': {'M': 32, 'search_ef': 200}}.
+    # `python main.py tune-hnsw` measures recall and latency of a grid and recommends values.
+    HNSW_M = 16
+    HNSW_CONSTRUCTION_EF = 100
+    HNSW_SEARCH_EF = 100
+    HNSW_COLLECTION_PARAMS = {}
+    
+    # Indexing Configuration
+    # Incremental mode only embeds new/changed files and removes deleted ones,
+    # using a manifest stored next to the collection
+    INCREMENTAL_INDEXING = True
+    # Streaming pipeline: files flow through in chunks, with at most
+    # PIPELINE_QUEUE_SIZE chunks buffered between stages
+    PIPELINE_CHUNK_SIZE = 1000
+    PIPELINE_QUEUE_SIZE = 4
+    # Directories scanned in parallel (raise for network shares / fast NVMe)
+    SCAN_WORKERS = 8
+    # Runs are journaled next to the collection: embeddings are logged before they are written and
+    # progress is checkpointed every INDEX_CHECKPOINT_SECONDS, so `index --resume` continues an
+    # interrupted run without re-embedding or re-scanning finished directories
+    INDEX_JOURNAL_ENABLED = True
+    INDEX_CHECKPOINT_SECONDS = 30.0
+    
+    # Embedding Cache Configuration
+    # Content-addressed cache (model + text hash -> vector), kept outside chroma_db
+    # so rebuilding or restoring the collection is mostly served locally
+    EMBEDDING_CACHE_ENABLED = True
+    EMBEDDING_CACHE_PATH = './embedding_cache.sqlite3'
+    EMBEDDING_CACHE_MAX_ENTRIES = 2_000_000  # LRU eviction beyond this
+    EMBEDDING_CACHE_TTL_DAYS = 90  # None to disable expiry
+    
+    # Embedding Dispatch Configuration
+    # Several batches are kept in flight; budgets should match your OpenAI tier limits
+    # Batches hold at most EMBEDDING_MAX_BATCH_INPUTS texts and EMBEDDING_MAX_BATCH_TOKENS estimated
+    # tokens (API limits: 2048 / 300k, the token budget leaves room for estimation error).
+    # 'adaptive' starts at EMBEDDING_BATCH_SIZE, doubles while requests finish within half of
+    # EMBEDDING_TARGET_BATCH_SECONDS and halves after throttling, errors or slow requests;
+    # 'fixed' always sends EMBEDDING_BATCH_SIZE texts. Round-trips saved are counted against the latter.
+    EMBEDDING_BATCHING = 'adaptive'
+    EMBEDDING_BATCH_SIZE = 100
+    EMBEDDING_MAX_BATCH_INPUTS = 2048
+    EMBEDDING_MAX_BATCH_TOKENS = 250_000
+    EMBEDDING_TARGET_BATCH_SECONDS = 4.0
+    EMBEDDING_CONCURRENCY = 4
+    EMBEDDING_REQUESTS_PER_MINUTE = 3000  # None for no limit
+    EMBEDDING_TOKENS_PER_MINUTE = 1_000_000  # None for no limit
+    EMBEDDING_MAX_RETRIES = 5  # Retries for 429/5xx/connection errors
+    EMBEDDING_RETRY_BASE_DELAY = 1.0  # Seconds, doubled per attempt with full jitter
+    EMBEDDING_RETRY_MAX_DELAY = 60.0
     
     # Search Configuration
     TOP_K_RESULTS = 10
-    
+    # Query embeddings are cached in memory and in the embedding cache; results are
+    # cached per index version and invalidated whenever the collection changes
+    QUERY_CACHE_ENABLED = True
+    QUERY_EMBEDDING_CACHE_SIZE = 10000
+    QUERY_RESULT_CACHE_SIZE = 1000
+    # 'hybrid' fuses vector hits with a BM25 inverted index over file-name tokens
+    # (reciprocal rank fusion); 'vector' or 'lexical' use one side only
+    SEARCH_MODE = 'hybrid'
+    LEXICAL_INDEX_ENABLED = True
+    # Identifier-like queries (T_Stone_Wall_Normal) are answered from the inverted index alone
+    LEXICAL_FAST_PATH = True
+    RRF_K = 60
+    # In-memory prefix/trigram index over file names for instant suggest()
+    TYPEAHEAD_ENABLED = True
+    TYPEAHEAD_MAX_EDIT_DISTANCE = 2
+    # Watch mode: 'auto' uses watchdog (inotify/FSEvents/ReadDirectoryChangesW) when installed,
+    # otherwise polls; changes are applied once events have been quiet for the debounce window
+    WATCH_BACKEND = os.getenv('WATCH_BACKEND', 'auto')
+    WATCH_DEBOUNCE_SECONDS = 2.0
+    WATCH_MAX_DELAY_SECONDS = 10.0
+    WATCH_POLL_INTERVAL = 5.0
+    # Search service (search_service.py): local HTTP address or a Unix socket path
+    SERVICE_HOST = os.getenv('SERVICE_HOST', '127.0.0.1')
+    SERVICE_PORT = int(os.getenv('SERVICE_PORT', '8765'))
+    SERVICE_SOCKET = os.getenv('SERVICE_SOCKET')
+    SERVICE_WORKERS = 8
+    # Idle keep-alive connections wait without holding a worker and are closed after this many seconds
+    SERVICE_IDLE_TIMEOUT = 15.0
+    # Metrics (metrics.py): when METRICS_PROMETHEUS_FILE is set, the Prometheus text format is
+    # rewritten there every METRICS_WRITE_INTERVAL seconds (for node_exporter's textfile collector);
+    # the search service also serves it at GET /metrics
+    METRICS_PROMETHEUS_FILE = os.getenv('METRICS_PROMETHEUS_FILE')
+    METRICS_WRITE_INTERVAL = 15.0
+
     # File Extensions to Index (can be extended)
     INDEXED_EXTENSIONS = {
         # 文档类型
@@ -40,6 +149,6 @@ class Config:
     @classmethod
     def validate_config(cls):
         """Validate configuration settings"""
-        if not cls.OPENAI_API_KEY:
+        if (cls.EMBEDDING_PROVIDER or 'openai').lower() == 'openai' and not (cls.OPENAI_API_KEY or cls.OPENAI_BASE_URL):
             raise ValueError("OPENAI_API_KEY environment variable is required. 请在 .env 文件中设置或作为系统环境变量")
         return True 
\ No newline at end of file
@@ -0,0 +1,175 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import List, Dict, Optional, Iterable, Tuple
+
+from metrics import record_cache_lookups
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed cache of embedding vectors
+    Keyed by (model, dimensions, searchable text hash), stored in SQLite
+    outside of chroma_db so it survives collection rebuilds.
+    Eviction: entries older than the TTL are dropped, and once the cache
+    grows past max_entries the least recently used entries are removed.
+    Neither runs per write: the row count is tracked as an upper-bound estimate
+    (replaced keys are counted as new) and only recounted when it passes
+    max_entries, and expired entries are purged every EXPIRE_INTERVAL seconds.
+    """
+
+    EXPIRE_INTERVAL = 3600.0
+
+    def __init__(self, cache_path: str, model: str, dimensions: Optional[int] = None,
+                 max_entries: int = 2_000_000, ttl_seconds: Optional[float] = None):
+        self.cache_path = cache_path
+        self.model = model
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._estimated_count: Optional[int] = None
+        self._next_expiry = 0.0
+
+        directory = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' key TEXT PRIMARY KEY,'
+            ' vector BLOB NOT NULL,'
+            ' created REAL NOT NULL,'
+            ' last_access REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)')
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.model}\0{self.dimensions or ''}\0{text}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        return array('f', vector).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> List[float]:
+        vector = array('f')
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Look up texts, returning {text: embedding} for every cache hit"""
+        keys = {}
+        for text in texts:
+            keys.setdefault(self._key(text), text)
+
+        found = {}
+        now = time.time()
+        expired_before = now - self.ttl_seconds if self.ttl_seconds else None
+        key_list = list(keys)
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT key, vector, created FROM embeddings WHERE key IN ({placeholders})',
+                    chunk
+                ).fetchall()
+
+                hit_keys = []
+                for key, blob, created in rows:
+                    if expired_before is not None and created < expired_before:
+                        continue
+                    found[keys[key]] = self._decode(blob)
+                    hit_keys.append((now, key))
+
+                if hit_keys:
+                    self._conn.executemany('UPDATE embeddings SET last_access = ? WHERE key = ?', hit_keys)
+
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            record_cache_lookups('embedding', len(found), len(keys) - len(found))
+
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, List[float]]]):
+        """Store (text, embedding) pairs, evicting old entries if needed"""
+        now = time.time()
+        rows = [(self._key(text), self._encode(vector), now, now) for text, vector in items]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector, created, last_access) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self._conn.commit()
+            if self._estimated_count is None:
+                # Counted once per process; other writers are caught by the recount below
+                self._estimated_count = self._count()
+            else:
+                self._estimated_count += len(rows)
+
+            if self.ttl_seconds and time.monotonic() >= self._next_expiry:
+                self._expire()
+            if self.max_entries and self._estimated_count > self.max_entries:
+                self._evict()
+
+    def _count(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def _expire(self):
+        """Drop entries older than the TTL"""
+        cursor = self._conn.execute('DELETE FROM embeddings WHERE created < ?',
+                                    (time.time() - self.ttl_seconds,))
+        self._conn.commit()
+        self.evictions += cursor.rowcount
+        self._estimated_count -= cursor.rowcount
+        self._next_expiry = time.monotonic() + self.EXPIRE_INTERVAL
+
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries"""
+        count = self._count()
+        if count > self.max_entries:
+            # Evict down to 90% so we don't pay for eviction on every insert
+            excess = count - int(self.max_entries * 0.9)
+            cursor = self._conn.execute(
+                'DELETE FROM embeddings WHERE key IN '
+                '(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)',
+                (excess,)
+            )
+            self._conn.commit()
+            self.evictions += cursor.rowcount
+            count -= cursor.rowcount
+        self._estimated_count = count
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': count,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
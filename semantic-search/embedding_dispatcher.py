@@ -0,0 +1,312 @@
+import math
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Tuple, Callable, Optional
+
+from metrics import (EMBED_REQUESTS, EMBED_TEXTS, EMBED_TOKENS, EMBED_RETRIES, EMBED_FAILED_TEXTS,
+                     EMBED_BATCHES, EMBED_FIXED_SIZE_BATCHES, EMBED_BATCH_SECONDS)
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    # Progress is then reported once at the start
+    tqdm = None
+
+# Per-request limits of the OpenAI embeddings endpoint
+API_MAX_BATCH_INPUTS = 2048
+API_MAX_BATCH_TOKENS = 300_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 bytes per token) good enough for rate budgeting"""
+    return max(1, len(text.encode('utf-8')) // 4 + 1)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Retry throttling (429), timeouts/conflicts, server errors (5xx) and connection failures"""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is not None:
+        return status_code in (408, 409, 429) or status_code >= 500
+
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError') or isinstance(
+        error, (ConnectionError, TimeoutError))
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After header from an API error response, if any"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        value = headers.get('retry-after')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter shared by all dispatcher workers
+    Enforces a requests-per-minute and a tokens-per-minute budget; either can be None
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._buckets = []  # [capacity, level, refill per second]
+        for per_minute in (requests_per_minute, tokens_per_minute):
+            if per_minute:
+                self._buckets.append([float(per_minute), float(per_minute), per_minute / 60.0])
+            else:
+                self._buckets.append(None)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        for bucket in self._buckets:
+            if bucket:
+                bucket[1] = min(bucket[0], bucket[1] + elapsed * bucket[2])
+
+    def acquire(self, tokens: int = 1):
+        """Block until one request carrying `tokens` tokens fits in the budget"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                wait = max(0.0, self._paused_until - now)
+                needs = (1.0, float(tokens))
+                for bucket, need in zip(self._buckets, needs):
+                    if bucket:
+                        need = min(need, bucket[0])
+                        if bucket[1] < need:
+                            wait = max(wait, (need - bucket[1]) / bucket[2])
+
+                if wait <= 0:
+                    for bucket, need in zip(self._buckets, needs):
+                        if bucket:
+                            bucket[1] -= min(need, bucket[0])
+                    return
+
+            time.sleep(min(wait, 1.0))
+
+    def pause(self, seconds: float):
+        """Hold back every worker, e.g. after the server reported throttling"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class BatchSizer:
+    """
+    Chooses how many texts go into the next embedding request
+    'fixed' always allows batch_size texts. 'adaptive' starts at batch_size, doubles
+    while full batches finish within half of target_seconds and halves when a request
+    is throttled, fails, or takes longer than target_seconds. Either way a batch
+    never exceeds max_inputs texts or max_tokens estimated tokens.
+    """
+
+    def __init__(self, batch_size: int = 100, adaptive: bool = True,
+                 max_inputs: int = API_MAX_BATCH_INPUTS, max_tokens: int = API_MAX_BATCH_TOKENS,
+                 target_seconds: float = 4.0, min_size: int = 16):
+        self.max_inputs = max(1, min(max_inputs, API_MAX_BATCH_INPUTS))
+        self.max_tokens = max(1, min(max_tokens, API_MAX_BATCH_TOKENS))
+        self.adaptive = adaptive
+        self.target_seconds = target_seconds
+        self.min_size = max(1, min(min_size, batch_size))
+        self._lock = threading.Lock()
+        self.size = max(1, min(batch_size, self.max_inputs))
+
+    def record_success(self, texts: int, seconds: float, was_full: bool):
+        if not self.adaptive:
+            return
+        with self._lock:
+            if seconds > self.target_seconds:
+                self.size = max(self.min_size, self.size // 2)
+            elif was_full and texts >= self.size and seconds < self.target_seconds / 2:
+                self.size = min(self.max_inputs, self.size * 2)
+
+    def record_error(self):
+        """Throttling, server errors and timeouts: smaller requests for a while"""
+        if not self.adaptive:
+            return
+        with self._lock:
+            self.size = max(self.min_size, self.size // 2)
+
+    def next_batch(self, token_counts: List[int], start: int, cap: int) -> Tuple[int, int, bool]:
+        """(end, tokens, was_full) of the batch starting at start; cap bounds it for parallelism"""
+        with self._lock:
+            size = self.size
+        limit = min(size, cap)
+        end, tokens = start, 0
+        while end < len(token_counts) and end - start < limit:
+            if end > start and tokens + token_counts[end] > self.max_tokens:
+                # Cut by the token budget: a larger size would not have helped
+                return end, tokens, False
+            tokens += token_counts[end]
+            end += 1
+        return end, tokens, end - start >= size
+
+
+class EmbeddingDispatcher:
+    """
+    Keeps several embedding batches in flight on a thread pool
+    The embedding call is latency-bound, so threads sharing one pooled
+    keep-alive HTTP client are enough. Retryable failures are retried with
+    full-jitter exponential backoff; batches that still fail are reported
+    back instead of being dropped silently. Batches are formed as earlier
+    ones finish, so their size follows the BatchSizer's latest decision.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                 max_workers: int = 4,
+                 requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None,
+                 max_retries: int = 5,
+                 retry_base_delay: float = 1.0,
+                 retry_max_delay: float = 60.0,
+                 is_retryable: Callable[[Exception], bool] = is_retryable_error,
+                 sizer: Optional[BatchSizer] = None):
+        self.embed_fn = embed_fn
+        self.max_workers = max(1, max_workers)
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.is_retryable = is_retryable
+        # None: fixed batches of the batch_size passed to embed()
+        self.sizer = sizer
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.tokens_sent = 0
+        self.batches = 0
+        self.fixed_size_batches = 0
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_max_delay))
+        return delay
+
+    def _run_batch(self, batch: List[str], tokens: int, sizer: BatchSizer, was_full: bool = False) -> List[List[float]]:
+        attempt = 0
+
+        while True:
+            self.limiter.acquire(tokens)
+            with self._stats_lock:
+                self.requests += 1
+                self.tokens_sent += tokens
+            EMBED_REQUESTS.inc()
+            EMBED_TEXTS.inc(len(batch))
+            EMBED_TOKENS.inc(tokens)
+
+            start = time.perf_counter()
+            try:
+                vectors = self.embed_fn(batch)
+                if len(vectors) != len(batch):
+                    raise ValueError(f"嵌入数量不匹配: 期望 {len(batch)}, 实际 {len(vectors)}")
+                elapsed = time.perf_counter() - start
+                EMBED_BATCH_SECONDS.observe(elapsed, outcome='ok')
+                sizer.record_success(len(batch), elapsed, was_full)
+                return vectors
+            except Exception as e:
+                EMBED_BATCH_SECONDS.observe(time.perf_counter() - start, outcome='error')
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+
+                sizer.record_error()
+
+                delay = self._backoff_delay(attempt, e)
+                if getattr(e, 'status_code', None) == 429:
+                    # Throttled: slow every worker down, not just this one
+                    self.limiter.pause(delay)
+
+                with self._stats_lock:
+                    self.retries += 1
+                EMBED_RETRIES.inc()
+                attempt += 1
+                time.sleep(delay)
+
+    def embed(self, texts: List[str], batch_size: int = 100,
+              on_batch: Optional[Callable[[List[Tuple[str, List[float]]]], None]] = None,
+              desc: str = "生成嵌入向量",
+              show_progress: bool = True) -> Tuple[Dict[str, List[float]], List[Tuple[str, str]]]:
+        """
+        Embed texts concurrently
+        batch_size is the fixed-size baseline that round-trips saved are counted against
+        on_batch is called from the calling thread with the (text, vector) pairs of each finished batch
+        Returns ({text: vector}, [(text, error message)] for permanently failed items)
+        """
+        vectors: Dict[str, List[float]] = {}
+        failed: List[Tuple[str, str]] = []
+        if not texts:
+            return vectors, failed
+
+        sizer = self.sizer or BatchSizer(batch_size, adaptive=False)
+        token_counts = [estimate_tokens(text) for text in texts]
+        # A backlog too small to give every worker a batch of the current size is split across
+        # the workers instead, but never below the fixed size; larger backlogs are packed freely
+        cap = len(texts)
+        if len(texts) < self.max_workers * sizer.size:
+            cap = max(batch_size, math.ceil(len(texts) / self.max_workers))
+        progress = None
+        if show_progress:
+            if tqdm is not None:
+                progress = tqdm(total=len(texts), desc=desc, unit="条")
+            else:
+                print(f"{desc}...")
+
+        position = 0
+        batches = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='embed') as executor:
+            futures = {}
+            while position < len(texts) or futures:
+                while position < len(texts) and len(futures) < self.max_workers:
+                    end, tokens, was_full = sizer.next_batch(token_counts, position, cap)
+                    batch = texts[position:end]
+                    futures[executor.submit(self._run_batch, batch, tokens, sizer, was_full)] = batch
+                    position = end
+                    batches += 1
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = futures.pop(future)
+                    if progress is not None:
+                        progress.update(len(batch))
+                    try:
+                        batch_vectors = list(zip(batch, future.result()))
+                    except Exception as e:
+                        failed.extend((text, str(e)) for text in batch)
+                        EMBED_FAILED_TEXTS.inc(len(batch))
+                        continue
+
+                    vectors.update(batch_vectors)
+                    if on_batch:
+                        on_batch(batch_vectors)
+
+        if progress is not None:
+            progress.close()
+        fixed_size_batches = math.ceil(len(texts) / max(1, batch_size))
+        with self._stats_lock:
+            self.batches += batches
+            self.fixed_size_batches += fixed_size_batches
+        EMBED_BATCHES.inc(batches)
+        EMBED_FIXED_SIZE_BATCHES.inc(fixed_size_batches)
+        return vectors, failed
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'tokens_sent': self.tokens_sent,
+            'batches': self.batches,
+            'round_trips_saved': self.fixed_size_batches - self.batches,
+            'batch_size': self.sizer.size if self.sizer else None
+        }
@@ -0,0 +1,193 @@
+import re
+import zlib
+import importlib.util
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional
+
+from embedding_dispatcher import is_retryable_error
+
+# Native output sizes, used when no explicit dimensions are requested
+OPENAI_MODEL_DIMENSIONS = {
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+    'text-embedding-ada-002': 1536,
+}
+# Models that accept a `dimensions` parameter (the API shortens and re-normalizes)
+SHORTENABLE_MODELS = ('text-embedding-3-small', 'text-embedding-3-large')
+
+
+class EmbeddingProvider(ABC):
+    """
+    Base class for embedding backends
+    Subclasses set `name`, `model` and `dimensions` and implement embed().
+    The (provider, model, dimensions) signature is stored on every collection
+    so queries are never run against vectors from a different embedder.
+    """
+
+    name = 'base'
+    # Remote providers go through rate limiting and concurrent dispatch
+    is_remote = False
+
+    def __init__(self, model: str, dimensions: int, requested_dimensions: Optional[int] = None):
+        self.model = model
+        self.dimensions = dimensions
+        # Dimensions explicitly requested from the backend (None = model default);
+        # part of the embedding cache key
+        self.requested_dimensions = requested_dimensions
+
+    @property
+    def cache_model(self) -> str:
+        """Model part of the embedding cache key"""
+        return self.model
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """One vector of self.dimensions floats per text, in order"""
+
+    def is_retryable(self, error: Exception) -> bool:
+        return is_retryable_error(error)
+
+    def without_client_retries(self) -> "EmbeddingProvider":
+        """Variant for callers that implement their own retry policy"""
+        return self
+
+    def signature(self) -> Dict:
+        """Collection metadata identifying the vectors this provider produces"""
+        return {
+            'embedding:provider': self.name,
+            'embedding:model': self.model,
+            'embedding:dimensions': self.dimensions
+        }
+
+    def describe(self) -> str:
+        return f"{self.name} / {self.model} ({self.dimensions} 维)"
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    OpenAI embeddings API backend
+    Without an explicit client, the openai package is imported and the client
+    created on the first embed() call, keeping it off the start-up path.
+    A base_url points it at another OpenAI-compatible endpoint; its vectors are
+    kept apart from the real API's in the collection signature and the cache.
+    """
+
+    name = 'openai'
+    is_remote = True
+
+    def __init__(self, client=None, model: str = 'text-embedding-3-small', dimensions: Optional[int] = None,
+                 api_key: Optional[str] = None, base_url: Optional[str] = None):
+        native = OPENAI_MODEL_DIMENSIONS.get(model, 1536)
+        if dimensions:
+            if model not in SHORTENABLE_MODELS:
+                raise ValueError(f"{model} 不支持自定义维度 (仅 {', '.join(SHORTENABLE_MODELS)})")
+            if not 0 < dimensions <= native:
+                raise ValueError(f"{model} 的维度必须在 1 到 {native} 之间: {dimensions}")
+        super().__init__(model, dimensions or native, requested_dimensions=dimensions)
+        self._client = client
+        self.api_key = api_key
+        self.base_url = base_url
+        # Set on copies made by without_client_retries()
+        self._base: Optional["OpenAIEmbeddingProvider"] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            if self._base is not None:
+                base_client = self._base.client
+                # The copy shares the client's connection pool
+                self._client = (base_client.with_options(max_retries=0)
+                                if hasattr(base_client, 'with_options') else base_client)
+            else:
+                import openai
+                # Stand-in endpoints accept any key, but the client refuses to start without one
+                api_key = self.api_key or ('unused' if self.base_url else None)
+                self._client = openai.OpenAI(api_key=api_key, base_url=self.base_url)
+        return self._client
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        kwargs = {'input': texts, 'model': self.model}
+        if self.requested_dimensions:
+            kwargs['dimensions'] = self.requested_dimensions
+        response = self.client.embeddings.create(**kwargs)
+        return [embedding_obj.embedding for embedding_obj in response.data]
+
+    def without_client_retries(self) -> "OpenAIEmbeddingProvider":
+        if self._client is not None and not hasattr(self._client, 'with_options'):
+            return self
+        copy = OpenAIEmbeddingProvider(None, self.model, self.requested_dimensions, base_url=self.base_url)
+        copy._base = self
+        return copy
+
+    @property
+    def cache_model(self) -> str:
+        return f"{self.model}@{self.base_url}" if self.base_url else self.model
+
+    def signature(self) -> Dict:
+        signature = super().signature()
+        if self.base_url:
+            signature['embedding:endpoint'] = self.base_url
+        return signature
+
+    def describe(self) -> str:
+        description = super().describe()
+        return f"{description} @ {self.base_url}" if self.base_url else description
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Fully local CPU embedder, no model download or network access
+    Hashes word tokens and character n-grams (feature hashing with a sign bit)
+    into a fixed-size vector and L2-normalizes it. It captures lexical and
+    sub-word similarity (stone ~ stones ~ T_Stone_Wall) rather than meaning,
+    which is a good fit for file names and works offline.
+    """
+
+    name = 'local'
+    MODEL = 'hashed-char-ngram-v1'
+
+    def __init__(self, dimensions: int = 512, ngram_min: int = 2, ngram_max: int = 4):
+        # numpy itself is imported on first embed()
+        if importlib.util.find_spec('numpy') is None:
+            raise ImportError("本地嵌入需要 numpy: pip install numpy")
+        super().__init__(self.MODEL, dimensions, requested_dimensions=dimensions)
+        self.ngram_min = ngram_min
+        self.ngram_max = ngram_max
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for token in re.findall(r'[a-z0-9]+|[^\sa-z0-9_\-.]', text.lower()):
+            features.append('w:' + token)
+            padded = f' {token} '
+            for n in range(self.ngram_min, self.ngram_max + 1):
+                features.extend('c:' + padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in self._features(text)), dtype=np.uint32)
+            if not hashes.size:
+                continue
+            indices = (hashes % self.dimensions).astype(np.int64)
+            signs = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], indices, signs)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+
+def create_embedding_provider(config, openai_client=None) -> EmbeddingProvider:
+    """Build the provider selected by Config.EMBEDDING_PROVIDER"""
+    provider = (config.EMBEDDING_PROVIDER or 'openai').lower()
+
+    if provider == 'openai':
+        return OpenAIEmbeddingProvider(openai_client, config.EMBEDDING_MODEL, dimensions=config.EMBEDDING_DIMENSIONS,
+                                       api_key=config.OPENAI_API_KEY, base_url=config.OPENAI_BASE_URL)
+
+    if provider == 'local':
+        return HashingEmbeddingProvider(dimensions=config.LOCAL_EMBEDDING_DIMENSIONS)
+
+    raise ValueError(f"未知的嵌入提供方: {config.EMBEDDING_PROVIDER} (可选: openai, local)")
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+本地 OpenAI 兼容嵌入服务 (压测用替身)
+实现 POST /v1/embeddings 接口，返回确定性的向量，可模拟延迟分布、429/500 错误和速率限制，
+用于在离线环境中可重复地测试并发、重试和吞吐量，不产生 API 费用
+
+用法:
+    python embedding_stub_server.py                                   # http://127.0.0.1:8766/v1
+    python embedding_stub_server.py --latency lognormal:120,0.4 --ms-per-1k-tokens 5
+    python embedding_stub_server.py --error-429 0.05 --error-500 0.01 --rpm 3000 --tpm 1000000
+
+然后在 .env 中设置 OPENAI_BASE_URL=http://127.0.0.1:8766/v1 (OPENAI_API_KEY 可任意填写)
+
+延迟分布 (毫秒): 50 | fixed:50 | uniform:20,80 | normal:50,10 | lognormal:<中位数>,<sigma> | exp:<均值>
+
+接口:
+    POST /v1/embeddings   与 OpenAI 相同的请求/响应格式 (支持 dimensions 和 encoding_format=float/base64)
+    GET  /v1/models
+    GET  /stats           请求数、文本数、Token 数、各状态码次数、最大并发
+"""
+
+import sys
+import json
+import math
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import numpy as np
+    from embedding_providers import HashingEmbeddingProvider, OPENAI_MODEL_DIMENSIONS, SHORTENABLE_MODELS
+    from embedding_dispatcher import estimate_tokens
+except ImportError as e:
+    print(f"导入模块失败: {e}")
+    print("请确保已安装所有依赖包：pip install -r requirements.txt")
+    sys.exit(1)
+
+# Limits of the real endpoint, enforced so clients that exceed them fail here too
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_INPUT = 8192
+MAX_TOKENS_PER_REQUEST = 300_000
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal', 'exp')
+
+
+class StubError(Exception):
+    """An error response in the OpenAI error format"""
+
+    def __init__(self, status: int, message: str, error_type: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.error_type = error_type
+        self.retry_after = retry_after
+
+
+def parse_latency(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """'50', 'fixed:50', 'uniform:20,80', 'normal:50,10', 'lognormal:50,0.5', 'exp:50' (milliseconds)"""
+    kind, _, params = spec.partition(':')
+    if not params:
+        kind, params = 'fixed', kind
+    kind = kind.strip().lower()
+    try:
+        values = tuple(float(value) for value in params.split(','))
+    except ValueError:
+        raise ValueError(f"无效的延迟分布: {spec}")
+    expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}.get(kind)
+    if expected is None:
+        raise ValueError(f"未知的延迟分布: {kind} (可选: {', '.join(LATENCY_DISTRIBUTIONS)})")
+    if len(values) != expected or any(value < 0 for value in values):
+        raise ValueError(f"延迟分布 {kind} 需要 {expected} 个非负参数: {spec}")
+    return kind, values
+
+
+def _sample_latency(rng: random.Random, kind: str, params: Tuple[float, ...]) -> float:
+    """One latency sample in milliseconds"""
+    if kind == 'fixed':
+        return params[0]
+    if kind == 'uniform':
+        return rng.uniform(*params)
+    if kind == 'normal':
+        return max(0.0, rng.gauss(*params))
+    if kind == 'lognormal':
+        return rng.lognormvariate(math.log(params[0]), params[1]) if params[0] > 0 else 0.0
+    return rng.expovariate(1.0 / params[0]) if params[0] else 0.0
+
+
+class _TokenBucket:
+    """Non-blocking per-minute budget; wait_for() reports how long a request would have to wait"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.last = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.last) * self.rate)
+        self.last = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class EmbeddingStub:
+    """
+    Request handling of the stand-in, independent of HTTP
+    Vectors are deterministic per (model, dimensions, text): 'hashed' reuses the local
+    n-gram embedder so search results stay meaningful, 'random' is a seeded Gaussian.
+    """
+
+    def __init__(self, latency: str = '0', ms_per_1k_tokens: float = 0.0,
+                 error_429: float = 0.0, error_500: float = 0.0, retry_after: Optional[float] = 1.0,
+                 requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 vectors: str = 'hashed', seed: int = 0):
+        if vectors not in ('hashed', 'random'):
+            raise ValueError(f"未知的向量类型: {vectors} (可选: hashed, random)")
+        if not (0 <= error_429 <= 1 and 0 <= error_500 <= 1 and error_429 + error_500 <= 1):
+            raise ValueError("错误注入比例必须在 0 到 1 之间，且两者之和不超过 1")
+        self.latency = parse_latency(latency)
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.retry_after = retry_after
+        self.vectors = vectors
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._requests_bucket = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens_bucket = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._embedders: Dict[int, HashingEmbeddingProvider] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.started = time.time()
+            self.requests = 0
+            self.inputs = 0
+            self.tokens = 0
+            self.statuses: Dict[str, int] = {}
+            self.injected: Dict[str, int] = {'429': 0, '500': 0}
+            self.rate_limited = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            uptime = time.time() - self.started
+            return {
+                'uptime_seconds': uptime,
+                'requests': self.requests,
+                'inputs': self.inputs,
+                'tokens': self.tokens,
+                'statuses': dict(self.statuses),
+                'injected_errors': dict(self.injected),
+                'rate_limited': self.rate_limited,
+                'max_in_flight': self.max_in_flight,
+                'inputs_per_second': self.inputs / uptime if uptime else 0.0
+            }
+
+    def _embed(self, texts: List[str], model: str, dimensions: int) -> np.ndarray:
+        if self.vectors == 'hashed':
+            with self._lock:
+                embedder = self._embedders.get(dimensions)
+                if embedder is None:
+                    embedder = self._embedders[dimensions] = HashingEmbeddingProvider(dimensions=dimensions)
+            return np.asarray(embedder.embed(texts), dtype=np.float32)
+
+        matrix = np.empty((len(texts), dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            digest = hashlib.sha256(f"{self.seed}\0{model}\0{text}".encode('utf-8')).digest()
+            matrix[row] = np.random.default_rng(int.from_bytes(digest[:8], 'little')).standard_normal(dimensions)
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    @staticmethod
+    def _parse(body: Dict) -> Tuple[List[str], str, int, str]:
+        model = body.get('model')
+        if not isinstance(model, str) or not model:
+            raise StubError(400, "'model' is required", 'invalid_request_error')
+        texts = body.get('input')
+        if isinstance(texts, str):
+            texts = [texts]
+        if not isinstance(texts, list) or not texts:
+            raise StubError(400, "'input' must be a non-empty string or array", 'invalid_request_error')
+        if all(isinstance(item, int) for item in texts):
+            texts = [texts]
+        # Pre-tokenized inputs (arrays of token ids) are embedded as the text of the ids
+        texts = [' '.join(map(str, item)) if isinstance(item, list) else item for item in texts]
+        if not all(isinstance(text, str) and text for text in texts):
+            raise StubError(400, "'input' items must be non-empty strings", 'invalid_request_error')
+        if len(texts) > MAX_INPUTS_PER_REQUEST:
+            raise StubError(400, f"'input' must have at most {MAX_INPUTS_PER_REQUEST} items", 'invalid_request_error')
+
+        native = OPENAI_MODEL_DIMENSIONS.get(model, 1536)
+        dimensions = body.get('dimensions')
+        if dimensions is not None:
+            if model not in SHORTENABLE_MODELS:
+                raise StubError(400, f"{model} does not support 'dimensions'", 'invalid_request_error')
+            if not isinstance(dimensions, int) or not 0 < dimensions <= native:
+                raise StubError(400, f"'dimensions' must be between 1 and {native}", 'invalid_request_error')
+        encoding_format = body.get('encoding_format') or 'float'
+        if encoding_format not in ('float', 'base64'):
+            raise StubError(400, "'encoding_format' must be 'float' or 'base64'", 'invalid_request_error')
+        return texts, model, dimensions or native, encoding_format
+
+    def _admit(self, tokens: int):
+        """Injected errors first, then the rate limits; raises StubError when the request is refused"""
+        with self._lock:
+            self.requests += 1
+            draw = self._rng.random()
+            if draw < self.error_429:
+                self.injected['429'] += 1
+                raise StubError(429, "Rate limit reached (injected)", 'rate_limit_exceeded', self.retry_after)
+            if draw < self.error_429 + self.error_500:
+                self.injected['500'] += 1
+                raise StubError(500, "The server had an error while processing your request (injected)",
+                                'server_error')
+
+            now = time.monotonic()
+            wait = 0.0
+            for bucket, amount in ((self._requests_bucket, 1), (self._tokens_bucket, tokens)):
+                if bucket:
+                    wait = max(wait, bucket.wait_for(amount, now))
+            if wait > 0:
+                self.rate_limited += 1
+                raise StubError(429, f"Rate limit reached, please try again in {wait:.3f}s",
+                                'rate_limit_exceeded', wait)
+            for bucket, amount in ((self._requests_bucket, 1), (self._tokens_bucket, tokens)):
+                if bucket:
+                    bucket.take(amount)
+
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay_ms = _sample_latency(self._rng, *self.latency) + tokens / 1000.0 * self.ms_per_1k_tokens
+        return delay_ms / 1000.0
+
+    def count_status(self, status: int):
+        with self._lock:
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def create_embeddings(self, body: Dict) -> Dict:
+        texts, model, dimensions, encoding_format = self._parse(body)
+        token_counts = [estimate_tokens(text) for text in texts]
+        if max(token_counts) > MAX_TOKENS_PER_INPUT:
+            raise StubError(400, f"An input exceeds the maximum of {MAX_TOKENS_PER_INPUT} tokens",
+                            'invalid_request_error')
+        tokens = sum(token_counts)
+        if tokens > MAX_TOKENS_PER_REQUEST:
+            raise StubError(400, f"Requested {tokens} tokens, max {MAX_TOKENS_PER_REQUEST} tokens per request",
+                            'max_tokens_per_request')
+
+        delay = self._admit(tokens)
+        try:
+            started = time.perf_counter()
+            matrix = self._embed(texts, model, dimensions)
+            # The simulated latency includes the time spent computing the vectors
+            time.sleep(max(0.0, delay - (time.perf_counter() - started)))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.inputs += len(texts)
+                self.tokens += tokens
+
+        if encoding_format == 'base64':
+            data = [base64.b64encode(row.astype('<f4').tobytes()).decode('ascii') for row in matrix]
+        else:
+            data = matrix.tolist()
+        return {
+            'object': 'list',
+            'data': [{'object': 'embedding', 'index': index, 'embedding': embedding}
+                     for index, embedding in enumerate(data)],
+            'model': model,
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+        }
+
+
+class _StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.stub.count_status(status)  # type: ignore
+
+    def _send_error(self, error: StubError):
+        headers = {}
+        if error.retry_after is not None:
+            headers['Retry-After'] = f"{error.retry_after:.3f}"
+            headers['Retry-After-Ms'] = str(int(error.retry_after * 1000))
+        payload = {'error': {'message': str(error), 'type': error.error_type, 'param': None, 'code': None}}
+        self._send_json(error.status, payload, headers)
+
+    def do_GET(self):
+        stub: EmbeddingStub = self.server.stub  # type: ignore
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path == '/stats':
+            self._send_json(200, stub.stats())
+        elif path == '/v1/models':
+            self._send_json(200, {'object': 'list', 'data': [
+                {'id': model, 'object': 'model', 'owned_by': 'stub'} for model in OPENAI_MODEL_DIMENSIONS]})
+        else:
+            self._send_error(StubError(404, f"Unknown path: {path}", 'invalid_request_error'))
+
+    def do_POST(self):
+        stub: EmbeddingStub = self.server.stub  # type: ignore
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if self.path.split('?', 1)[0].rstrip('/') != '/v1/embeddings':
+            self._send_error(StubError(404, f"Unknown path: {self.path}", 'invalid_request_error'))
+            return
+        try:
+            try:
+                body = json.loads(raw.decode('utf-8'))
+            except (UnicodeDecodeError, ValueError):
+                raise StubError(400, "Request body is not valid JSON", 'invalid_request_error')
+            if not isinstance(body, dict):
+                raise StubError(400, "Request body must be a JSON object", 'invalid_request_error')
+            self._send_json(200, stub.create_embeddings(body))
+        except StubError as e:
+            self._send_error(e)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EmbeddingStubServer:
+    """Runs an EmbeddingStub over HTTP on a background thread; base_url is ready for OPENAI_BASE_URL"""
+
+    def __init__(self, stub: Optional[EmbeddingStub] = None, host: str = '127.0.0.1', port: int = 0):
+        self.stub = stub or EmbeddingStub()
+        self.httpd = ThreadingHTTPServer((host, port), _StubRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self.stub  # type: ignore
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "EmbeddingStubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='embedding-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """Options describing the simulated endpoint, shared with the benchmarks"""
+    parser.add_argument('--latency', default='0', help="每个请求的基础延迟分布 (毫秒)，如 lognormal:120,0.4")
+    parser.add_argument('--ms-per-1k-tokens', type=float, default=0.0, help="每 1000 个 Token 额外增加的延迟 (毫秒)")
+    parser.add_argument('--error-429', type=float, default=0.0, help="随机返回 429 的请求比例")
+    parser.add_argument('--error-500', type=float, default=0.0, help="随机返回 500 的请求比例")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="注入的 429 附带的 Retry-After 秒数")
+    parser.add_argument('--rpm', type=int, default=None, help="每分钟请求数上限，超出返回 429")
+    parser.add_argument('--tpm', type=int, default=None, help="每分钟 Token 数上限，超出返回 429")
+    parser.add_argument('--vectors', choices=('hashed', 'random'), default='hashed',
+                        help="hashed: 本地 n-gram 嵌入 (搜索结果有意义); random: 按文本播种的随机向量")
+    parser.add_argument('--seed', type=int, default=0, help="错误注入和延迟采样的随机种子")
+
+
+def stub_from_args(args) -> EmbeddingStub:
+    return EmbeddingStub(latency=args.latency, ms_per_1k_tokens=args.ms_per_1k_tokens,
+                         error_429=args.error_429, error_500=args.error_500, retry_after=args.retry_after,
+                         requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                         vectors=args.vectors, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容嵌入服务 (压测用替身)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        server = EmbeddingStubServer(stub_from_args(args), args.host, args.port)
+    except (ValueError, OSError) as e:
+        print(f"✗ 服务启动失败: {e}")
+        sys.exit(1)
+
+    print(f"✓ 嵌入替身服务已启动: {server.base_url}，按 Ctrl+C 停止")
+    print(f"  设置 OPENAI_BASE_URL={server.base_url} 后，索引和搜索将使用此服务")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+        print(json.dumps(server.stub.stats(), ensure_ascii=False))
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
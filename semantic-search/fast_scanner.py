@@ -0,0 +1,105 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Tuple, Optional, Iterator, NamedTuple, Callable, Set, Iterable
+
+
+class FileRecord(NamedTuple):
+    """Lightweight record yielded by the scanner"""
+    path: str
+    name: str
+    parent: str
+    size: int
+    mtime: float
+
+
+def _scan_directory(directory: str, extensions: Optional[Set[str]]) -> Tuple[List[FileRecord], List[str], List[Tuple[str, OSError]]]:
+    """
+    Scan a single directory level
+    DirEntry type checks use the d_type/FindData returned by the directory read
+    itself, and files with unwanted extensions are skipped before any stat call.
+    On Windows entry.stat() is served from the same data; on POSIX it is one syscall.
+    """
+    files, subdirs, errors = [], [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    # Symlinked directories are not followed, which also avoids cycles
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    if extensions and os.path.splitext(entry.name)[1].lower() not in extensions:
+                        continue
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    files.append(FileRecord(entry.path, entry.name, directory, stat.st_size, stat.st_mtime))
+                except OSError as e:
+                    errors.append((entry.path, e))
+    except OSError as e:
+        errors.append((directory, e))
+    return files, subdirs, errors
+
+
+def is_under(path: str, directories: Iterable[str]) -> bool:
+    """True when path is one of directories or lies anywhere below one of them"""
+    return any(path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+               for directory in directories)
+
+
+def scan_tree(root_path: str, extensions: Optional[Set[str]] = None, max_workers: int = 8,
+              on_error: Optional[Callable[[str, OSError], None]] = None,
+              on_directory: Optional[Callable[[str, List[str], int], None]] = None,
+              skip_dirs: Optional[Dict[str, List[str]]] = None,
+              failed_dirs: Optional[Set[str]] = None) -> Iterator[FileRecord]:
+    """
+    Walk root_path with a pool of workers, one directory per task, yielding
+    FileRecords as directories finish. At most a few directories per worker
+    are in flight, so a slow consumer throttles the scan instead of the
+    scanner buffering the whole tree.
+    extensions:   lower-case suffixes to keep (e.g. {'.tga'}); None keeps everything
+    on_directory: called with (directory, subdirs, file count) before the files of a directory
+                  that was listed without errors are yielded
+    skip_dirs:    directories that are not listed again; their files are skipped and the
+                  given subdirectories are walked instead (resuming an interrupted index run)
+    failed_dirs:  filled with the directories that could not be listed completely; files
+                  below them may be missing from the scan, so callers must not treat
+                  those as deleted (see is_under)
+    """
+    root_path = os.path.abspath(root_path)
+    max_workers = max(1, max_workers)
+    max_in_flight = max_workers * 4
+    waiting = deque([root_path])
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan')
+    in_flight: Dict = {}  # future -> directory
+    try:
+        while waiting or in_flight:
+            while waiting and len(in_flight) < max_in_flight:
+                directory = waiting.popleft()
+                if skip_dirs and directory in skip_dirs:
+                    waiting.extend(skip_dirs[directory])
+                    continue
+                in_flight[executor.submit(_scan_directory, directory, extensions)] = directory
+            if not in_flight:
+                continue
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                directory = in_flight.pop(future)
+                files, subdirs, errors = future.result()
+                waiting.extend(subdirs)
+                if errors and failed_dirs is not None:
+                    failed_dirs.add(directory)
+                if on_error:
+                    for path, error in errors:
+                        on_error(path, error)
+                if on_directory and not errors:
+                    on_directory(directory, subdirs, len(files))
+                yield from files
+    finally:
+        # Consumer stopped early (or failed): don't keep scanning in the background
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=False)
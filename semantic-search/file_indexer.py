@@ -1,77 +1,153 @@
 import os
+import stat
+import time
 import hashlib
 import sys
 from pathlib import Path
-from typing import List, Dict, Tuple
-
-try:
-    from tqdm import tqdm
-except ImportError:
-    # Simple fallback if tqdm is not available
-    def tqdm(iterable, desc="Processing", **kwargs):
-        print(f"{desc}...")
-        return iterable
-
-try:
-    import openai
-except ImportError:
-    print("错误: openai 模块未安装")
-    print("请运行: pip install openai")
-    sys.exit(1)
+from typing import List, Dict, Tuple, Optional, Iterator, Set
 
 try:
     from config import Config
+    from embedding_cache import EmbeddingCache
+    from embedding_dispatcher import EmbeddingDispatcher, BatchSizer
+    from fast_scanner import scan_tree
+    from embedding_providers import EmbeddingProvider
+    from index_manifest import IndexManifest
+    from query_filters import asset_type_for, directory_names
+    from metrics import FILES_SCANNED, SCAN_SECONDS
 except ImportError:
     print("错误: 无法导入 config 模块")
     sys.exit(1)
 
 class FileIndexer:
-    def __init__(self, openai_client):
-        self.client = openai_client
+    def __init__(self, provider: EmbeddingProvider):
+        self.provider = provider
         self.config = Config()
+        # The dispatcher does its own retrying, so client-side retries are disabled
+        dispatch_provider = provider.without_client_retries()
+        batching = (self.config.EMBEDDING_BATCHING or 'adaptive').lower()
+        if batching not in ('adaptive', 'fixed'):
+            raise ValueError(f"未知的批处理方式: {self.config.EMBEDDING_BATCHING} (可选: adaptive, fixed)")
+        self.dispatcher = EmbeddingDispatcher(
+            dispatch_provider.embed,
+            # Local embedders are CPU-bound; only remote APIs benefit from concurrency and budgets
+            max_workers=self.config.EMBEDDING_CONCURRENCY if provider.is_remote else 1,
+            requests_per_minute=self.config.EMBEDDING_REQUESTS_PER_MINUTE if provider.is_remote else None,
+            tokens_per_minute=self.config.EMBEDDING_TOKENS_PER_MINUTE if provider.is_remote else None,
+            max_retries=self.config.EMBEDDING_MAX_RETRIES,
+            retry_base_delay=self.config.EMBEDDING_RETRY_BASE_DELAY,
+            retry_max_delay=self.config.EMBEDDING_RETRY_MAX_DELAY,
+            is_retryable=provider.is_retryable,
+            sizer=BatchSizer(
+                self.config.EMBEDDING_BATCH_SIZE,
+                adaptive=batching == 'adaptive',
+                max_inputs=self.config.EMBEDDING_MAX_BATCH_INPUTS,
+                max_tokens=self.config.EMBEDDING_MAX_BATCH_TOKENS,
+                target_seconds=self.config.EMBEDDING_TARGET_BATCH_SECONDS
+            )
+        )
+        self.last_failures: List[Tuple[Dict, str]] = []
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if self.config.EMBEDDING_CACHE_ENABLED:
+            self.embedding_cache = EmbeddingCache(
+                self.config.EMBEDDING_CACHE_PATH,
+                model=provider.cache_model,
+                dimensions=provider.requested_dimensions,
+                max_entries=self.config.EMBEDDING_CACHE_MAX_ENTRIES,
+                ttl_seconds=self.config.EMBEDDING_CACHE_TTL_DAYS * 86400 if self.config.EMBEDDING_CACHE_TTL_DAYS else None
+            )
     
+    @property
+    def embed_chunk_size(self) -> int:
+        """Texts needed for every embedding worker to send a batch of the largest allowed size"""
+        return self.dispatcher.max_workers * self.dispatcher.sizer.max_inputs
+
     def discover_files(self, root_path: str) -> List[Dict]:
         """
         Discover all files in the given directory and subdirectories
         Returns list of file info dictionaries
         """
-        files_info = []
+        print(f"正在扫描目录: {Path(root_path)}")
+        files_info = list(self.iter_files(root_path))
+        print(f"发现 {len(files_info)} 个文件")
+        return files_info
+    
+    def iter_files(self, root_path: str, on_directory=None, skip_dirs: Optional[Dict[str, List[str]]] = None,
+                   failed_dirs: Optional[Set[str]] = None) -> Iterator[Dict]:
+        """
+        Lazily yield file info dictionaries for all indexable files under root_path
+        Backed by the parallel os.scandir scanner, so the file list is never materialized
+        on_directory / skip_dirs / failed_dirs are passed to the scanner (see fast_scanner.scan_tree);
+        when the walk stops early, root_path itself is added to failed_dirs
+        """
+        def skip(path: str, error: OSError):
+            print(f"跳过文件 {path}: {error}")
         
+        # Scan time excludes the time the consumer holds the generator suspended;
+        # metrics are flushed in batches to keep the per-file overhead down
+        scanned, busy = 0, 0.0
+        resumed = time.perf_counter()
         try:
-            root_path_obj = Path(root_path)
-            
-            print(f"正在扫描目录: {root_path_obj}")
-            
-            # Walk through all files and subdirectories
-            for file_path in root_path_obj.rglob('*'):
-                if file_path.is_file():
-                    # Check if file extension should be indexed
-                    file_ext = file_path.suffix.lower()
-                    if not self.config.INDEXED_EXTENSIONS or file_ext in self.config.INDEXED_EXTENSIONS:
-                        try:
-                            file_info = {
-                                'path': str(file_path.absolute()),
-                                'name': file_path.name,
-                                'stem': file_path.stem,  # filename without extension
-                                'extension': file_ext,
-                                'parent': str(file_path.parent),
-                                'size': file_path.stat().st_size,
-                                'modified_time': file_path.stat().st_mtime
-                            }
-                            
-                            # Generate unique ID for the file
-                            file_info['id'] = self._generate_file_id(file_info['path'])
-                            files_info.append(file_info)
-                        except (OSError, PermissionError) as e:
-                            print(f"跳过文件 {file_path}: {e}")
-                            continue
-            
-            print(f"发现 {len(files_info)} 个文件")
-            return files_info
+            for record in scan_tree(root_path,
+                                    extensions=self.config.INDEXED_EXTENSIONS or None,
+                                    max_workers=self.config.SCAN_WORKERS,
+                                    on_error=skip,
+                                    on_directory=on_directory,
+                                    skip_dirs=skip_dirs,
+                                    failed_dirs=failed_dirs):
+                file_info = self._build_file_info(record.path, record.name, record.parent, record.size, record.mtime)
+                scanned += 1
+                busy += time.perf_counter() - resumed
+                if scanned % 1000 == 0:
+                    FILES_SCANNED.inc(1000)
+                    SCAN_SECONDS.inc(busy)
+                    busy = 0.0
+                resumed = None
+                yield file_info
+                resumed = time.perf_counter()
             
         except Exception as e:
             print(f"扫描目录时出错: {e}")
-            return []
+            if failed_dirs is not None:
+                failed_dirs.add(os.path.abspath(root_path))
+        finally:
+            if resumed is not None:
+                busy += time.perf_counter() - resumed
+            FILES_SCANNED.inc(scanned % 1000)
+            SCAN_SECONDS.inc(busy)
+    
+    def file_info_for_path(self, file_path: str) -> Optional[Dict]:
+        """
+        File info for a single path, or None if it is gone, not a regular file
+        or not an indexed extension (used for watcher events)
+        """
+        name = os.path.basename(file_path)
+        extensions = self.config.INDEXED_EXTENSIONS
+        if extensions and os.path.splitext(name)[1].lower() not in extensions:
+            return None
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(file_stat.st_mode):
+            return None
+        return self._build_file_info(file_path, name, os.path.dirname(file_path), file_stat.st_size, file_stat.st_mtime)
+    
+    def _build_file_info(self, path: str, name: str, parent: str, size: int, mtime: float) -> Dict:
+        stem, file_ext = os.path.splitext(name)
+        file_info = {
+            'path': path,
+            'name': name,
+            'stem': stem,  # filename without extension
+            'extension': file_ext.lower(),
+            'parent': parent,
+            'size': size,
+            'modified_time': mtime
+        }
+        
+        # Generate unique ID for the file
+        file_info['id'] = self._generate_file_id(file_info['path'])
+        return file_info
     
     def _generate_file_id(self, file_path: str) -> str:
         """Generate unique ID for a file based on its path"""
@@ -151,16 +227,46 @@ class FileIndexer:
         }
         return ext_descriptions.get(extension.lower(), '')
     
-    def generate_embeddings(self, files_info: List[Dict]) -> List[Tuple[str, List[float], Dict]]:
+    def build_metadata(self, file_info: Dict, searchable_text: Optional[str] = None) -> Dict:
+        """Build the collection metadata stored alongside a file's embedding"""
+        if searchable_text is None:
+            searchable_text = self.create_searchable_text(file_info)
+        
+        metadata = {
+            'file_path': file_info['path'],
+            'file_name': file_info['name'],
+            'file_stem': file_info['stem'],
+            'file_extension': file_info['extension'],
+            'file_parent': file_info['parent'],
+            'searchable_text': searchable_text,
+            'file_size': file_info['size'],
+            'file_mtime': file_info['modified_time'],
+            # Facets for type: and dir: filters, evaluated inside the vector query
+            'asset_type': asset_type_for(file_info['stem']),
+            'metadata_version': IndexManifest.METADATA_VERSION
+        }
+        
+        # Chroma rejects empty lists, so files at a filesystem root have no dir_names
+        dir_names = directory_names(file_info['parent'])
+        if dir_names:
+            metadata['dir_names'] = dir_names
+        return metadata
+    
+    def generate_embeddings(self, files_info: List[Dict], verbose: bool = True) -> List[Tuple[str, List[float], Dict]]:
         """
         Generate embeddings for all files
+        Texts already in the embedding cache are served locally; only misses hit the API
+        Files that could not be embedded are left in self.last_failures as (file_info, error)
         Returns list of (id, embedding, metadata) tuples
         """
-        print("正在生成文件嵌入向量...")
+        if verbose:
+            print("正在生成文件嵌入向量...")
         embeddings_data = []
+        self.last_failures = []
         
         if not files_info:
-            print("没有文件需要处理")
+            if verbose:
+                print("没有文件需要处理")
             return embeddings_data
         
         # Prepare texts for embedding
@@ -169,38 +275,46 @@ class FileIndexer:
             searchable_text = self.create_searchable_text(file_info)
             texts.append(searchable_text)
         
-        # Generate embeddings in batches for efficiency
-        batch_size = 100
-        for i in tqdm(range(0, len(texts), batch_size), desc="生成嵌入向量"):
-            batch_texts = texts[i:i + batch_size]
-            batch_files = files_info[i:i + batch_size]
-            
-            try:
-                response = self.client.embeddings.create(
-                    input=batch_texts,
-                    model=self.config.EMBEDDING_MODEL
-                )
-                
-                for j, embedding_obj in enumerate(response.data):
-                    file_info = batch_files[j]
-                    embedding = embedding_obj.embedding
-                    
-                    metadata = {
-                        'file_path': file_info['path'],
-                        'file_name': file_info['name'],
-                        'file_stem': file_info['stem'],
-                        'file_extension': file_info['extension'],
-                        'file_parent': file_info['parent'],
-                        'searchable_text': texts[i + j],
-                        'file_size': file_info['size']
-                    }
-                    
-                    embeddings_data.append((file_info['id'], embedding, metadata))
-                    
-            except Exception as e:
-                print(f"生成嵌入向量时出错: {e}")
-                # 继续处理其他批次
+        vectors = self.embedding_cache.get_many(texts) if self.embedding_cache else {}
+        if self.embedding_cache and verbose:
+            print(f"嵌入缓存命中 {len(vectors)} 条")
+        
+        # Only unique texts missing from the cache are sent to the API
+        pending_texts = list(dict.fromkeys(text for text in texts if text not in vectors))
+        
+        # Generate embeddings in concurrent batches; the cache is filled as batches finish
+        api_vectors, failed = self.dispatcher.embed(
+            pending_texts,
+            batch_size=self.config.EMBEDDING_BATCH_SIZE,
+            on_batch=self.embedding_cache.put_many if self.embedding_cache else None,
+            show_progress=verbose
+        )
+        vectors.update(api_vectors)
+        errors = dict(failed)
+        
+        for file_info, searchable_text in zip(files_info, texts):
+            embedding = vectors.get(searchable_text)
+            if embedding is None:
+                self.last_failures.append((file_info, errors.get(searchable_text, '未知错误')))
                 continue
+            metadata = self.build_metadata(file_info, searchable_text)
+            embeddings_data.append((file_info['id'], embedding, metadata))
         
-        print(f"成功生成 {len(embeddings_data)} 个文件的嵌入向量")
-        return embeddings_data 
\ No newline at end of file
+        if verbose:
+            print(f"成功生成 {len(embeddings_data)} 个文件的嵌入向量")
+            if self.last_failures:
+                self.report_failures(self.last_failures)
+        return embeddings_data
+    
+    def report_failures(self, failures: List[Tuple[Dict, str]]):
+        """Report files that still failed after all retries"""
+        print(f"警告: {len(failures)} 个文件在重试 {self.config.EMBEDDING_MAX_RETRIES} 次后仍未能生成嵌入向量")
+        errors: Dict[str, int] = {}
+        for _, error in failures:
+            errors[error] = errors.get(error, 0) + 1
+        for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+            print(f"    {count} 个: {error}")
+        for file_info, _ in failures[:10]:
+            print(f"    失败文件: {file_info['path']}")
+        if len(failures) > 10:
+            print(f"    ... 以及另外 {len(failures) - 10} 个文件")
@@ -0,0 +1,231 @@
+import os
+import time
+import random
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vector_quantization import top_k
+from chroma_writer import ChunkedWriter, client_max_batch_size
+
+DEFAULT_M = (8, 16, 32)
+DEFAULT_CONSTRUCTION_EF = (100, 200)
+DEFAULT_SEARCH_EF = (10, 25, 50, 100, 200)
+DEFAULT_TARGET_RECALL = 0.95
+
+# Corpus rows scored at once while computing the exact ground truth
+_EXACT_BLOCK_ROWS = 16384
+# Settings whose p50 is within this fraction of the fastest one count as equally fast
+_LATENCY_TOLERANCE = 0.1
+
+
+def parse_grid(text: Optional[str], default: Sequence[int]) -> List[int]:
+    """Comma-separated positive integers ("8,16,32"), or the default grid"""
+    if not text:
+        return list(default)
+    values = sorted({int(value) for value in text.split(',') if value.strip()})
+    if not values or values[0] <= 0:
+        raise ValueError(f"参数网格必须是逗号分隔的正整数: {text}")
+    return values
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def load_collection(collection, limit: Optional[int] = None,
+                    page_size: int = 5000) -> Tuple[List[str], np.ndarray, List[Dict]]:
+    """(ids, float32 vectors, metadatas) of a collection, at most limit rows"""
+    total = collection.count() if limit is None else min(limit, collection.count())
+    ids, rows, metadatas = [], [], []
+    for offset in range(0, total, page_size):
+        page = collection.get(include=['embeddings', 'metadatas'], limit=min(page_size, total - offset),
+                              offset=offset)
+        ids.extend(page['ids'])
+        rows.append(np.asarray(page['embeddings'], dtype=np.float32))
+        metadatas.extend(page['metadatas'] or [{}] * len(page['ids']))
+    matrix = np.concatenate(rows) if rows else np.empty((0, 0), dtype=np.float32)
+    return ids, matrix, metadatas
+
+
+def sample_query_texts(stems: Sequence[str], split_words: Callable[[str], List[str]], count: int,
+                       seed: int = 7) -> List[str]:
+    """Short keyword queries ("stone normal") built from words of random file names"""
+    rng = random.Random(seed)
+    queries = []
+    for stem in rng.sample(list(stems), min(count, len(stems))):
+        words = [word.lower() for word in split_words(stem) if len(word) > 1]
+        if words:
+            queries.append(' '.join(rng.sample(words, min(2, len(words)))))
+    return queries
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Row indices of the k nearest vectors by cosine similarity, computed block by block"""
+    queries = _normalized(np.asarray(queries, dtype=np.float32))
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(corpus), _EXACT_BLOCK_ROWS):
+        block = _normalized(np.asarray(corpus[start:start + _EXACT_BLOCK_ROWS], dtype=np.float32))
+        rows, scores = top_k(queries @ block.T, k)
+        merged_rows = np.concatenate([best_rows, rows + start], axis=1)
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        order, best_scores = top_k(merged_scores, k)
+        best_rows = np.take_along_axis(merged_rows, order, axis=1)
+    return best_rows
+
+
+def recall_at_k(found: Sequence[Sequence[int]], truth: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(found, truth.tolist()))
+    return hits / max(1, truth.size)
+
+
+def _chroma_client(path: str):
+    import chromadb
+    from chromadb.config import Settings
+    return chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+
+
+def _index_bytes(path: str) -> int:
+    """Size of the HNSW segment directories (the SQLite file also holds the raw vectors)"""
+    total = 0
+    for entry in os.scandir(path):
+        if entry.is_dir():
+            for parent, _, names in os.walk(entry.path):
+                total += sum(os.path.getsize(os.path.join(parent, name)) for name in names)
+    return total
+
+
+def _measure(path: str, collection_name: str, search_ef: int, queries: np.ndarray,
+             k: int) -> Tuple[List[float], List[List[int]]]:
+    """
+    Per-query latencies and result rows at one search_ef
+    Runs in a fresh process: Chroma keeps a loaded index for the life of the
+    process and only applies a changed ef_search before that first load.
+    """
+    collection = _chroma_client(path).get_collection(collection_name)
+    collection.modify(configuration={'hnsw': {'ef_search': search_ef}})
+    query_rows = queries.tolist()
+    collection.query(query_embeddings=query_rows[:1], n_results=k, include=[])  # loads the index
+    samples, found = [], []
+    for query in query_rows:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        samples.append(time.perf_counter() - start)
+        found.append([int(row_id) for row_id in result['ids'][0]])
+    return samples, found
+
+
+def sweep(corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, m_values: Sequence[int],
+          construction_values: Sequence[int], search_values: Sequence[int], k: int = 10,
+          progress: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    """
+    Build a scratch Chroma collection for every (M, construction_ef) and query
+    it at every search_ef; one result dict per grid point
+    """
+    workspace = tempfile.mkdtemp(prefix='semantic_hnsw_')
+    spawn = multiprocessing.get_context('spawn')
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn, max_tasks_per_child=1) as measurer:
+            for m in m_values:
+                for construction_ef in construction_values:
+                    path = os.path.join(workspace, f'M{m}-ef{construction_ef}')
+                    name = f'tune-M{m}-ef{construction_ef}'
+                    client = _chroma_client(path)
+                    collection = client.create_collection(name, metadata={
+                        'hnsw:space': 'cosine', 'hnsw:M': m, 'hnsw:construction_ef': construction_ef})
+                    rows = list(enumerate(corpus.tolist()))
+                    start = time.perf_counter()
+                    ChunkedWriter(client_max_batch_size(client)).write(
+                        rows, lambda chunk: collection.add(ids=[str(row) for row, _ in chunk],
+                                                           embeddings=[vector for _, vector in chunk]))
+                    build_seconds = time.perf_counter() - start
+                    del collection, client
+                    index_bytes = _index_bytes(path)
+
+                    for search_ef in search_values:
+                        samples, found = measurer.submit(_measure, path, name, search_ef, queries, k).result()
+                        result = {
+                            'M': m,
+                            'construction_ef': construction_ef,
+                            'search_ef': search_ef,
+                            'recall': recall_at_k(found, truth),
+                            'p50_ms': percentile(samples, 0.5) * 1000,
+                            'p99_ms': percentile(samples, 0.99) * 1000,
+                            'build_seconds': build_seconds,
+                            'index_bytes': index_bytes
+                        }
+                        results.append(result)
+                        if progress:
+                            progress(result)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+
+def recommend(results: List[Dict], target_recall: float = DEFAULT_TARGET_RECALL) -> Optional[Dict]:
+    """
+    Fastest setting that reaches the target recall; among settings about as
+    fast, the smallest index and then the quickest build. Falls back to the
+    highest recall when no setting reaches the target.
+    """
+    if not results:
+        return None
+    feasible = [result for result in results if result['recall'] >= target_recall]
+    if not feasible:
+        return max(results, key=lambda result: (result['recall'], -result['p50_ms']))
+    fastest = min(result['p50_ms'] for result in feasible)
+    close = [result for result in feasible if result['p50_ms'] <= fastest * (1 + _LATENCY_TOLERANCE)]
+    return min(close, key=lambda result: (result['index_bytes'], result['build_seconds'], result['p50_ms']))
+
+
+def tune_engine(engine, split_words: Callable[[str], List[str]], m_values: Sequence[int] = DEFAULT_M,
+                construction_values: Sequence[int] = DEFAULT_CONSTRUCTION_EF,
+                search_values: Sequence[int] = DEFAULT_SEARCH_EF, k: int = 10, query_count: int = 200,
+                max_vectors: Optional[int] = None, target_recall: float = DEFAULT_TARGET_RECALL,
+                progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Sweep HNSW parameters over the vectors of one shard
+    Queries are keyword queries drawn from the shard's file names, embedded like
+    real searches; the ground truth is exact cosine search over the same vectors.
+    """
+    ids, corpus, metadatas = load_collection(engine.collection, limit=max_vectors)
+    if not ids:
+        raise ValueError(f"分片 {engine.collection_name} 中没有向量")
+    texts = sample_query_texts([metadata.get('file_stem', '') for metadata in metadatas], split_words, query_count)
+    if texts:
+        queries = np.asarray(engine._embed_queries(texts), dtype=np.float32)
+    else:
+        queries = corpus[random.Random(7).sample(range(len(corpus)), min(query_count, len(corpus)))]
+    print(f"分片 {engine.collection_name}: {len(ids)} 个向量 ({corpus.shape[1]} 维), {len(queries)} 个查询, "
+          f"网格 M={list(m_values)} construction_ef={list(construction_values)} search_ef={list(search_values)}")
+
+    truth = exact_top_k(corpus, queries, k)
+    results = sweep(corpus, queries, truth, m_values, construction_values, search_values, k, progress)
+    best = recommend(results, target_recall)
+    return {
+        'collection': engine.collection_name,
+        'root': engine.root,
+        'vectors': len(ids),
+        'dimensions': int(corpus.shape[1]),
+        'queries': len(queries),
+        'k': k,
+        'target_recall': target_recall,
+        'configured': engine.hnsw_params(),
+        'built': engine.vector_store.index_params(engine.collection),
+        'results': results,
+        'recommended': {name: best[name] for name in ('M', 'construction_ef', 'search_ef')} if best else None,
+        'recommended_result': best
+    }
@@ -0,0 +1,161 @@
+import os
+import json
+import array
+import base64
+import threading
+from typing import List, Dict, Tuple, Optional
+
+
+class IndexJournal:
+    """
+    Durable log of one index run, kept next to the collection it fills
+    Every embedded batch is appended (and fsynced) before it is written to the
+    vector store, so a crash never loses paid-for embeddings. A checkpoint is
+    taken after the store and manifest were saved: the journal is rewritten with
+    the run header, the directories whose files are all stored ("settled",
+    with their subdirectories so a resumed scan can skip listing them) and
+    only the batches that are still waiting to be written. Batches written since
+    the last checkpoint stay in the file until the next one, because the store
+    and manifest may not have been saved yet; replaying them is an idempotent upsert.
+
+    Records, one JSON object per line:
+        {"type": "run", ...header}                 first line
+        {"type": "reset"}                          a full rebuild dropped the old collection
+        {"type": "settled", "dirs": {dir: [subdirs]}}
+        {"type": "batch", "batch": n, "rows": [[id, base64 float32 vector, metadata], ...]}
+    A torn last line (crash while appending) is ignored.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self.header: Dict = {}
+        self.reset_done = False
+        self.settled: Dict[str, List[str]] = {}
+        self._pending: Dict[int, List[Tuple[str, List[float], Dict]]] = {}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    @staticmethod
+    def _encode_vector(vector) -> str:
+        return base64.b64encode(array.array('f', vector).tobytes()).decode('ascii')
+
+    @staticmethod
+    def _decode_vector(data: str) -> List[float]:
+        values = array.array('f')
+        values.frombytes(base64.b64decode(data))
+        return values.tolist()
+
+    def load(self) -> bool:
+        """Read an existing journal; False when there is none or it is unusable"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return False
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+        if not records or records[0].get('type') != 'run' or records[0].get('version') != self.VERSION:
+            return False
+
+        self.header = records[0]
+        self.reset_done = False
+        self.settled = {}
+        self._pending = {}
+        for record in records[1:]:
+            kind = record.get('type')
+            if kind == 'reset':
+                self.reset_done = True
+            elif kind == 'settled':
+                self.settled.update(record['dirs'])
+            elif kind == 'batch':
+                self._pending[record['batch']] = [(file_id, self._decode_vector(vector), metadata)
+                                                  for file_id, vector, metadata in record['rows']]
+        return True
+
+    def pending_batches(self) -> List[Tuple[int, List[Tuple[str, List[float], Dict]]]]:
+        """Embedded batches not known to be saved by a checkpoint, oldest first"""
+        with self._lock:
+            return sorted(self._pending.items())
+
+    def _append(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _rewrite(self):
+        """Atomically replace the journal with its compacted state and reopen it for appending"""
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            self._file = f
+            self._append(self.header)
+            if self.reset_done:
+                self._append({'type': 'reset'})
+            if self.settled:
+                self._append({'type': 'settled', 'dirs': self.settled})
+            for batch, rows in sorted(self._pending.items()):
+                self._append(self._batch_record(batch, rows))
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _batch_record(self, batch: int, rows: List[Tuple[str, List[float], Dict]]) -> Dict:
+        return {'type': 'batch', 'batch': batch,
+                'rows': [[file_id, self._encode_vector(vector), metadata] for file_id, vector, metadata in rows]}
+
+    def start(self, header: Optional[Dict] = None):
+        """Begin writing: a new run when header is given, else continue the loaded one"""
+        with self._lock:
+            if header is not None:
+                self.header = {'type': 'run', 'version': self.VERSION, **header}
+                self.reset_done = False
+                self.settled = {}
+                self._pending = {}
+            self._rewrite()
+
+    def record_reset(self):
+        with self._lock:
+            self.reset_done = True
+            self._append({'type': 'reset'})
+
+    def record_batch(self, batch: int, rows: List[Tuple[str, List[float], Dict]]):
+        with self._lock:
+            self._pending[batch] = rows
+            self._append(self._batch_record(batch, rows))
+
+    def record_written(self, batch: int):
+        """The batch is in the store; the next checkpoint drops it from the file"""
+        with self._lock:
+            self._pending.pop(batch, None)
+
+    def checkpoint(self, settled: Dict[str, List[str]]):
+        """Call after the store and manifest were saved: settled directories become durable"""
+        with self._lock:
+            self.settled.update(settled)
+            self._rewrite()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """The run completed: nothing is left to resume"""
+        self.close()
+        for path in (self.path, self.path + '.tmp'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
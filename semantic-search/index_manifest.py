@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+from typing import List, Dict
+
+
+class IndexManifest:
+    """
+    Persisted record of what is currently stored in a collection
+    Maps file id -> path, size, mtime and the hash of its searchable text,
+    so a re-index only needs to embed files that actually changed
+    """
+
+    VERSION = 1
+    # Bumped when FileIndexer.build_metadata gains fields; older entries get a metadata-only update
+    METADATA_VERSION = 2
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self.entries: Dict[str, Dict] = {}
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Stable hash of the searchable text used to detect re-embedding needs"""
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def load(self):
+        """Load manifest from disk, starting empty if missing or unreadable"""
+        self.entries = {}
+        if not os.path.exists(self.manifest_path):
+            return
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError) as e:
+            print(f"读取索引清单失败，将执行完整索引: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Atomically write manifest to disk"""
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def clear(self):
+        self.entries = {}
+
+    def record(self, file_id: str, metadata: Dict):
+        """Record an indexed file from its collection metadata"""
+        self.entries[file_id] = {
+            'path': metadata['file_path'],
+            'size': metadata['file_size'],
+            'mtime': metadata.get('file_mtime', 0),
+            'text_hash': self.hash_text(metadata['searchable_text']),
+            'metadata_version': metadata.get('metadata_version', 1)
+        }
+
+    def remove(self, file_ids: List[str]):
+        for file_id in file_ids:
+            self.entries.pop(file_id, None)
+
+    def classify(self, file_info: Dict, searchable_text: str) -> str:
+        """Classify one discovered file as added, changed, metadata_only or unchanged"""
+        entry = self.entries.get(file_info['id'])
+        if entry is None:
+            return 'added'
+        if self.hash_text(searchable_text) != entry['text_hash']:
+            return 'changed'
+        if entry['size'] != file_info['size'] or entry['mtime'] != file_info['modified_time']:
+            return 'metadata_only'
+        if entry.get('metadata_version', 1) != self.METADATA_VERSION:
+            return 'metadata_only'
+        return 'unchanged'
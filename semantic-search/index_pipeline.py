@@ -0,0 +1,446 @@
+import os
+import time
+import queue
+import threading
+from typing import List, Dict, Tuple, Optional, Callable, Iterable
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+from chroma_writer import ChunkWriteError, WriteStats
+from index_journal import IndexJournal
+from fast_scanner import is_under
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage failed"""
+
+
+class IndexPipeline:
+    """
+    Streaming index pipeline: discover -> searchable text -> embed -> upsert
+    Stages run on their own threads connected by bounded queues, so a slow
+    stage applies backpressure upstream and only a few chunks of files are
+    ever held in memory. Files to embed are gathered until every embedding
+    worker can send a batch of the largest size. Each embedded chunk is handed
+    to the writer thread as soon as it is ready, so Chroma writes overlap with
+    embedding the next chunk and results become searchable while indexing is
+    still running.
+    The writer splits chunks to the client's max batch size and retries them;
+    files in chunks that still fail are reported like embedding failures.
+    With journal=True every embedded chunk is logged durably before it is
+    written, and every checkpoint_interval seconds the store and manifest are
+    saved and the directories whose files are all stored are recorded, so
+    run(resume=True) continues an interrupted run (see IndexJournal).
+    """
+
+    def __init__(self, indexer, search_engine, chunk_size: int = 1000, queue_size: int = 4,
+                 journal: bool = True, checkpoint_interval: float = 30.0):
+        self.indexer = indexer
+        self.search_engine = search_engine
+        self.chunk_size = max(1, chunk_size)
+        self.queue_size = max(1, queue_size)
+        self.journal_enabled = journal
+        self.checkpoint_interval = checkpoint_interval
+        self._journal: Optional[IndexJournal] = None
+        self._dir_lock = threading.Lock()
+        self.incremental = True
+
+        self._abort = threading.Event()
+        self._errors: List[BaseException] = []
+        self._progress = None
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.discovered = 0
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.written = 0
+        self.failures: List[Tuple[Dict, str]] = []
+        self._metadata_updated = 0
+        self._collection_reset = False
+        self._seen_ids = set()
+        # Directories the scan could not list; files below them are never deleted
+        self._failed_dirs = set()
+        self.write_stats = WriteStats()
+        self.replayed = 0
+        self.skipped_dirs = 0
+        self._batch_no = 0
+        # Directory -> files not yet stored / its subdirectories, for settling directories
+        self._dir_pending: Dict[str, int] = {}
+        self._dir_subdirs: Dict[str, List[str]] = {}
+        self._dirty_dirs = set()
+        self._newly_settled: Dict[str, List[str]] = {}
+        self._last_checkpoint = time.monotonic()
+
+    def _put(self, q: queue.Queue, item):
+        """Blocking put that gives up if another stage failed"""
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+    def _run_stage(self, work: Callable, outbox: Optional[queue.Queue]):
+        try:
+            work()
+        except PipelineAborted:
+            return
+        except BaseException as e:
+            self._errors.append(e)
+            self._abort.set()
+            return
+
+        if outbox is not None:
+            try:
+                self._put(outbox, _DONE)
+            except PipelineAborted:
+                pass
+
+    # --- journal ---
+
+    def _on_directory(self, directory: str, subdirs: List[str], file_count: int):
+        """Scanner callback: directory was listed and its file_count files follow"""
+        with self._dir_lock:
+            if file_count:
+                self._dir_pending[directory] = file_count
+                self._dir_subdirs[directory] = subdirs
+            else:
+                self._newly_settled[directory] = subdirs
+
+    def _files_done(self, parents: Iterable[str], failed: bool = False):
+        """Files of these directories were stored (or failed); settle directories with nothing left"""
+        if self._journal is None:
+            return
+        with self._dir_lock:
+            for parent in parents:
+                if failed:
+                    # Failed files are retried by the next run, so their directory must be scanned again
+                    self._dirty_dirs.add(parent)
+                remaining = self._dir_pending.get(parent)
+                if remaining is None:
+                    continue
+                if remaining > 1:
+                    self._dir_pending[parent] = remaining - 1
+                    continue
+                del self._dir_pending[parent]
+                subdirs = self._dir_subdirs.pop(parent)
+                if parent not in self._dirty_dirs:
+                    self._newly_settled[parent] = subdirs
+
+    def _checkpoint(self, force: bool = False):
+        """Save the store and manifest, then make the progress since the last checkpoint durable"""
+        if self._journal is None:
+            return
+        if not force and time.monotonic() - self._last_checkpoint < self.checkpoint_interval:
+            return
+        self.search_engine.save_state()
+        with self._dir_lock:
+            settled, self._newly_settled = self._newly_settled, {}
+        self._journal.checkpoint(settled)
+        self._last_checkpoint = time.monotonic()
+
+    def _open_journal(self, root_path: str, incremental: bool, resume: bool) -> Optional[IndexJournal]:
+        """The journal to continue (already loaded) when resuming is possible, else None after starting a new one"""
+        journal = IndexJournal(self.search_engine.journal_path())
+        header = {
+            'root': root_path,
+            'collection': self.search_engine.collection_name,
+            'incremental': incremental,
+            'signature': self.search_engine.provider.signature()
+        }
+        if resume:
+            if journal.load() and all(journal.header.get(key) == header[key]
+                                      for key in ('root', 'collection', 'signature')):
+                self._journal = journal
+                return journal
+            print("没有找到可继续的索引记录 (或与当前目录、嵌入提供方不一致)，将从头开始")
+        elif journal.exists():
+            print("发现上次未完成的索引记录，本次从头开始 (使用 --resume 可从中断处继续)")
+        journal.start({**header, 'started': time.time()})
+        self._journal = journal
+        return None
+
+    def _replay(self, journal: IndexJournal):
+        """Write the embedded batches the interrupted run had not checkpointed yet; nothing is re-embedded"""
+        for batch, rows in journal.pending_batches():
+            self.search_engine.apply_incremental_update(rows, [], [], save_state=False, stats=self.write_stats)
+            journal.record_written(batch)
+            self.replayed += len(rows)
+        self._checkpoint(force=True)
+
+    # --- stages ---
+
+    def _discover_stage(self, root_path: str, outbox: queue.Queue, skip_dirs: Optional[Dict[str, List[str]]]):
+        chunk = []
+        on_directory = self._on_directory if self._journal is not None else None
+        for file_info in self.indexer.iter_files(root_path, on_directory=on_directory, skip_dirs=skip_dirs,
+                                                 failed_dirs=self._failed_dirs):
+            chunk.append(file_info)
+            if len(chunk) >= self.chunk_size:
+                self.discovered += len(chunk)
+                self._put(outbox, chunk)
+                chunk = []
+        if chunk:
+            self.discovered += len(chunk)
+            self._put(outbox, chunk)
+
+    def _plan_stage(self, classify: bool, reset: bool, inbox: queue.Queue, outbox: queue.Queue):
+        """
+        Build searchable text and decide per file: embed, metadata update, or skip
+        classify: compare against the manifest (incremental runs and resumed rebuilds)
+        reset:    drop the collection first (full rebuild)
+        """
+        manifest = self.search_engine.manifest
+        while True:
+            chunk = self._get(inbox)
+            if chunk is _DONE:
+                return
+
+            if reset and not self._collection_reset:
+                # Rebuild: only drop the old collection once there is something to index
+                self.search_engine.reset_collection()
+                self._collection_reset = True
+                if self._journal is not None:
+                    self._journal.record_reset()
+
+            to_embed, metadata_updates, unchanged = [], [], []
+            for file_info in chunk:
+                searchable_text = self.indexer.create_searchable_text(file_info)
+                if classify:
+                    self._seen_ids.add(file_info['id'])
+                    status = manifest.classify(file_info, searchable_text)
+                else:
+                    status = 'added'
+
+                if status in ('added', 'changed'):
+                    to_embed.append((file_info, status))
+                elif status == 'metadata_only':
+                    metadata_updates.append((file_info['id'], self.indexer.build_metadata(file_info, searchable_text)))
+                else:
+                    unchanged.append(file_info['parent'])
+
+            self.unchanged += len(unchanged)
+            self._files_done(unchanged)
+            self._tick(len(unchanged))
+            if to_embed or metadata_updates:
+                parents = {file_info['id']: file_info['parent'] for file_info, _ in to_embed}
+                parents.update((file_id, metadata['file_parent']) for file_id, metadata in metadata_updates)
+                self._put(outbox, (to_embed, metadata_updates, parents))
+
+    def _embed_stage(self, inbox: queue.Queue, outbox: queue.Queue):
+        # Planned chunks are merged until every embedding worker can fill a batch of the largest
+        # size, so batch sizes are not capped by the scan chunk size
+        target = max(self.chunk_size, self.indexer.embed_chunk_size)
+        to_embed, metadata_updates, parents = [], [], {}
+        while True:
+            item = self._get(inbox)
+            if item is not _DONE:
+                to_embed.extend(item[0])
+                metadata_updates.extend(item[1])
+                parents.update(item[2])
+                if len(to_embed) + len(metadata_updates) < target:
+                    continue
+            if to_embed or metadata_updates:
+                self._embed_chunk(to_embed, metadata_updates, parents, outbox)
+                to_embed, metadata_updates, parents = [], [], {}
+            if item is _DONE:
+                return
+
+    def _embed_chunk(self, to_embed: List[Tuple[Dict, str]], metadata_updates: List[Tuple[str, Dict]],
+                     parents: Dict[str, str], outbox: queue.Queue):
+        files_info = [file_info for file_info, _ in to_embed]
+        embeddings_data = self.indexer.generate_embeddings(files_info, verbose=False) if files_info else []
+
+        if self.indexer.last_failures:
+            self.failures.extend(self.indexer.last_failures)
+            self._files_done((file_info['parent'] for file_info, _ in self.indexer.last_failures), failed=True)
+            self._tick(len(self.indexer.last_failures))
+
+        self._batch_no += 1
+        if self._journal is not None and embeddings_data:
+            # Durable before the write starts: a crash from here on never costs these embeddings again
+            self._journal.record_batch(self._batch_no, embeddings_data)
+
+        statuses = {file_info['id']: status for file_info, status in to_embed}
+        self._put(outbox, (self._batch_no, embeddings_data, metadata_updates, statuses, parents))
+
+    def _write_stage(self, inbox: queue.Queue):
+        while True:
+            item = self._get(inbox)
+            if item is _DONE:
+                return
+
+            batch_no, embeddings_data, metadata_updates, statuses, parents = item
+            try:
+                self.search_engine.apply_incremental_update(embeddings_data, metadata_updates, [],
+                                                            save_state=False, stats=self.write_stats)
+                failed_ids = set()
+            except ChunkWriteError as e:
+                failed_ids = self._record_write_failures(e.failed)
+
+            for file_id, _, _ in embeddings_data:
+                if file_id in failed_ids:
+                    continue
+                if statuses[file_id] == 'added':
+                    self.added += 1
+                else:
+                    self.updated += 1
+            self._metadata_updated += sum(1 for file_id, _ in metadata_updates if file_id not in failed_ids)
+
+            rows = len(embeddings_data) + len(metadata_updates)
+            self.written += rows - len(failed_ids)
+            self._tick(rows)
+
+            if self._journal is not None:
+                self._journal.record_written(batch_no)
+                stored = [file_id for file_id, _, _ in embeddings_data] + [file_id for file_id, _ in metadata_updates]
+                self._files_done(parents[file_id] for file_id in stored if file_id not in failed_ids)
+                self._files_done((parents[file_id] for file_id in failed_ids if file_id in parents), failed=True)
+                self._checkpoint()
+
+    def _record_write_failures(self, failed: List[Tuple[list, str]]) -> set:
+        """Report files of chunks that were never written; they are retried on the next run"""
+        failed_ids = set()
+        for chunk, error in failed:
+            for row in chunk:
+                file_id, metadata = row[0], row[-1]
+                failed_ids.add(file_id)
+                file_info = {'id': file_id, 'path': metadata['file_path'], 'name': metadata['file_name']}
+                self.failures.append((file_info, f"写入向量数据库失败: {error}"))
+        return failed_ids
+
+    def _tick(self, count: int):
+        if self._progress is not None and count:
+            self._progress.update(count)
+
+    # --- driver ---
+
+    def run(self, root_path: str, incremental: bool = True, resume: bool = False) -> Dict:
+        """
+        Index root_path, streaming files through all stages
+        In incremental mode only new/changed files are embedded and files missing
+        from disk are deleted afterwards; otherwise the collection is rebuilt.
+        resume: continue the interrupted run recorded in the journal (its mode wins):
+        journaled embeddings are written without calling the API again and settled
+        directories are not scanned again. Without a usable journal the run starts over.
+        Returns a report dict with added/updated/deleted/unchanged/failed counts.
+        """
+        self._reset_counters()
+        self._abort.clear()
+        self._errors = []
+        self._journal = None
+        start_time = time.time()
+        root_path = os.path.abspath(root_path)
+        self.incremental = incremental
+
+        classify, reset = incremental, not incremental
+        skip_dirs: Dict[str, List[str]] = {}
+        resumed = False
+        if self.journal_enabled:
+            journal = self._open_journal(root_path, incremental, resume)
+            if journal is not None:
+                resumed = True
+                incremental = self.incremental = journal.header['incremental']
+                # A rebuild that already dropped the collection continues like an incremental run
+                classify = incremental or journal.reset_done
+                reset = not classify
+                skip_dirs = dict(journal.settled)
+                self.skipped_dirs = len(skip_dirs)
+                self._collection_reset = journal.reset_done
+                pending = sum(len(rows) for _, rows in journal.pending_batches())
+                print(f"继续上次中断的索引: 跳过 {len(skip_dirs)} 个已完成的目录, "
+                      f"写入 {pending} 条已生成的嵌入向量")
+                journal.start()
+                self._replay(journal)
+
+        discovered_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        planned_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        embedded_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        stages = [
+            (lambda: self._discover_stage(root_path, discovered_q, skip_dirs or None), discovered_q),
+            (lambda: self._plan_stage(classify, reset, discovered_q, planned_q), planned_q),
+            (lambda: self._embed_stage(planned_q, embedded_q), embedded_q),
+            (lambda: self._write_stage(embedded_q), None),
+        ]
+
+        self._progress = tqdm(desc="索引文件", unit="个") if tqdm else None
+        threads = [threading.Thread(target=self._run_stage, args=stage, daemon=True,
+                                    name=f"index-stage-{i}") for i, stage in enumerate(stages)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                # join with a timeout so KeyboardInterrupt is still delivered
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self._abort.set()
+            raise
+        finally:
+            if self._progress is not None:
+                self._progress.close()
+                self._progress = None
+            # Everything written so far is recorded, so an interrupted run resumes incrementally
+            if self._journal is not None and not any(thread.is_alive() for thread in threads):
+                self._checkpoint(force=True)
+            else:
+                self.search_engine.save_state()
+            if self._journal is not None:
+                self._journal.close()
+
+        if self._errors:
+            raise self._errors[0]
+
+        # Only a completed scan tells us which files are really gone: nothing below a directory
+        # that could not be listed is deleted (the whole tree when the walk stopped early).
+        # Files in directories skipped by a resumed run were not seen, so those are checked one by one
+        if incremental:
+            failed_dirs = self._failed_dirs
+            if failed_dirs:
+                print(f"{len(failed_dirs)} 个目录无法完整读取，其中已索引的文件不会被删除")
+            deleted_ids = [file_id for file_id, entry in self.search_engine.manifest.entries.items()
+                           if file_id not in self._seen_ids
+                           and not (failed_dirs and is_under(entry['path'], failed_dirs))
+                           and (os.path.dirname(entry['path']) not in skip_dirs
+                                or not os.path.exists(entry['path']))]
+            if deleted_ids:
+                self.search_engine.apply_incremental_update([], [], deleted_ids, stats=self.write_stats)
+            self.deleted = len(deleted_ids)
+        self._seen_ids = set()
+        if self._journal is not None:
+            self._journal.discard()
+            self._journal = None
+
+        return {
+            'discovered': self.discovered,
+            'added': self.added,
+            'updated': self.updated + self._metadata_updated,
+            'deleted': self.deleted,
+            'unchanged': self.unchanged,
+            'failed': len(self.failures),
+            'elapsed': time.time() - start_time,
+            # Collection write throughput, measured on the writer thread
+            'write': self.write_stats.as_dict(),
+            'resumed': {'replayed': self.replayed, 'skipped_dirs': self.skipped_dirs} if resumed else None
+        }
@@ -0,0 +1,309 @@
+import os
+import time
+import threading
+import importlib.util
+from typing import List, Dict, Tuple, Optional, Iterable
+
+from fast_scanner import scan_tree, is_under
+
+
+def watchdog_available() -> bool:
+    # watchdog itself is only imported when a watcher starts
+    return importlib.util.find_spec('watchdog') is not None
+
+
+class _WatchdogHandler:
+    """
+    Forwards native filesystem events (inotify, FSEvents, ReadDirectoryChangesW) to the watcher
+    Observers only call dispatch(), so this doesn't need to subclass watchdog's handler
+    """
+
+    # Events that never change what is indexed
+    IGNORED_EVENTS = {'opened', 'closed_no_write'}
+
+    def __init__(self, watcher: "IndexWatcher"):
+        self.watcher = watcher
+
+    def dispatch(self, event):
+        if event.event_type in self.IGNORED_EVENTS:
+            return
+        # A directory is "modified" whenever a child changes; the child has its own event
+        if event.is_directory and event.event_type == 'modified':
+            return
+        self.watcher.notify(event.src_path)
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.watcher.notify(dest_path)
+
+
+class IndexWatcher:
+    """
+    Keeps the collection in sync with one or more indexed roots
+    Change notifications come from watchdog when it is installed, otherwise
+    from polling scans compared against the previous snapshot. Changed paths
+    are debounced and coalesced, then applied as one batched upsert/delete:
+    only new or renamed files are embedded, the rest of the tree is never
+    rescanned or re-embedded.
+    """
+
+    # Manifest and side indexes are rewritten at most this often (and on stop)
+    STATE_SAVE_INTERVAL = 30.0
+
+    def __init__(self, indexer, search_engine, roots: List[str], debounce_seconds: float = 2.0,
+                 max_delay_seconds: float = 10.0, poll_interval: float = 5.0, backend: str = 'auto'):
+        self.indexer = indexer
+        self.search_engine = search_engine
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max(max_delay_seconds, debounce_seconds)
+        self.poll_interval = poll_interval
+        self.backend = self._select_backend(backend)
+
+        self._pending: Dict[str, float] = {}  # path -> time of first event in this batch
+        self._last_event = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+        self._last_save = time.monotonic()
+        self._state_dirty = False
+
+        self.batches = 0
+        self.embedded = 0
+        self.metadata_updated = 0
+        self.deleted = 0
+        self.failures: List[Tuple[Dict, str]] = []
+
+    @staticmethod
+    def _select_backend(backend: str) -> str:
+        backend = (backend or 'auto').lower()
+        if backend == 'auto':
+            return 'watchdog' if watchdog_available() else 'polling'
+        if backend == 'watchdog' and not watchdog_available():
+            raise ImportError("watchdog 未安装: pip install watchdog (或使用 polling 模式)")
+        if backend not in ('watchdog', 'polling'):
+            raise ValueError(f"未知的监视方式: {backend} (可选: auto, watchdog, polling)")
+        return backend
+
+    # --- event intake ---
+
+    def notify(self, path: str):
+        """Record that path (file or directory) changed; applied after the debounce window"""
+        now = time.monotonic()
+        with self._lock:
+            self._pending.setdefault(os.path.abspath(path), now)
+            self._last_event = now
+
+    def _due_paths(self) -> List[str]:
+        """Take the pending batch once events went quiet, or when it has waited too long"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending:
+                return []
+            quiet = now - self._last_event >= self.debounce_seconds
+            overdue = now - min(self._pending.values()) >= self.max_delay_seconds
+            if not (quiet or overdue):
+                return []
+            paths = list(self._pending)
+            self._pending = {}
+            return paths
+
+    # --- polling backend ---
+
+    def _indexed_snapshot(self) -> Dict[str, Tuple[int, float]]:
+        """Baseline from the manifest, so changes made while nobody watched are picked up too"""
+        prefixes = tuple(root.rstrip(os.sep) + os.sep for root in self.roots)
+        return {entry['path']: (entry['size'], entry['mtime'])
+                for entry in list(self.search_engine.manifest.entries.values())
+                if entry['path'].startswith(prefixes)}
+
+    def _scan_snapshot(self) -> Tuple[Dict[str, Tuple[int, float]], set]:
+        """Current (size, mtime) per file, and the directories that could not be listed"""
+        snapshot, failed_dirs = {}, set()
+        extensions = self.indexer.config.INDEXED_EXTENSIONS or None
+        for root in self.roots:
+            for record in scan_tree(root, extensions=extensions, max_workers=self.indexer.config.SCAN_WORKERS,
+                                    failed_dirs=failed_dirs):
+                snapshot[record.path] = (record.size, record.mtime)
+        return snapshot, failed_dirs
+
+    def _poll_loop(self):
+        snapshot = self._indexed_snapshot()
+        while not self._stop.is_set():
+            try:
+                current, failed_dirs = self._scan_snapshot()
+            except Exception as e:
+                print(f"[监视] 扫描目录时出错: {e}")
+                current, failed_dirs = snapshot, set()
+
+            for path, signature in current.items():
+                if snapshot.get(path) != signature:
+                    self.notify(path)
+            for path in snapshot.keys() - current.keys():
+                if failed_dirs and is_under(path, failed_dirs):
+                    # Not listed this time (e.g. permissions), which doesn't mean it is gone
+                    current[path] = snapshot[path]
+                else:
+                    self.notify(path)
+            snapshot = current
+
+            self._stop.wait(self.poll_interval)
+
+    # --- applying changes ---
+
+    def _flush_loop(self):
+        while not self._stop.wait(0.2):
+            self._flush_due()
+
+    def _flush_due(self):
+        paths = self._due_paths()
+        if paths:
+            try:
+                self.sync_paths(paths)
+            except Exception as e:
+                print(f"[监视] 更新索引时出错，稍后重试: {e}")
+                for path in paths:
+                    self.notify(path)
+        self._maybe_save_state()
+
+    def _maybe_save_state(self, force: bool = False):
+        if self._state_dirty and (force or time.monotonic() - self._last_save >= self.STATE_SAVE_INTERVAL):
+            self.search_engine.save_state()
+            self._state_dirty = False
+            self._last_save = time.monotonic()
+
+    @staticmethod
+    def _is_gone(path: str) -> bool:
+        """Only a path that is reported missing is gone; unreadable ones are kept"""
+        try:
+            os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return True
+        except OSError:
+            return False
+        return False
+
+    def _deleted_ids(self, gone_paths: Iterable[str]) -> List[str]:
+        """Ids of indexed files at the given paths, or anywhere below them for directories"""
+        entries = self.search_engine.manifest.entries
+        deleted, prefixes = [], []
+        for path in gone_paths:
+            file_id = self.indexer._generate_file_id(path)
+            if file_id in entries:
+                deleted.append(file_id)
+            else:
+                prefixes.append(path.rstrip(os.sep) + os.sep)
+
+        if prefixes:
+            prefixes = tuple(prefixes)
+            deleted.extend(file_id for file_id, entry in list(entries.items())
+                           if entry['path'].startswith(prefixes))
+        return deleted
+
+    def sync_paths(self, paths: Iterable[str]) -> Dict:
+        """
+        Bring the collection up to date for the given changed paths
+        Existing files are classified against the manifest (embed, metadata-only
+        update or skip), directories are expanded, and vanished paths are deleted.
+        Returns a report dict with embedded/metadata_updated/deleted/failed counts.
+        """
+        start_time = time.time()
+        files: Dict[str, Dict] = {}
+        gone = []
+        for path in paths:
+            if os.path.isdir(path):
+                # New or moved-in directory: its files produced no events of their own
+                for file_info in self.indexer.iter_files(path):
+                    files[file_info['id']] = file_info
+                continue
+            file_info = self.indexer.file_info_for_path(path)
+            if file_info:
+                files[file_info['id']] = file_info
+            elif self._is_gone(path):
+                gone.append(path)
+
+        manifest = self.search_engine.manifest
+        to_embed, metadata_updates = [], []
+        for file_info in files.values():
+            searchable_text = self.indexer.create_searchable_text(file_info)
+            status = manifest.classify(file_info, searchable_text)
+            if status in ('added', 'changed'):
+                to_embed.append(file_info)
+            elif status == 'metadata_only':
+                metadata_updates.append((file_info['id'], self.indexer.build_metadata(file_info, searchable_text)))
+
+        deleted_ids = self._deleted_ids(gone)
+        embeddings_data = self.indexer.generate_embeddings(to_embed, verbose=False) if to_embed else []
+        failures = self.indexer.last_failures if to_embed else []
+
+        if embeddings_data or metadata_updates or deleted_ids:
+            # Chunks written before a failing one are recorded and still need saving
+            self._state_dirty = True
+            self.search_engine.apply_incremental_update(embeddings_data, metadata_updates, deleted_ids,
+                                                        save_state=False)
+
+        report = {
+            'embedded': len(embeddings_data),
+            'metadata_updated': len(metadata_updates),
+            'deleted': len(deleted_ids),
+            'failed': len(failures),
+            'elapsed': time.time() - start_time
+        }
+        self.batches += 1
+        self.embedded += report['embedded']
+        self.metadata_updated += report['metadata_updated']
+        self.deleted += report['deleted']
+        self.failures.extend(failures)
+
+        if report['embedded'] or report['metadata_updated'] or report['deleted'] or report['failed']:
+            print(f"[监视] 索引已更新: 新增/修改 {report['embedded']}, 元数据 {report['metadata_updated']}, "
+                  f"删除 {report['deleted']}, 失败 {report['failed']} (用时 {report['elapsed']:.2f} 秒)")
+        return report
+
+    # --- lifecycle ---
+
+    def start(self):
+        """Start watching in background threads"""
+        self._stop.clear()
+        if self.backend == 'watchdog':
+            from watchdog.observers import Observer
+            self._observer = Observer()
+            handler = _WatchdogHandler(self)
+            for root in self.roots:
+                self._observer.schedule(handler, root, recursive=True)
+            self._observer.start()
+        else:
+            self._threads.append(threading.Thread(target=self._poll_loop, daemon=True, name='watch-poll'))
+
+        self._threads.append(threading.Thread(target=self._flush_loop, daemon=True, name='watch-flush'))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop watching, apply whatever is still pending and persist state"""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        with self._lock:
+            paths = list(self._pending)
+            self._pending = {}
+        if paths:
+            self.sync_paths(paths)
+        self._maybe_save_state(force=True)
+
+    def run(self):
+        """Watch until interrupted with Ctrl+C"""
+        self.start()
+        try:
+            while not self._stop.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
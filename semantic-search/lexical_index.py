@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from typing import List, Dict, Tuple, Optional, Iterable
+
+# Same separators as FileIndexer._split_filename
+_SEPARATORS = re.compile(r'[-_\s.]+')
+_CAMEL_BOUNDARY = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split on separators and camelCase, lower-cased: T_StoneWall-Normal -> t, stone, wall, normal"""
+    tokens = []
+    for part in _SEPARATORS.split(text):
+        for word in _CAMEL_BOUNDARY.sub(' ', part).split():
+            tokens.append(word.lower())
+    return tokens
+
+
+def matches_where(metadata: Dict, where: Optional[Dict]) -> bool:
+    """Evaluate a Chroma-style `where` clause against one metadata dict"""
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == '$or':
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+
+        for op, operand in condition.items():
+            if op == '$eq' and value != operand:
+                return False
+            if op == '$ne' and value == operand:
+                return False
+            if op == '$in' and value not in operand:
+                return False
+            if op == '$nin' and value in operand:
+                return False
+            if op in ('$contains', '$not_contains'):
+                # Array metadata (e.g. dir_names); a missing field contains nothing
+                contained = operand in value if isinstance(value, list) else value == operand
+                if contained != (op == '$contains'):
+                    return False
+            if op in ('$gt', '$gte', '$lt', '$lte'):
+                if value is None:
+                    return False
+                if op == '$gt' and not value > operand:
+                    return False
+                if op == '$gte' and not value >= operand:
+                    return False
+                if op == '$lt' and not value < operand:
+                    return False
+                if op == '$lte' and not value <= operand:
+                    return False
+    return True
+
+
+def reciprocal_rank_fusion(ranked_lists: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked id lists: score(id) = sum 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranked in ranked_lists:
+        for rank, doc_id in enumerate(ranked, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index over the tokens of each file's searchable text
+    Kept in memory and persisted next to the Chroma DB. Documents keep their
+    collection metadata so lexical hits can be returned without touching Chroma.
+    """
+
+    VERSION = 1
+
+    def __init__(self, index_path: str, k1: float = 1.2, b: float = 0.75):
+        self.index_path = index_path
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Dict] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.stems: Dict[str, set] = {}  # lower-case file stem -> ids, for exact-name hits
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    # --- maintenance ---
+
+    def add(self, doc_id: str, metadata: Dict):
+        """Index (or re-index) one document from its collection metadata"""
+        with self._lock:
+            if doc_id in self.docs:
+                self._remove_postings(doc_id)
+
+            tokens = tokenize(metadata.get('searchable_text', ''))
+            self.docs[doc_id] = metadata
+            self.doc_lengths[doc_id] = len(tokens)
+            self._total_length += len(tokens)
+
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                self.postings.setdefault(token, {})[doc_id] = count
+
+            stem = metadata.get('file_stem', '').lower()
+            if stem:
+                self.stems.setdefault(stem, set()).add(doc_id)
+
+    def remove(self, doc_ids: Iterable[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id in self.docs:
+                    self._remove_postings(doc_id)
+                    del self.docs[doc_id]
+                    del self.doc_lengths[doc_id]
+
+    def _remove_postings(self, doc_id: str):
+        metadata = self.docs[doc_id]
+        for token in set(tokenize(metadata.get('searchable_text', ''))):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[token]
+
+        stem = metadata.get('file_stem', '').lower()
+        ids = self.stems.get(stem)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del self.stems[stem]
+        self._total_length -= self.doc_lengths.get(doc_id, 0)
+
+    def clear(self):
+        with self._lock:
+            self.docs = {}
+            self.doc_lengths = {}
+            self.postings = {}
+            self.stems = {}
+            self._total_length = 0
+
+    # --- persistence ---
+
+    def save(self):
+        """Atomically persist documents; postings are rebuilt on load"""
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            data = {'version': self.VERSION, 'docs': self.docs}
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def load(self) -> bool:
+        """Load from disk; returns False if missing or unreadable"""
+        self.clear()
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取词法索引失败，将重新构建: {e}")
+            return False
+        if data.get('version') != self.VERSION:
+            return False
+
+        for doc_id, metadata in data.get('docs', {}).items():
+            self.add(doc_id, metadata)
+        return True
+
+    # --- queries ---
+
+    def _idf(self, token: str) -> float:
+        df = len(self.postings.get(token, ()))
+        n = len(self.docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def is_exact_token_query(self, query: str) -> bool:
+        """
+        True for identifier-like queries (T_Stone_Wall_Normal, PlayerWarrior, wall.normal)
+        whose tokens all exist in the index; these can skip the vector search
+        """
+        query = query.strip()
+        if not query or any(ch.isspace() for ch in query):
+            return False
+        if query.lower() in self.stems:
+            return True
+
+        looks_like_identifier = bool(re.search(r'[_\-.]', query)) or bool(re.search(r'[a-z][A-Z]', query))
+        tokens = tokenize(query)
+        return looks_like_identifier and len(tokens) > 1 and all(token in self.postings for token in tokens)
+
+    def search(self, query: str, top_k: int, where: Optional[Dict] = None,
+               require_all: bool = False) -> List[Tuple[str, Dict, float]]:
+        """
+        BM25-ranked (id, metadata, score) tuples; exact file-stem matches always rank first
+        Metadata is read under the lock, so hits stay valid while another thread re-indexes
+        require_all: only return documents containing every query token
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            avg_length = self._total_length / n if n else 1.0
+
+            candidates: Optional[set] = None
+            if require_all:
+                # Intersect smallest postings first; set & keys() probes the larger side in C
+                for token in sorted(tokens, key=lambda t: len(self.postings.get(t, ()))):
+                    ids = self.postings.get(token)
+                    if not ids:
+                        return []
+                    candidates = set(ids) if candidates is None else candidates & ids.keys()
+                    if not candidates:
+                        return []
+
+            scores: Dict[str, float] = {}
+            if candidates is not None:
+                # Common tokens (t, texture) have huge postings: score only the candidates, with tf lookups
+                weighted = [(self.postings[token], self._idf(token)) for token in tokens]
+                for doc_id in candidates:
+                    length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = sum(idf * posting[doc_id] * (self.k1 + 1) / (posting[doc_id] + length_norm)
+                                         for posting, idf in weighted)
+            else:
+                for token in tokens:
+                    posting = self.postings.get(token)
+                    if not posting:
+                        continue
+                    idf = self._idf(token)
+                    for doc_id, tf in posting.items():
+                        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + length_norm)
+
+            exact = self.stems.get(query.strip().lower(), set())
+            if exact:
+                boost = max(scores.values(), default=1.0) + 1.0
+                for doc_id in exact:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + boost
+
+            items = scores.items()
+            if where:
+                items = [(doc_id, score) for doc_id, score in items if matches_where(self.docs[doc_id], where)]
+            top = heapq.nlargest(top_k, items, key=lambda item: item[1])
+            return [(doc_id, self.docs[doc_id], score) for doc_id, score in top]
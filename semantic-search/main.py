@@ -6,14 +6,24 @@
 
 import os
 import sys
+import json
+import queue
+import argparse
+import threading
+import contextlib
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple, TextIO
 try:
-    import openai
     from colorama import init, Fore, Style
     from config import Config
+    from embedding_providers import EmbeddingProvider, create_embedding_provider
     from file_indexer import FileIndexer
-    from semantic_search import SemanticSearchEngine
+    from semantic_search import EmbeddingMismatchError
+    from sharded_search import ShardedSearchEngine, UnknownShardError
+    from query_filters import FilterSyntaxError
+    from index_pipeline import IndexPipeline
+    from index_watcher import IndexWatcher
+    import metrics
 except ImportError as e:
     print(f"导入模块失败: {e}")
     print("请确保已安装所有依赖包：pip install -r requirements.txt")
@@ -22,12 +32,20 @@ except ImportError as e:
 # Initialize colorama for Windows
 init()
 
+# Exit codes of the non-interactive commands
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2           # argparse errors and invalid filter syntax
+EXIT_NOT_INDEXED = 3     # empty collection, or built by a different embedding provider
+EXIT_PARTIAL = 4         # indexing finished but some files failed to embed
+
 class SemanticFileSearchApp:
     def __init__(self):
         self.config = Config()
-        self.openai_client: Optional[openai.OpenAI] = None
+        self.provider: Optional[EmbeddingProvider] = None
         self.indexer: Optional[FileIndexer] = None
-        self.search_engine: Optional[SemanticSearchEngine] = None
+        # One shard (collection) per indexed directory
+        self.search_engine: Optional[ShardedSearchEngine] = None
         self._initialize()
     
     def _initialize(self):
@@ -36,12 +54,12 @@ class SemanticFileSearchApp:
             # Validate configuration
             self.config.validate_config()
             
-            # Initialize OpenAI client
-            self.openai_client = openai.OpenAI(api_key=self.config.OPENAI_API_KEY)
+            # Initialize embedding provider (OpenAI or local, see Config.EMBEDDING_PROVIDER)
+            self.provider = create_embedding_provider(self.config)
             
             # Initialize components
-            self.indexer = FileIndexer(self.openai_client)
-            self.search_engine = SemanticSearchEngine(self.openai_client)
+            self.indexer = FileIndexer(self.provider)
+            self.search_engine = ShardedSearchEngine(self.provider)
             
             print(f"{Fore.GREEN}✓ 语义搜索引擎初始化成功{Style.RESET_ALL}")
             
@@ -92,7 +110,7 @@ class SemanticFileSearchApp:
             return directory
     
     def index_directory(self, directory: str) -> bool:
-        """Index all files in the directory"""
+        """Index all files in the directory through the streaming pipeline"""
         if not self.indexer or not self.search_engine:
             print(f"{Fore.RED}系统未正确初始化{Style.RESET_ALL}")
             return False
@@ -100,30 +118,109 @@ class SemanticFileSearchApp:
         try:
             print(f"\n{Fore.CYAN}开始索引目录: {directory}{Style.RESET_ALL}")
             
-            # Discover files
-            files_info = self.indexer.discover_files(directory)
-            
-            if not files_info:
+            shard = self.search_engine.shard_for_root(directory)
+            resume = False
+            if self.config.INDEX_JOURNAL_ENABLED and os.path.exists(shard.journal_path()):
+                answer = input("上次的索引没有完成，是否从中断处继续? (y/n): ").strip().lower()
+                resume = answer in ('y', 'yes', '是')
+            incremental = self.config.INCREMENTAL_INDEXING and shard.can_index_incrementally()
+            if incremental and not resume:
+                print("使用增量索引: 只处理新增、修改和删除的文件")
+            
+            report, pipeline = self.run_index_pipeline(directory, incremental, resume=resume)
+            incremental = report['incremental']
+            
+            if pipeline.failures:
+                self.indexer.report_failures(pipeline.failures)
+                print(f"{Fore.YELLOW}失败的文件将在下次增量索引时重试{Style.RESET_ALL}")
+            
+            # A resumed run may find nothing left to scan: the interrupted run settled every directory
+            resumed = report['resumed']
+            if report['discovered'] == 0 and not resumed:
                 print(f"{Fore.YELLOW}目录中没有找到可索引的文件{Style.RESET_ALL}")
                 return False
             
-            # Generate embeddings
-            embeddings_data = self.indexer.generate_embeddings(files_info)
-            
-            if not embeddings_data:
+            if report['added'] + report['updated'] == 0 and not incremental and not resumed:
                 print(f"{Fore.RED}生成嵌入向量失败{Style.RESET_ALL}")
                 return False
             
-            # Index files
-            self.search_engine.index_files(embeddings_data)
-            
-            print(f"{Fore.GREEN}✓ 索引完成! 共索引 {len(embeddings_data)} 个文件{Style.RESET_ALL}")
+            print(f"{Fore.GREEN}✓ 索引完成! 扫描 {report['discovered']} 个文件: 新增 {report['added']}, "
+                  f"更新 {report['updated']}, 删除 {report['deleted']}, 未变化 {report['unchanged']} "
+                  f"(用时 {report['elapsed']:.1f} 秒){Style.RESET_ALL}")
+            if resumed:
+                print(f"已从中断处继续: 写入 {resumed['replayed']} 条上次生成的嵌入向量, "
+                      f"跳过 {resumed['skipped_dirs']} 个已完成的目录")
+            write = report['write']
+            if write['chunks']:
+                print(f"写入向量数据库: {write['rows']} 条, {write['chunks']} 批, "
+                      f"{write['rows_per_second']:.0f} 条/秒 (重试 {write['retries']} 次)")
             return True
             
         except Exception as e:
             print(f"{Fore.RED}索引过程中出错: {e}{Style.RESET_ALL}")
             return False
     
+    def run_index_pipeline(self, directory: str, incremental: Optional[bool] = None,
+                           resume: bool = False) -> Tuple[Dict, IndexPipeline]:
+        """
+        Run the streaming index pipeline over directory, into the directory's own shard
+        incremental: None follows Config.INCREMENTAL_INDEXING; incremental mode is only
+        used when the manifest matches the collection
+        resume: continue an interrupted run of this directory from its journal (keeps its mode)
+        Returns the pipeline report (plus 'incremental' and 'shard') and the pipeline
+        """
+        if incremental is None:
+            incremental = self.config.INCREMENTAL_INDEXING
+        shard = self.search_engine.shard_for_root(directory)
+        incremental = incremental and shard.can_index_incrementally()
+        
+        pipeline = IndexPipeline(
+            self.indexer,
+            shard,
+            chunk_size=self.config.PIPELINE_CHUNK_SIZE,
+            queue_size=self.config.PIPELINE_QUEUE_SIZE,
+            journal=self.config.INDEX_JOURNAL_ENABLED,
+            checkpoint_interval=self.config.INDEX_CHECKPOINT_SECONDS
+        )
+        report = pipeline.run(directory, incremental=incremental, resume=resume)
+        report['incremental'] = pipeline.incremental
+        report['shard'] = shard.collection_name
+        return report, pipeline
+    
+    def watch_directory(self, directory: str):
+        """Index the directory, then keep the index in sync with file changes until Ctrl+C"""
+        if not self.indexer or not self.search_engine:
+            print(f"{Fore.RED}系统未正确初始化{Style.RESET_ALL}")
+            return
+        
+        # Catch up with changes made while nobody was watching
+        shard = self.search_engine.shard_for_root(directory)
+        if not self.index_directory(directory) and not shard.can_index_incrementally():
+            return
+        
+        try:
+            watcher = IndexWatcher(
+                self.indexer,
+                shard,
+                [directory],
+                debounce_seconds=self.config.WATCH_DEBOUNCE_SECONDS,
+                max_delay_seconds=self.config.WATCH_MAX_DELAY_SECONDS,
+                poll_interval=self.config.WATCH_POLL_INTERVAL,
+                backend=self.config.WATCH_BACKEND
+            )
+        except (ImportError, ValueError) as e:
+            print(f"{Fore.RED}无法启动监视: {e}{Style.RESET_ALL}")
+            return
+        
+        print(f"\n{Fore.CYAN}正在监视目录: {directory} (方式: {watcher.backend}){Style.RESET_ALL}")
+        print("文件的新增、修改、移动和删除会在几秒内同步到索引，按 Ctrl+C 停止监视")
+        watcher.run()
+        
+        print(f"{Fore.GREEN}✓ 已停止监视: 共 {watcher.batches} 批更新, 新增/修改 {watcher.embedded}, "
+              f"元数据 {watcher.metadata_updated}, 删除 {watcher.deleted}{Style.RESET_ALL}")
+        if watcher.failures:
+            self.indexer.report_failures(watcher.failures)
+    
     def search_files(self):
         """Interactive file search"""
         if not self.search_engine:
@@ -138,6 +235,7 @@ class SemanticFileSearchApp:
         print(f"\n{Fore.CYAN}开始搜索 (当前已索引 {stats['count']} 个文件){Style.RESET_ALL}")
         print("输入搜索关键词，支持自然语言描述")
         print("例如: '石头', '岩石', '图片', 'python代码', '音乐文件' 等")
+        print("可附加过滤条件: ext:tga dir:Characters type:texture size>1MB modified<7d")
         print("输入 'back' 返回主菜单")
         
         while True:
@@ -197,9 +295,10 @@ class SemanticFileSearchApp:
             print("1. 索引新目录")
             print("2. 搜索文件")
             print("3. 查看统计信息")
-            print("4. 退出")
+            print("4. 监视目录 (实时更新索引)")
+            print("5. 退出")
             
-            choice = input("\n请选择 (1-4): ").strip()
+            choice = input("\n请选择 (1-5): ").strip()
             
             if choice == '1':
                 directory = self.get_directory_input()
@@ -215,11 +314,16 @@ class SemanticFileSearchApp:
                 self.show_stats()
             
             elif choice == '4':
+                directory = self.get_directory_input()
+                if directory:
+                    self.watch_directory(directory)
+            
+            elif choice == '5':
                 print(f"{Fore.GREEN}再见！{Style.RESET_ALL}")
                 break
             
             else:
-                print(f"{Fore.RED}无效选择，请输入 1-4{Style.RESET_ALL}")
+                print(f"{Fore.RED}无效选择，请输入 1-5{Style.RESET_ALL}")
     
     def show_stats(self):
         """Show collection statistics"""
@@ -229,9 +333,71 @@ class SemanticFileSearchApp:
             
         stats = self.search_engine.get_collection_stats()
         print(f"\n{Fore.CYAN}统计信息:{Style.RESET_ALL}")
-        print(f"已索引文件数量: {stats['count']}")
-        print(f"向量数据库路径: {self.config.CHROMA_DB_PATH}")
-        print(f"使用的嵌入模型: {self.config.EMBEDDING_MODEL}")
+        print(f"已索引文件数量: {stats['count']} (共 {len(stats['shards'])} 个分片)")
+        print(f"向量数据库路径: {self.config.CHROMA_DB_PATH} (存储: {self.config.VECTOR_STORE})")
+        print(f"使用的嵌入模型: {self.provider.describe() if self.provider else self.config.EMBEDDING_MODEL}")
+        for shard_stats in stats['shards']:
+            print(f"\n分片 {shard_stats['collection_name']}: {shard_stats['count']} 个文件")
+            print(f"    根目录: {shard_stats.get('root') or '未知'}")
+            if shard_stats.get('embedding_model'):
+                print(f"    构建模型: {shard_stats['embedding_provider']} / {shard_stats['embedding_model']} "
+                      f"({shard_stats['embedding_dimensions']} 维)")
+            if shard_stats.get('hnsw'):
+                hnsw = shard_stats['hnsw']
+                print(f"    HNSW: M={hnsw['M']}, construction_ef={hnsw['construction_ef']}, "
+                      f"search_ef={hnsw['search_ef']}")
+            if shard_stats['signature_mismatch']:
+                print(f"    {Fore.YELLOW}警告: {shard_stats['signature_mismatch']}{Style.RESET_ALL}")
+        print()
+        
+        if self.indexer and self.indexer.embedding_cache:
+            cache_stats = self.indexer.embedding_cache.stats()
+            print(f"嵌入缓存: {cache_stats['entries']} 条, 命中 {cache_stats['hits']}, "
+                  f"未命中 {cache_stats['misses']} (命中率 {cache_stats['hit_rate'] * 100:.1f}%)")
+        
+        if self.search_engine.query_cache:
+            query_stats = self.search_engine.query_cache.stats()
+            print(f"查询缓存: 向量命中率 {query_stats['embedding_hit_rate'] * 100:.1f}%, "
+                  f"结果命中率 {query_stats['result_hit_rate'] * 100:.1f}%")
+        
+        self.show_metrics()
+    
+    def show_metrics(self):
+        """Show the per-stage metrics collected in this process"""
+        derived = metrics.derived_metrics()
+        print(f"\n{Fore.CYAN}性能指标 (本次运行):{Style.RESET_ALL}")
+        if not (metrics.FILES_SCANNED.total() or metrics.EMBED_REQUESTS.total()
+                or metrics.SEARCH_SECONDS.snapshot() or metrics.STORE_WRITE_SECONDS.snapshot()):
+            print("暂无数据（本次运行尚未扫描、索引或搜索）")
+            return
+        if metrics.FILES_SCANNED.total():
+            print(f"扫描: {int(metrics.FILES_SCANNED.total())} 个文件, "
+                  f"{derived['files_scanned_per_second']:.0f} 文件/秒")
+        if metrics.EMBED_REQUESTS.total():
+            batch = metrics.EMBED_BATCH_SECONDS.summary(outcome='ok')
+            print(f"嵌入: {int(metrics.EMBED_REQUESTS.total())} 次请求, "
+                  f"平均 {derived['embedding_tokens_per_request']:.0f} tokens/请求, "
+                  f"重试率 {derived['embedding_retry_rate'] * 100:.1f}%, "
+                  f"批次延迟 p50 {batch['p50'] * 1000:.0f} ms / p99 {batch['p99'] * 1000:.0f} ms")
+            sizer = self.indexer.dispatcher.sizer if self.indexer else None
+            current = f" (当前批大小 {sizer.size})" if sizer else ""
+            print(f"嵌入批次: {int(metrics.EMBED_BATCHES.total())} 个, 比固定 {self.config.EMBEDDING_BATCH_SIZE} 条/批"
+                  f"节省 {int(derived['embedding_round_trips_saved'])} 次往返{current}")
+        for key, summary in metrics.STORE_WRITE_SECONDS.snapshot().items():
+            if summary['count']:
+                print(f"存储写入 ({key}): {summary['count']} 次, "
+                      f"p50 {summary['p50'] * 1000:.0f} ms / p99 {summary['p99'] * 1000:.0f} ms")
+        for key, summary in metrics.SEARCH_SECONDS.snapshot().items():
+            if summary['count']:
+                print(f"搜索 ({key}): {summary['count']} 次, "
+                      f"p50 {summary['p50'] * 1000:.1f} ms / p99 {summary['p99'] * 1000:.1f} ms")
+        embed = metrics.QUERY_EMBED_SECONDS.summary()
+        vector = metrics.QUERY_VECTOR_SECONDS.summary()
+        if embed['count'] or vector['count']:
+            print(f"向量检索拆分: 查询嵌入 p50 {embed['p50'] * 1000:.1f} ms, "
+                  f"向量查询 p50 {vector['p50'] * 1000:.1f} ms")
+        for cache, rate in derived['cache_hit_rates'].items():
+            print(f"缓存命中率 ({cache}): {rate * 100:.1f}%")
     
     def run(self):
         """Run the main application"""
@@ -239,15 +405,259 @@ class SemanticFileSearchApp:
         
         # Check if there are existing indexed files
         if self.search_engine:
-            stats = self.search_engine.get_collection_stats()
-            if stats["count"] > 0:
-                print(f"{Fore.GREEN}发现已索引的文件: {stats['count']} 个{Style.RESET_ALL}")
+            # Open Chroma while the user reads the menu; the manifest count needs no Chroma
+            self.search_engine.open_in_background()
+            count = self.search_engine.indexed_count()
+            if count > 0:
+                print(f"{Fore.GREEN}发现已索引的文件: {count} 个{Style.RESET_ALL}")
                 print("您可以直接进行搜索，或索引新的目录")
         
         self.show_main_menu()
 
-def main():
-    """Main entry point"""
+def build_cli_parser() -> argparse.ArgumentParser:
+    """Argument parser for the non-interactive commands"""
+    parser = argparse.ArgumentParser(
+        prog='main.py',
+        description="语义文件搜索工具（不带参数运行时进入交互菜单）",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"退出码: {EXIT_OK} 成功, {EXIT_ERROR} 出错, {EXIT_USAGE} 参数错误, "
+               f"{EXIT_NOT_INDEXED} 尚未索引或需要重新索引, {EXIT_PARTIAL} 部分文件索引失败"
+    )
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="退出时把本次运行的性能指标（计数器、延迟直方图）写入 JSON 文件")
+    commands = parser.add_subparsers(dest='command')
+
+    index_parser = commands.add_parser('index', help="索引目录（每个目录一个分片），输出 JSON 报告")
+    index_parser.add_argument('directory')
+    index_parser.add_argument('--full', action='store_true', help="完整重建该目录的分片，而不是增量更新")
+    index_parser.add_argument('--resume', action='store_true',
+                              help="从上次中断的索引继续（沿用其模式），已生成的嵌入向量不会重新请求")
+
+    search_parser = commands.add_parser('search', help="搜索文件，每个查询输出一行 JSON (NDJSON)")
+    search_parser.add_argument('queries', nargs='*', metavar='query',
+                               help="每个参数是一个查询（包含空格的查询请加引号），"
+                                    "可包含过滤条件如 ext:tga dir:Characters type:texture size>1MB modified<7d")
+    search_parser.add_argument('--stdin', action='store_true', help="从标准输入逐行读取查询，结果流式输出")
+    search_parser.add_argument('--top-k', type=int, default=None, help="每个查询的结果数量")
+    search_parser.add_argument('--mode', choices=['hybrid', 'vector', 'lexical'], help="检索方式")
+    search_parser.add_argument('--where', help="元数据过滤条件，Chroma where 语法的 JSON")
+    search_parser.add_argument('--batch-size', type=int, default=64, help="每批合并搜索的查询数")
+    search_parser.add_argument('--shard', action='append', metavar='NAME_OR_DIR',
+                               help="只搜索指定分片（分片名或索引目录，可重复），默认搜索全部")
+
+    commands.add_parser('stats', help="输出索引统计信息，包括每个分片 (JSON)")
+
+    remove_parser = commands.add_parser('remove', help="删除一个分片（分片名或索引目录）")
+    remove_parser.add_argument('shard', metavar='NAME_OR_DIR')
+
+    tune_parser = commands.add_parser('tune-hnsw', help="用精确检索结果评估一组 HNSW 参数的 recall 与延迟，并给出推荐 (JSON)")
+    tune_parser.add_argument('--shard', metavar='NAME_OR_DIR', help="要评估的分片，默认最大的分片")
+    tune_parser.add_argument('--m', help="逗号分隔的 M 取值 (默认 8,16,32)")
+    tune_parser.add_argument('--construction-ef', help="逗号分隔的 construction_ef 取值 (默认 100,200)")
+    tune_parser.add_argument('--search-ef', help="逗号分隔的 search_ef 取值 (默认 10,25,50,100,200)")
+    tune_parser.add_argument('--top-k', type=int, default=10, help="计算 recall@k 的 k")
+    tune_parser.add_argument('--queries', type=int, default=200, help="查询数")
+    tune_parser.add_argument('--max-vectors', type=int, default=None, help="最多使用的向量数")
+    tune_parser.add_argument('--target-recall', type=float, default=0.95, help="推荐设置需要达到的 recall")
+    return parser
+
+
+def _emit(out: TextIO, payload: Dict):
+    out.write(json.dumps(payload, ensure_ascii=False) + '\n')
+    out.flush()
+
+
+def _iter_query_batches(stream: TextIO, batch_size: int, linger: float = 0.01):
+    """
+    Group input lines into batches for search_many
+    A batch is whatever arrived within `linger` seconds of its first line (up to
+    batch_size), so piped files are batched fully while a script that writes one
+    query and waits for the answer is never blocked.
+    """
+    lines: queue.Queue = queue.Queue(maxsize=batch_size * 4)
+
+    def read():
+        for line in stream:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=read, daemon=True, name='stdin-reader').start()
+    done = False
+    while not done:
+        batch = []
+        item = lines.get()
+        while True:
+            if item is None:
+                done = True
+                break
+            query = item.strip()
+            if query:
+                batch.append(query)
+            if len(batch) >= batch_size:
+                break
+            try:
+                item = lines.get(timeout=linger)
+            except queue.Empty:
+                break
+        if batch:
+            yield batch
+
+
+def _cli_index(app: SemanticFileSearchApp, args, out: TextIO) -> int:
+    directory = os.path.abspath(os.path.expanduser(args.directory))
+    if not os.path.isdir(directory):
+        print(f"目录不存在: {directory}", file=sys.stderr)
+        return EXIT_ERROR
+
+    report, pipeline = app.run_index_pipeline(directory, incremental=not args.full, resume=args.resume)
+    report['directory'] = directory
+    report['failures'] = [{'path': file_info['path'], 'error': error} for file_info, error in pipeline.failures]
+    _emit(out, report)
+    return EXIT_PARTIAL if pipeline.failures else EXIT_OK
+
+
+def _cli_search(app: SemanticFileSearchApp, args, out: TextIO) -> int:
+    engine = app.search_engine
+    try:
+        filters = json.loads(args.where) if args.where else None
+    except ValueError as e:
+        print(f"--where 不是有效的 JSON: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if filters is not None and not isinstance(filters, dict):
+        print("--where 必须是 JSON 对象（Chroma where 语法）", file=sys.stderr)
+        return EXIT_USAGE
+    shards = [_shard_selector(shard) for shard in args.shard] if args.shard else None
+    try:
+        indexed = engine.has_indexed_files(shards)
+    except UnknownShardError as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+    if not indexed:
+        print("还没有索引任何文件，请先运行: main.py index <目录>", file=sys.stderr)
+        return EXIT_NOT_INDEXED
+
+    batch_size = max(1, args.batch_size)
+    if args.stdin:
+        batches = _iter_query_batches(sys.stdin, batch_size)
+    else:
+        batches = (args.queries[i:i + batch_size] for i in range(0, len(args.queries), batch_size))
+
+    try:
+        for batch in batches:
+            results = engine.search_many(batch, top_k=args.top_k, filters=filters, mode=args.mode,
+                                         raise_errors=True, shards=shards)
+            for query, query_results in zip(batch, results):
+                _emit(out, {'query': query, 'results': query_results})
+    except EmbeddingMismatchError as e:
+        print(e, file=sys.stderr)
+        return EXIT_NOT_INDEXED
+    except FilterSyntaxError as e:
+        print(f"过滤条件错误: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    return EXIT_OK
+
+
+def _cli_stats(app: SemanticFileSearchApp, args, out: TextIO) -> int:
+    engine = app.search_engine
+    stats = {
+        'collection': engine.get_collection_stats(),
+        'embedding_provider': app.provider.describe(),
+        'signature_mismatch': engine.signature_mismatches() or None,
+        'chroma_db_path': app.config.CHROMA_DB_PATH
+    }
+    if engine.query_cache:
+        stats['query_cache'] = engine.query_cache.stats()
+    if app.indexer.embedding_cache:
+        stats['embedding_cache'] = app.indexer.embedding_cache.stats()
+    stats['metrics'] = metrics.REGISTRY.snapshot()
+    _emit(out, stats)
+    return EXIT_OK
+
+
+def _shard_selector(value: str) -> str:
+    """Shard names pass through; anything that is a directory is matched by its root"""
+    return os.path.abspath(os.path.expanduser(value)) if os.path.isdir(value) else value
+
+
+def _cli_remove(app: SemanticFileSearchApp, args, out: TextIO) -> int:
+    try:
+        name = app.search_engine.remove_shard(_shard_selector(args.shard))
+    except UnknownShardError as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+    _emit(out, {'removed': name})
+    return EXIT_OK
+
+
+def _cli_tune_hnsw(app: SemanticFileSearchApp, args, out: TextIO) -> int:
+    from hnsw_tuning import (tune_engine, parse_grid, DEFAULT_M, DEFAULT_CONSTRUCTION_EF,
+                             DEFAULT_SEARCH_EF)
+
+    engine = app.search_engine
+    try:
+        shards = engine.select([_shard_selector(args.shard)] if args.shard else None)
+        grids = (parse_grid(args.m, DEFAULT_M), parse_grid(args.construction_ef, DEFAULT_CONSTRUCTION_EF),
+                 parse_grid(args.search_ef, DEFAULT_SEARCH_EF))
+    except (UnknownShardError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return EXIT_USAGE
+    shard = max(shards, key=lambda shard_engine: len(shard_engine.manifest), default=None)
+    if shard is None or not len(shard.manifest):
+        print("没有已索引的分片", file=sys.stderr)
+        return EXIT_NOT_INDEXED
+
+    header = [f"{'M':>4}{'construction_ef':>17}{'search_ef':>11}{'recall':>9}{'p50(ms)':>9}{'p99(ms)':>9}"
+              f"{'构建(s)':>9}{'索引(MB)':>10}"]
+
+    def show(result: Dict):
+        if header:
+            print(header.pop())
+        print(f"{result['M']:>4}{result['construction_ef']:>17}{result['search_ef']:>11}{result['recall']:>9.3f}"
+              f"{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['build_seconds']:>9.1f}"
+              f"{result['index_bytes'] / 1024 ** 2:>10.1f}")
+
+    report = tune_engine(shard, app.indexer._split_filename, *grids, k=args.top_k, query_count=args.queries,
+                         max_vectors=args.max_vectors, target_recall=args.target_recall, progress=show)
+    best = report['recommended_result']
+    if best:
+        reached = "达到" if best['recall'] >= args.target_recall else "未达到"
+        print(f"\n推荐: M={best['M']}, construction_ef={best['construction_ef']}, search_ef={best['search_ef']} "
+              f"(recall@{args.top_k} {best['recall']:.3f}, {reached}目标 {args.target_recall}, p50 {best['p50_ms']:.2f} ms)")
+        print(f"写入 config.py 的 HNSW_COLLECTION_PARAMS[{(shard.root or shard.collection_name)!r}] "
+              f"或 HNSW_M / HNSW_CONSTRUCTION_EF / HNSW_SEARCH_EF；M 和 construction_ef 需要 --full 重新索引后生效")
+    _emit(out, report)
+    return EXIT_OK
+
+
+CLI_COMMANDS = {
+    'index': _cli_index,
+    'search': _cli_search,
+    'stats': _cli_stats,
+    'remove': _cli_remove,
+    'tune-hnsw': _cli_tune_hnsw,
+}
+
+
+@contextlib.contextmanager
+def metrics_outputs(metrics_json: Optional[str] = None):
+    """Keep METRICS_PROMETHEUS_FILE up to date while running and dump a JSON snapshot at exit"""
+    writer = None
+    if Config.METRICS_PROMETHEUS_FILE:
+        writer = metrics.MetricsFileWriter(Config.METRICS_PROMETHEUS_FILE, Config.METRICS_WRITE_INTERVAL).start()
+    try:
+        yield
+    finally:
+        if writer is not None:
+            writer.stop()
+        if metrics_json:
+            try:
+                metrics.REGISTRY.write_json(metrics_json)
+            except OSError as e:
+                print(f"写入指标文件失败: {e}", file=sys.stderr)
+
+
+def run_interactive():
+    """Run the interactive menu"""
     try:
         app = SemanticFileSearchApp()
         app.run()
@@ -255,7 +665,45 @@ def main():
         print(f"\n{Fore.YELLOW}程序被用户中断{Style.RESET_ALL}")
     except Exception as e:
         print(f"\n{Fore.RED}程序运行出错: {e}{Style.RESET_ALL}")
-        sys.exit(1)
+        return EXIT_ERROR
+    return EXIT_OK
+
+
+def run_cli(argv: List[str]) -> int:
+    """
+    Run one non-interactive command and return its exit code
+    Only JSON goes to stdout; progress bars and messages go to stderr.
+    Without a command (only --metrics-json) the interactive menu is run.
+    """
+    parser = build_cli_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'search' and not args.queries and not args.stdin:
+        parser.error("search 需要至少一个查询，或使用 --stdin")
+
+    with metrics_outputs(args.metrics_json):
+        if args.command is None:
+            return run_interactive()
+        out = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                app = SemanticFileSearchApp()
+                return CLI_COMMANDS[args.command](app, args, out)
+            except KeyboardInterrupt:
+                return 130
+            except Exception as e:
+                print(f"错误: {e}", file=sys.stderr)
+                return EXIT_ERROR
+
+
+def main():
+    """Main entry point"""
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+
+    with metrics_outputs():
+        exit_code = run_interactive()
+    if exit_code != EXIT_OK:
+        sys.exit(exit_code)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
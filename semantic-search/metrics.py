@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import bisect
+import threading
+import contextlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from in-memory lookups to throttled API calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_text(labelnames: Sequence[str], key: Tuple[str, ...]) -> str:
+    """'cache=query_result,result=hit' (snapshot keys) for the label values of one series"""
+    return ','.join(f"{name}={value}" for name, value in zip(labelnames, key))
+
+
+def _prometheus_labels(labelnames: Sequence[str], key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, key)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}, 实际 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    """Monotonic total, optionally split by labels"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def series(self) -> Dict[Tuple[str, ...], float]:
+        """Label values -> count of every series"""
+        with self._lock:
+            return dict(self._series)
+
+    def total(self) -> float:
+        """Sum over all label values"""
+        with self._lock:
+            return sum(self._series.values())
+
+    def snapshot(self):
+        """The total of an unlabeled counter, else {'label=value,...': total}"""
+        with self._lock:
+            if not self.labelnames:
+                return self._series.get((), 0)
+            return {_label_text(self.labelnames, key): value for key, value in sorted(self._series.items())}
+
+    def prometheus_lines(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_prometheus_labels(self.labelnames, key)} {_format_number(value)}"
+                    for key, value in sorted(self._series.items())]
+
+
+class _HistogramSeries:
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)  # the last slot counts observations above every bucket
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket distribution (Prometheus histogram semantics)
+    Percentiles in snapshots are estimated by linear interpolation inside the
+    bucket that holds them, so they are as precise as the bucket layout.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[slot] += 1
+            series.count += 1
+            series.sum += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent inside the with block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, series: _HistogramSeries, fraction: float) -> float:
+        rank = fraction * series.count
+        seen = 0
+        for slot, count in enumerate(series.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[slot - 1] if slot > 0 else 0.0
+                if slot == len(self.buckets):
+                    return lower  # above the largest bucket: only a lower bound is known
+                return lower + (self.buckets[slot] - lower) * (rank - seen) / count
+            seen += count
+        return 0.0
+
+    def summary(self, **labels) -> Dict:
+        """count, sum, mean and estimated p50/p95/p99 (seconds) of one series"""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return self._summarize(series)
+
+    def _summarize(self, series: Optional[_HistogramSeries]) -> Dict:
+        if series is None or not series.count:
+            return {'count': 0, 'sum': 0.0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+        return {
+            'count': series.count,
+            'sum': series.sum,
+            'mean': series.sum / series.count,
+            'p50': self._quantile(series, 0.5),
+            'p95': self._quantile(series, 0.95),
+            'p99': self._quantile(series, 0.99)
+        }
+
+    def snapshot(self) -> Dict:
+        """The summary of an unlabeled histogram, else {'label=value,...': summary}"""
+        with self._lock:
+            if not self.labelnames:
+                return self._summarize(self._series.get(()))
+            return {_label_text(self.labelnames, key): self._summarize(series)
+                    for key, series in sorted(self._series.items())}
+
+    def prometheus_lines(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series.counts):
+                    cumulative += count
+                    labels = _prometheus_labels(self.labelnames, key, ('le', _format_number(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _prometheus_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(series.sum)}")
+                lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide collection of counters and histograms, exported as JSON or Prometheus text"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))  # type: ignore
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))  # type: ignore
+
+    def reset(self):
+        """Zero every metric (the registered metrics stay valid)"""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+        self.started = time.time()
+
+    def snapshot(self) -> Dict:
+        counters, histograms = {}, {}
+        for name, metric in sorted(self._metrics.items()):
+            (counters if metric.kind == 'counter' else histograms)[name] = metric.snapshot()
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'counters': counters,
+            'histograms': histograms,
+            'derived': derived_metrics()
+        }
+
+    def prometheus_text(self) -> str:
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _write_atomic(path: str, text: str):
+        # Scrapers (e.g. node_exporter's textfile collector) must never see a half-written file
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def write_json(self, path: str):
+        self._write_atomic(path, json.dumps(self.snapshot(), indent=2, ensure_ascii=False))
+
+    def write_prometheus(self, path: str):
+        self._write_atomic(path, self.prometheus_text())
+
+
+REGISTRY = MetricsRegistry()
+
+# Indexing
+FILES_SCANNED = REGISTRY.counter('semantic_search_files_scanned_total', "Indexable files found by directory scans")
+SCAN_SECONDS = REGISTRY.counter('semantic_search_scan_seconds_total', "Seconds spent scanning directories")
+EMBED_REQUESTS = REGISTRY.counter('semantic_search_embedding_requests_total', "Embedding API requests, retries included")
+EMBED_TEXTS = REGISTRY.counter('semantic_search_embedding_texts_total', "Texts sent for embedding, retries included")
+EMBED_TOKENS = REGISTRY.counter('semantic_search_embedding_tokens_total', "Estimated tokens sent for embedding")
+EMBED_RETRIES = REGISTRY.counter('semantic_search_embedding_retries_total', "Embedding requests retried after an error")
+EMBED_FAILED_TEXTS = REGISTRY.counter('semantic_search_embedding_failed_texts_total',
+                                      "Texts that still failed to embed after all retries")
+# Round-trips saved by batching = fixed-size baseline - batches actually sent
+EMBED_BATCHES = REGISTRY.counter('semantic_search_embedding_batches_total',
+                                 "Embedding batches sent, retries not included")
+EMBED_FIXED_SIZE_BATCHES = REGISTRY.counter('semantic_search_embedding_fixed_size_batches_total',
+                                            "Batches the same texts would have needed at EMBEDDING_BATCH_SIZE")
+EMBED_BATCH_SECONDS = REGISTRY.histogram('semantic_search_embedding_batch_seconds',
+                                         "Latency of one embedding API request", ('outcome',))
+STORE_WRITE_SECONDS = REGISTRY.histogram('semantic_search_store_write_seconds',
+                                         "Latency of one vector store write call", ('operation',))
+STORE_WRITE_ROWS = REGISTRY.counter('semantic_search_store_write_rows_total', "Rows written to the vector store",
+                                    ('operation',))
+STORE_WRITE_RETRIES = REGISTRY.counter('semantic_search_store_write_retries_total',
+                                       "Vector store write chunks retried after an error", ('operation',))
+
+# Searching
+SEARCH_SECONDS = REGISTRY.histogram('semantic_search_search_seconds', "End-to-end latency of a search call",
+                                    ('mode',))
+QUERY_EMBED_SECONDS = REGISTRY.histogram('semantic_search_query_embed_seconds',
+                                         "Time to embed the queries of one search (caches included)")
+QUERY_VECTOR_SECONDS = REGISTRY.histogram('semantic_search_query_vector_seconds',
+                                          "Time of one vector store query (one shard)")
+CACHE_LOOKUPS = REGISTRY.counter('semantic_search_cache_lookups_total', "Cache lookups by cache and outcome",
+                                 ('cache', 'result'))
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int):
+    if hits:
+        CACHE_LOOKUPS.inc(hits, cache=cache, result='hit')
+    if misses:
+        CACHE_LOOKUPS.inc(misses, cache=cache, result='miss')
+
+
+def derived_metrics() -> Dict:
+    """Rates and ratios computed from the raw metrics"""
+    scan_seconds = SCAN_SECONDS.total()
+    lookups: Dict[str, List[float]] = {}
+    for (cache, result), count in CACHE_LOOKUPS.series().items():
+        lookups.setdefault(cache, [0, 0])[result != 'hit'] += count
+    cache_hit_rates = {cache: hits / (hits + misses) for cache, (hits, misses) in sorted(lookups.items())
+                       if hits + misses}
+    requests = EMBED_REQUESTS.total()
+    return {
+        'files_scanned_per_second': FILES_SCANNED.total() / scan_seconds if scan_seconds else 0.0,
+        'embedding_tokens_per_request': EMBED_TOKENS.total() / requests if requests else 0.0,
+        'embedding_retry_rate': EMBED_RETRIES.total() / requests if requests else 0.0,
+        'embedding_round_trips_saved': EMBED_FIXED_SIZE_BATCHES.total() - EMBED_BATCHES.total(),
+        'cache_hit_rates': cache_hit_rates
+    }
+
+
+class MetricsFileWriter:
+    """Rewrites a Prometheus text file every interval seconds (node_exporter textfile collector style)"""
+
+    def __init__(self, path: str, interval: float = 15.0, registry: MetricsRegistry = REGISTRY):
+        self.path = path
+        self.interval = max(1.0, interval)
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            self.registry.write_prometheus(self.path)
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+    def start(self) -> "MetricsFileWriter":
+        self.write()
+        self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread and write the final values"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write()
@@ -0,0 +1,680 @@
+import os
+import json
+import uuid
+import shutil
+import threading
+from typing import List, Dict, Optional, Sequence, Iterable
+
+import numpy as np
+
+from vector_store import VectorStore
+from vector_quantization import QuantizedVectors, normalize_mode, top_k
+from lexical_index import matches_where
+
+SCHEMA_FILE = 'columns.json'
+FORMAT_VERSION = 1
+# Rows scored per block: big enough for BLAS, small enough that a block of scores stays in cache
+SEARCH_BLOCK_ROWS = 16384
+# Filters matching fewer than this share of rows only score the matching rows
+SELECTIVE_FILTER_FRACTION = 0.25
+# Rows per write call; only bounds the size of one request
+MAX_BATCH_SIZE = 50000
+# Strings are dictionary-encoded while they have at most this many distinct values
+# (or one per 8 rows in bigger collections): extensions, asset types, ...
+CATEGORY_MIN_DISTINCT = 256
+INITIAL_CAPACITY = 1024
+
+
+def _value_mask(values: Sequence, op: str, operand) -> np.ndarray:
+    """Generic (per value) evaluation of one where operator, same semantics as the lexical index"""
+    condition = {'v': {op: operand}}
+    return np.fromiter((matches_where({'v': value}, condition) for value in values), dtype=bool, count=len(values))
+
+
+class _NumberColumn:
+    """float64 values, NaN where a row has no value; memory-mapped once saved"""
+
+    kind = 'number'
+
+    def __init__(self, array: np.ndarray, integer: bool):
+        self.array = array
+        self.integer = integer
+
+    def get(self, row: int):
+        value = self.array[row]
+        if np.isnan(value):
+            return None
+        return int(value) if self.integer else float(value)
+
+    def decode(self) -> list:
+        return [self.get(row) for row in range(len(self.array))]
+
+    def mask(self, op: str, operand) -> np.ndarray:
+        if op in ('$eq', '$contains'):
+            return self.array == operand
+        if op in ('$ne', '$not_contains'):
+            return ~(self.array == operand)
+        if op in ('$in', '$nin'):
+            found = np.isin(self.array, [value for value in operand if isinstance(value, (int, float))])
+            return found if op == '$in' else ~found
+        if op in ('$gt', '$gte', '$lt', '$lte'):
+            # NaN compares False, so rows without a value never match
+            with np.errstate(invalid='ignore'):
+                return {'$gt': np.greater, '$gte': np.greater_equal,
+                        '$lt': np.less, '$lte': np.less_equal}[op](self.array, operand)
+        return _value_mask(self.decode(), op, operand)
+
+    def save(self, prefix: str) -> Dict:
+        np.save(prefix + '.npy', self.array)
+        return {'kind': self.kind, 'integer': self.integer, 'files': [prefix + '.npy']}
+
+    @classmethod
+    def load(cls, prefix: str, schema: Dict) -> "_NumberColumn":
+        return cls(np.load(prefix + '.npy', mmap_mode='r'), schema['integer'])
+
+
+class _CategoryColumn:
+    """Dictionary-encoded strings: int32 codes (-1 = no value) plus the distinct values"""
+
+    kind = 'category'
+
+    def __init__(self, codes: np.ndarray, values: List[str]):
+        self.codes = codes
+        self.values = values
+        self._lookup = {value: code for code, value in enumerate(values)}
+
+    def get(self, row: int):
+        code = int(self.codes[row])
+        return self.values[code] if code >= 0 else None
+
+    def decode(self) -> list:
+        return [self.values[code] if code >= 0 else None for code in self.codes.tolist()]
+
+    def mask(self, op: str, operand) -> np.ndarray:
+        if op in ('$eq', '$ne', '$contains', '$not_contains'):
+            found = self.codes == self._lookup.get(operand, -2)
+            return found if op in ('$eq', '$contains') else ~found
+        if op in ('$in', '$nin'):
+            found = np.isin(self.codes, [self._lookup[value] for value in operand if value in self._lookup])
+            return found if op == '$in' else ~found
+        # Range comparisons on strings: evaluate once per distinct value
+        per_code = np.append(_value_mask(self.values, op, operand), matches_where({}, {'v': {op: operand}}))
+        return per_code[self.codes]
+
+    def save(self, prefix: str) -> Dict:
+        np.save(prefix + '.npy', self.codes)
+        return {'kind': self.kind, 'values': self.values, 'files': [prefix + '.npy']}
+
+    @classmethod
+    def load(cls, prefix: str, schema: Dict) -> "_CategoryColumn":
+        return cls(np.load(prefix + '.npy', mmap_mode='r'), schema['values'])
+
+
+class _JsonColumn:
+    """
+    Any JSON value per row (long strings, lists), stored as UTF-8 JSON in one
+    blob with an offsets array; rows are decoded individually on access
+    """
+
+    kind = 'json'
+
+    def __init__(self, offsets: Optional[np.ndarray] = None, blob: Optional[np.ndarray] = None,
+                 values: Optional[list] = None):
+        self.offsets = offsets
+        self.blob = blob
+        self._values = values
+
+    def get(self, row: int):
+        if self._values is not None:
+            return self._values[row]
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self.blob[start:end].tobytes()) if end > start else None
+
+    def decode(self) -> list:
+        if self._values is None:
+            self._values = [self.get(row) for row in range(len(self.offsets) - 1)]
+        return self._values
+
+    def mask(self, op: str, operand) -> np.ndarray:
+        return _value_mask(self.decode(), op, operand)
+
+    def save(self, prefix: str) -> Dict:
+        encoded = [b'' if value is None else json.dumps(value, ensure_ascii=False).encode('utf-8')
+                   for value in self.decode()]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item) for item in encoded])
+        np.save(prefix + '.offsets.npy', offsets)
+        with open(prefix + '.bin', 'wb') as f:
+            f.write(b''.join(encoded))
+        return {'kind': self.kind, 'files': [prefix + '.offsets.npy', prefix + '.bin']}
+
+    @classmethod
+    def load(cls, prefix: str, schema: Optional[Dict] = None) -> "_JsonColumn":
+        offsets = np.load(prefix + '.offsets.npy', mmap_mode='r')
+        # A zero-length file can't be memory-mapped
+        blob = (np.memmap(prefix + '.bin', dtype=np.uint8, mode='r') if offsets[-1] > 0
+                else np.empty(0, dtype=np.uint8))
+        return cls(offsets, blob)
+
+
+_COLUMN_KINDS = {column.kind: column for column in (_NumberColumn, _CategoryColumn, _JsonColumn)}
+
+
+def _encode(values: list):
+    """Pick the most compact column type that can hold the values"""
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        array = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        return _NumberColumn(array, integer=all(isinstance(value, int) for value in present))
+    if all(isinstance(value, str) for value in present):
+        distinct = list(dict.fromkeys(present))
+        if len(distinct) <= max(CATEGORY_MIN_DISTINCT, len(values) // 8):
+            lookup = {value: code for code, value in enumerate(distinct)}
+            codes = np.array([-1 if value is None else lookup[value] for value in values], dtype=np.int32)
+            return _CategoryColumn(codes, distinct)
+    return _JsonColumn(values=values)
+
+
+class _Column:
+    """One metadata field: encoded arrays as loaded/saved, or a plain list while being written"""
+
+    def __init__(self, encoded=None, values: Optional[list] = None):
+        self._encoded = encoded
+        self._values = values
+
+    def values(self) -> list:
+        """Mutable list of the values; call changed() after modifying it"""
+        if self._values is None:
+            self._values = list(self._encoded.decode())
+        return self._values
+
+    def changed(self):
+        self._encoded = None
+
+    def encoded(self):
+        if self._encoded is None:
+            self._encoded = _encode(self._values)
+        return self._encoded
+
+    def get(self, row: int):
+        if self._values is not None:
+            return self._values[row]
+        return self._encoded.get(row)
+
+
+def _normalized(vectors) -> np.ndarray:
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class NumpyCollection:
+    """
+    Exact cosine search over a memory-mapped float32 .npy matrix
+    Vectors are L2-normalized on write and scored block by block with one
+    matrix product per block, merging the per-block top k. Metadata lives in
+    a columnar sidecar: numbers and low-cardinality strings as memory-mapped
+    arrays (where clauses on them are vectorized), everything else as JSON
+    with an offsets array. Opening only maps files, so startup is immediate.
+    Writes are buffered and persisted by flush(); each flush writes a new
+    generation of column files, so readers in other processes keep a
+    consistent snapshot until they notice the new schema file and reload.
+    """
+
+    def __init__(self, directory: str, name: str, quantization: Optional[str] = None, rescore_factor: int = 4):
+        self.directory = directory
+        self.name = name
+        self.quantization = normalize_mode(quantization)
+        self.rescore_factor = rescore_factor
+        self._lock = threading.RLock()
+        self._metadata: Dict = {}
+        self._count = 0
+        self._dimensions: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._vectors_file: Optional[str] = None
+        self._ids = _Column(values=[])
+        self._id_rows: Optional[Dict[str, int]] = None
+        self._columns: Dict[str, _Column] = {}
+        self._files: List[str] = []
+        self._schema_mtime = None
+        self._dirty = False
+        self._writable = False
+        self._quantized: Optional[QuantizedVectors] = None
+
+    # --- persistence ---
+
+    def _schema_path(self) -> str:
+        return os.path.join(self.directory, SCHEMA_FILE)
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, SCHEMA_FILE))
+
+    def load(self):
+        """Map the files of the current generation (nothing is read up front)"""
+        with self._lock:
+            schema_path = self._schema_path()
+            mtime = os.stat(schema_path).st_mtime_ns
+            with open(schema_path, 'r', encoding='utf-8') as f:
+                schema = json.load(f)
+            if schema.get('version') != FORMAT_VERSION:
+                raise ValueError(f"不支持的向量存储格式版本: {schema.get('version')}")
+
+            self._metadata = schema['metadata']
+            self._count = schema['rows']
+            self._dimensions = schema['dimensions']
+            self._vectors_file = schema['vectors']
+            self._vectors = (np.load(self._path(self._vectors_file), mmap_mode='r')
+                             if self._vectors_file else None)
+            self._ids = _Column(_JsonColumn.load(self._path(schema['ids']['prefix'])))
+            self._columns = {}
+            for name, column in schema['columns'].items():
+                loader = _COLUMN_KINDS[column['kind']]
+                self._columns[name] = _Column(loader.load(self._path(column['prefix']), column))
+            self._files = schema['files']
+            self._id_rows = None
+            self._quantized = None
+            self._dirty = False
+            self._writable = False
+            self._schema_mtime = mtime
+
+    def _maybe_reload(self):
+        """Pick up a newer generation flushed by another process"""
+        if self._dirty or self._writable:
+            return
+        try:
+            mtime = os.stat(self._schema_path()).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._schema_mtime:
+            self.load()
+
+    def flush(self):
+        """Write buffered changes as a new generation, then remove the previous one"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            if self._vectors is not None:
+                self._vectors.flush()
+
+            generation = uuid.uuid4().hex[:12]
+            files = [self._vectors_file] if self._vectors_file else []
+            ids_schema = self._save_column(_JsonColumn(values=self._ids.values()), f"{generation}.ids")
+            files += ids_schema.pop('files')
+            columns = {}
+            for index, (name, column) in enumerate(self._columns.items()):
+                columns[name] = self._save_column(column.encoded(), f"{generation}.c{index}")
+                files += columns[name].pop('files')
+
+            schema = {
+                'version': FORMAT_VERSION,
+                'rows': self._count,
+                'dimensions': self._dimensions,
+                'metadata': self._metadata,
+                'vectors': self._vectors_file,
+                'ids': ids_schema,
+                'columns': columns,
+                'files': files
+            }
+            temp_path = self._schema_path() + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(schema, f, ensure_ascii=False)
+            os.replace(temp_path, self._schema_path())
+
+            for file_name in set(self._files) - set(files):
+                try:
+                    os.remove(self._path(file_name))
+                except OSError:
+                    # Still mapped by a reader (Windows); removed by a later flush or delete
+                    pass
+            self._files = files
+            self._dirty = False
+            self._schema_mtime = os.stat(self._schema_path()).st_mtime_ns
+
+    def _save_column(self, encoded, prefix: str) -> Dict:
+        schema = encoded.save(self._path(prefix))
+        schema['prefix'] = prefix
+        schema['files'] = [os.path.basename(path) for path in schema['files']]
+        return schema
+
+    def close(self):
+        """Release the memory maps (before the files are deleted)"""
+        with self._lock:
+            self._vectors = None
+            self._ids = _Column(values=[])
+            self._columns = {}
+            self._quantized = None
+
+    # --- writes ---
+
+    def _prepare_write(self, dimensions: Optional[int] = None):
+        self._maybe_reload()
+        if dimensions is not None:
+            if self._dimensions is None:
+                self._dimensions = dimensions
+            elif dimensions != self._dimensions:
+                raise ValueError(f"向量维度不一致: 集合为 {self._dimensions} 维, 写入的是 {dimensions} 维")
+        if not self._writable:
+            if self._vectors is not None:
+                self._vectors = np.load(self._path(self._vectors_file), mmap_mode='r+')
+            self._writable = True
+        self._quantized = None
+        self._dirty = True
+
+    def _id_map(self) -> Dict[str, int]:
+        if self._id_rows is None:
+            self._id_rows = {file_id: row for row, file_id in enumerate(self._ids.values())}
+        return self._id_rows
+
+    def _ensure_capacity(self, rows: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        file_name = f"{uuid.uuid4().hex[:12]}.vectors.npy"
+        grown = np.lib.format.open_memmap(self._path(file_name), mode='w+', dtype=np.float32,
+                                          shape=(max(rows, capacity * 2, INITIAL_CAPACITY), self._dimensions))
+        # Rows past the old capacity are new and not written yet
+        kept = min(self._count, capacity)
+        if kept:
+            grown[:kept] = self._vectors[:kept]
+        previous_file = self._vectors_file
+        self._vectors = grown
+        self._vectors_file = file_name
+        # A file of the persisted generation is removed by the next flush; one grown since is unused
+        if previous_file and previous_file not in self._files:
+            try:
+                os.remove(self._path(previous_file))
+            except OSError:
+                pass
+
+    def _assign_rows(self, ids: Sequence[str]) -> List[int]:
+        """Row of every id, appending rows for new ids"""
+        id_rows = self._id_map()
+        id_values = self._ids.values()
+        rows, added = [], 0
+        for file_id in ids:
+            row = id_rows.get(file_id)
+            if row is None:
+                row = self._count + added
+                id_rows[file_id] = row
+                id_values.append(file_id)
+                added += 1
+            rows.append(row)
+        if added:
+            self._ids.changed()
+            for column in self._columns.values():
+                column.values().extend([None] * added)
+                column.changed()
+            self._count += added
+        return rows
+
+    def _column(self, name: str) -> _Column:
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = _Column(values=[None] * self._count)
+        return column
+
+    def upsert(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Dict]] = None,
+               documents=None):
+        """Insert or replace rows; documents are not stored (metadata carries the searchable text)"""
+        with self._lock:
+            vectors = _normalized(embeddings)
+            if len(vectors) != len(ids):
+                raise ValueError(f"ids 与向量数量不一致: {len(ids)} / {len(vectors)}")
+            self._prepare_write(vectors.shape[1])
+            rows = self._assign_rows(ids)
+            self._ensure_capacity(self._count)
+            self._vectors[rows] = vectors
+
+            metadatas = metadatas or [{} for _ in ids]
+            for name in set(self._columns) | {key for metadata in metadatas for key in metadata}:
+                column = self._column(name)
+                values = column.values()
+                for row, metadata in zip(rows, metadatas):
+                    values[row] = metadata.get(name)
+                column.changed()
+
+    def update(self, ids: Sequence[str], embeddings=None, metadatas: Optional[Sequence[Dict]] = None):
+        """Merge metadata keys (and replace vectors) of existing rows; unknown ids are ignored"""
+        with self._lock:
+            self._prepare_write(None if embeddings is None else _normalized(embeddings).shape[1])
+            id_rows = self._id_map()
+            known = [(index, id_rows[file_id]) for index, file_id in enumerate(ids) if file_id in id_rows]
+            if embeddings is not None and known:
+                vectors = _normalized(embeddings)
+                self._vectors[[row for _, row in known]] = vectors[[index for index, _ in known]]
+            for name in {key for metadata in metadatas or [] for key in metadata}:
+                column = self._column(name)
+                values = column.values()
+                for index, row in known:
+                    if name in metadatas[index]:
+                        values[row] = metadatas[index][name]
+                column.changed()
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None):
+        """Remove rows by id (and/or where clause); the last row moves into each freed slot"""
+        with self._lock:
+            if where is not None:
+                matching = self.get(ids=ids, where=where, include=[])['ids']
+                ids = matching
+            self._prepare_write()
+            id_rows = self._id_map()
+            id_values = self._ids.values()
+            columns = [column.values() for column in self._columns.values()]
+            for file_id in ids or []:
+                row = id_rows.pop(file_id, None)
+                if row is None:
+                    continue
+                last = self._count - 1
+                if row != last:
+                    self._vectors[row] = self._vectors[last]
+                    moved_id = id_values[last]
+                    id_values[row] = moved_id
+                    id_rows[moved_id] = row
+                    for values in columns:
+                        values[row] = values[last]
+                id_values.pop()
+                for values in columns:
+                    values.pop()
+                self._count -= 1
+            self._ids.changed()
+            for column in self._columns.values():
+                column.changed()
+
+    # --- reads ---
+
+    @property
+    def metadata(self) -> Dict:
+        return self._metadata
+
+    def count(self) -> int:
+        with self._lock:
+            self._maybe_reload()
+            return self._count
+
+    def _row_metadata(self, row: int) -> Dict:
+        metadata = {}
+        for name, column in self._columns.items():
+            value = column.get(row)
+            if value is not None:
+                metadata[name] = value
+        return metadata
+
+    def _where_mask(self, where: Dict) -> np.ndarray:
+        mask = np.ones(self._count, dtype=bool)
+        for key, condition in where.items():
+            if key in ('$and', '$or'):
+                masks = [self._where_mask(clause) for clause in condition]
+                combined = np.logical_and.reduce(masks) if key == '$and' else np.logical_or.reduce(masks)
+                mask &= combined
+                continue
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            column = self._columns.get(key)
+            for op, operand in condition.items():
+                if column is None:
+                    # No row has the field
+                    mask &= matches_where({}, {key: {op: operand}})
+                else:
+                    mask &= column.encoded().mask(op, operand)[:self._count]
+        return mask
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Iterable[str] = ('metadatas', 'documents')) -> Dict:
+        with self._lock:
+            self._maybe_reload()
+            if ids is not None:
+                id_rows = self._id_map()
+                rows = np.array([id_rows[file_id] for file_id in ids if file_id in id_rows], dtype=np.int64)
+            else:
+                rows = np.arange(self._count)
+            if where:
+                rows = rows[self._where_mask(where)[rows]]
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+
+            result = {'ids': [self._ids.get(int(row)) for row in rows]}
+            include = set(include)
+            if 'metadatas' in include:
+                result['metadatas'] = [self._row_metadata(int(row)) for row in rows]
+            if 'embeddings' in include:
+                result['embeddings'] = (np.asarray(self._vectors[rows]) if len(rows)
+                                        else np.empty((0, self._dimensions or 0), dtype=np.float32))
+            if 'documents' in include:
+                result['documents'] = [None] * len(rows)
+            return result
+
+    def _quantizer(self) -> QuantizedVectors:
+        if self._quantized is None:
+            vectors = self._vectors[:self._count]
+            self._quantized = QuantizedVectors(vectors, self.quantization, full_precision=vectors)
+        return self._quantized
+
+    def _exact_top_k(self, queries: np.ndarray, k: int, mask: Optional[np.ndarray]):
+        """Blocked matrix product over the stored rows, merging the top k of every block"""
+        candidates = None
+        if mask is not None and mask.sum() < self._count * SELECTIVE_FILTER_FRACTION:
+            # Selective filter: score only the matching rows
+            candidates = np.flatnonzero(mask)
+            total = len(candidates)
+        else:
+            total = self._count
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, total, SEARCH_BLOCK_ROWS):
+            end = min(total, start + SEARCH_BLOCK_ROWS)
+            if candidates is not None:
+                rows = candidates[start:end]
+                scores = queries @ np.asarray(self._vectors[rows]).T
+            else:
+                rows = np.arange(start, end)
+                scores = queries @ np.asarray(self._vectors[start:end]).T
+                if mask is not None:
+                    scores[:, ~mask[start:end]] = -np.inf
+            block_best, block_scores = top_k(scores, k)
+            merged_rows = np.concatenate([best_rows, rows[block_best]], axis=1)
+            merged_scores = np.concatenate([best_scores, block_scores], axis=1)
+            order, best_scores = top_k(merged_scores, k)
+            best_rows = np.take_along_axis(merged_rows, order, axis=1)
+        return best_rows, best_scores
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Iterable[str] = ('metadatas', 'documents', 'distances')) -> Dict:
+        """Top n_results per query by cosine similarity; distances are 1 - cosine like Chroma's"""
+        with self._lock:
+            self._maybe_reload()
+            queries = _normalized(query_embeddings)
+            include = set(include)
+            if self._count == 0 or n_results <= 0:
+                rows = np.empty((len(queries), 0), dtype=np.int64)
+                scores = np.empty((len(queries), 0), dtype=np.float32)
+            else:
+                if queries.shape[1] != self._dimensions:
+                    raise ValueError(f"查询向量维度 {queries.shape[1]} 与集合的 {self._dimensions} 维不一致")
+                mask = self._where_mask(where) if where else None
+                if self.quantization != 'float32':
+                    rows, scores = self._quantizer().search(queries, n_results, self.rescore_factor, mask)
+                else:
+                    rows, scores = self._exact_top_k(queries, n_results, mask)
+
+            result = {'ids': [], 'distances': [], 'metadatas': [], 'documents': []}
+            for query_rows, query_scores in zip(rows.tolist(), scores.tolist()):
+                # Rows excluded by the filter only show up when fewer than n_results match
+                hits = [(row, score) for row, score in zip(query_rows, query_scores) if score != -np.inf]
+                result['ids'].append([self._ids.get(row) for row, _ in hits])
+                result['distances'].append([1.0 - score for _, score in hits])
+                if 'metadatas' in include:
+                    result['metadatas'].append([self._row_metadata(row) for row, _ in hits])
+                if 'documents' in include:
+                    result['documents'].append([None] * len(hits))
+            return {key: value for key, value in result.items()
+                    if key == 'ids' or key in include}
+
+
+class NumpyVectorStore(VectorStore):
+    """Collections as directories of memory-mapped NumPy files, <path>/<name>.vectors/"""
+
+    name = 'numpy'
+
+    def __init__(self, path: str, quantization: Optional[str] = None, rescore_factor: int = 4):
+        self.path = path
+        self.quantization = normalize_mode(quantization)
+        self.rescore_factor = rescore_factor
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def _directory(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.vectors")
+
+    def _new_collection(self, name: str) -> NumpyCollection:
+        return NumpyCollection(self._directory(name), name, self.quantization, self.rescore_factor)
+
+    def _create(self, name: str, metadata: Optional[Dict]) -> NumpyCollection:
+        collection = self._new_collection(name)
+        collection._metadata = dict(metadata or {})
+        collection._dirty = True
+        collection.flush()
+        self._collections[name] = collection
+        return collection
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None) -> NumpyCollection:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None:
+                return collection
+            if NumpyCollection.exists(self._directory(name)):
+                collection = self._new_collection(name)
+                collection.load()
+                self._collections[name] = collection
+                return collection
+            return self._create(name, metadata)
+
+    def create_collection(self, name: str, metadata: Optional[Dict] = None) -> NumpyCollection:
+        with self._lock:
+            if name in self._collections or NumpyCollection.exists(self._directory(name)):
+                raise ValueError(f"Collection {name} already exists")
+            return self._create(name, metadata)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            directory = self._directory(name)
+            if not os.path.isdir(directory):
+                raise ValueError(f"Collection {name} does not exist")
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def get_max_batch_size(self) -> int:
+        return MAX_BATCH_SIZE
+
+    def flush(self, collection: NumpyCollection):
+        collection.flush()
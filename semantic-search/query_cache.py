@@ -0,0 +1,106 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any, Hashable
+
+from embedding_cache import EmbeddingCache
+from metrics import record_cache_lookups
+
+
+class LRUCache:
+    """Small thread-safe in-memory LRU with hit/miss counters"""
+
+    def __init__(self, max_size: int, name: str = 'lru'):
+        """name: cache label of the lookups in the metrics registry"""
+        self.max_size = max_size
+        self.name = name
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                record_cache_lookups(self.name, 1, 0)
+                return self._data[key]
+            self.misses += 1
+            record_cache_lookups(self.name, 0, 1)
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class QueryCache:
+    """
+    Caches for SemanticSearchEngine.search
+    Query embeddings: in-memory LRU in front of the persistent embedding cache,
+    so repeated queries never reach the API, even across sessions.
+    Results: in-memory LRU keyed by (query, top_k, filters, index version);
+    bumping the index version on every collection write invalidates it.
+    """
+
+    def __init__(self, embedding_cache: Optional[EmbeddingCache] = None,
+                 embedding_cache_size: int = 10000, result_cache_size: int = 1000):
+        self.embeddings = LRUCache(embedding_cache_size, name='query_embedding')
+        self.results = LRUCache(result_cache_size, name='query_result')
+        self.persistent = embedding_cache
+
+    def get_embedding(self, query: str) -> Optional[List[float]]:
+        embedding = self.embeddings.get(query)
+        if embedding is None and self.persistent:
+            embedding = self.persistent.get_many([query]).get(query)
+            if embedding is not None:
+                self.embeddings.put(query, embedding)
+        return embedding
+
+    def put_embedding(self, query: str, embedding: List[float]):
+        self.embeddings.put(query, embedding)
+        if self.persistent:
+            self.persistent.put_many([(query, embedding)])
+
+    @staticmethod
+    def result_key(query: str, top_k: int, filters: Optional[Dict], index_version: int, mode: str = '',
+                   scope: str = '') -> tuple:
+        # scope: collection name, so shards sharing one cache never see each other's results
+        filters_key = json.dumps(filters, sort_keys=True) if filters else ''
+        return (query, top_k, filters_key, index_version, mode, scope)
+
+    def get_results(self, key: tuple) -> Optional[List[Dict]]:
+        results = self.results.get(key)
+        # Hand out copies so callers can't corrupt the cached entry
+        return [dict(result) for result in results] if results is not None else None
+
+    def put_results(self, key: tuple, results: List[Dict]):
+        self.results.put(key, [dict(result) for result in results])
+
+    def stats(self) -> Dict:
+        def rate(cache: LRUCache) -> float:
+            lookups = cache.hits + cache.misses
+            return cache.hits / lookups if lookups else 0.0
+
+        stats = {
+            'embedding_hits': self.embeddings.hits,
+            'embedding_misses': self.embeddings.misses,
+            'embedding_hit_rate': rate(self.embeddings),
+            'result_hits': self.results.hits,
+            'result_misses': self.results.misses,
+            'result_hit_rate': rate(self.results)
+        }
+        if self.persistent:
+            stats['persistent'] = self.persistent.stats()
+        return stats
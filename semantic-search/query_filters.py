@@ -0,0 +1,205 @@
+import os
+import re
+import time
+from typing import List, Dict, Tuple, Optional
+
+# Unreal Engine naming-convention prefixes -> asset type facet (longest prefixes first)
+ASSET_TYPE_PREFIXES = [
+    ('VFX_', 'vfx'),
+    ('SFX_', 'sfx'),
+    ('WBP_', 'widget'),
+    ('SM_', 'static_mesh'),
+    ('SK_', 'skeletal_mesh'),
+    ('BP_', 'blueprint'),
+    ('MI_', 'material'),
+    ('T_', 'texture'),
+    ('M_', 'material'),
+    ('A_', 'animation'),
+]
+ASSET_TYPES = sorted({asset_type for _, asset_type in ASSET_TYPE_PREFIXES} | {'other'})
+
+# Shorthands accepted by type:
+ASSET_TYPE_ALIASES = {
+    'tex': ['texture'],
+    'mat': ['material'],
+    'mesh': ['static_mesh', 'skeletal_mesh'],
+    'staticmesh': ['static_mesh'],
+    'skeletalmesh': ['skeletal_mesh'],
+    'bp': ['blueprint'],
+    'wbp': ['widget'],
+    'umg': ['widget'],
+    'anim': ['animation'],
+    'sound': ['sfx'],
+    'audio': ['sfx'],
+}
+
+SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2,
+              'g': 1024 ** 3, 'gb': 1024 ** 3, 't': 1024 ** 4, 'tb': 1024 ** 4}
+AGE_UNITS = {'min': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400, 'mo': 30 * 86400, 'y': 365 * 86400}
+
+FILTER_KEYS = ('ext', 'dir', 'type', 'size', 'modified')
+
+# key, operator and value (optionally quoted) of one filter token; '-' negates
+_FILTER_TOKEN = re.compile(
+    r'(?<!\S)(-?)(' + '|'.join(FILTER_KEYS) + r')(>=|<=|:|>|<|=)("[^"]*"|\S+)',
+    re.IGNORECASE
+)
+_SIZE_VALUE = re.compile(r'^(\d+(?:\.\d+)?)\s*([a-z]*)$', re.IGNORECASE)
+_AGE_VALUE = re.compile(r'^(\d+(?:\.\d+)?)\s*(min|mo|[hdwy])$', re.IGNORECASE)
+_DATE_VALUE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+class FilterSyntaxError(ValueError):
+    """A recognised filter (ext:, dir:, type:, size, modified) has an invalid value"""
+
+
+def asset_type_for(stem: str) -> str:
+    """Asset type facet of a file from its Unreal naming prefix, 'other' when it has none"""
+    upper = stem.upper()
+    for prefix, asset_type in ASSET_TYPE_PREFIXES:
+        if upper.startswith(prefix):
+            return asset_type
+    return 'other'
+
+
+def directory_names(parent: str) -> List[str]:
+    """Lower-cased directory components of a path, matched by dir:"""
+    _, rest = os.path.splitdrive(parent)
+    return [part.lower() for part in re.split(r'[\\/]+', rest) if part]
+
+
+def combine_where(*clauses: Optional[Dict]) -> Optional[Dict]:
+    """AND together Chroma where clauses, skipping empty ones"""
+    parts = []
+    for clause in clauses:
+        if not clause:
+            continue
+        if set(clause) == {'$and'}:
+            parts.extend(clause['$and'])
+        elif len(clause) > 1:
+            # Chroma wants exactly one field or operator per clause
+            parts.extend({key: value} for key, value in clause.items())
+        else:
+            parts.append(clause)
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else {'$and': parts}
+
+
+def parse_query(query: str, now: Optional[float] = None) -> Tuple[str, Optional[Dict]]:
+    """
+    Split a query into free text and a Chroma where clause
+        ext:tga  ext:tga,png  dir:Characters  type:texture  size>1MB  modified<7d
+        modified>2024-01-01  -ext:txt (negated)
+    Clauses are ANDed; comma-separated values match any of them. Tokens with
+    other keys (including Windows drive letters such as C:) stay in the text.
+    Returns (text, where) where `where` is None when the query has no filters.
+    """
+    if now is None:
+        now = time.time()
+    clauses = []
+
+    def take(match) -> str:
+        negate, key, op, value = match.group(1) == '-', match.group(2).lower(), match.group(3), match.group(4)
+        if value.startswith('"') and value.endswith('"') and len(value) >= 2:
+            value = value[1:-1]
+        clauses.append(_clause(key, op, value, negate, now))
+        return ' '
+    text = ' '.join(_FILTER_TOKEN.sub(take, query).split())
+    return text, combine_where(*clauses)
+
+
+def _values(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _clause(key: str, op: str, value: str, negate: bool, now: float) -> Dict:
+    if key in ('ext', 'type', 'dir'):
+        if op not in (':', '='):
+            raise FilterSyntaxError(f"{key} 只支持 {key}:值 的写法")
+        values = _values(value)
+        if not values:
+            raise FilterSyntaxError(f"{key}: 缺少值")
+        if key == 'ext':
+            return _membership('file_extension', ['.' + item.lower().lstrip('.') for item in values], negate)
+        if key == 'type':
+            return _membership('asset_type', _asset_types(values), negate)
+        return _directory_clause(values, negate)
+
+    if negate:
+        raise FilterSyntaxError(f"{key} 不支持 '-' 取反，请改用相反的比较符")
+    if key == 'size':
+        return _compare('file_size', op, _parse_size(value))
+    return _modified_clause(op, value, now)
+
+
+def _membership(field: str, values: List[str], negate: bool) -> Dict:
+    values = list(dict.fromkeys(values))
+    if len(values) == 1:
+        return {field: {'$ne' if negate else '$eq': values[0]}}
+    return {field: {'$nin' if negate else '$in': values}}
+
+
+def _asset_types(values: List[str]) -> List[str]:
+    types = []
+    for value in values:
+        value = value.lower()
+        if value in ASSET_TYPE_ALIASES:
+            types.extend(ASSET_TYPE_ALIASES[value])
+        elif value in ASSET_TYPES:
+            types.append(value)
+        else:
+            raise FilterSyntaxError(f"未知的资源类型: {value} (可选: {', '.join(ASSET_TYPES)})")
+    return types
+
+
+def _directory_clause(values: List[str], negate: bool) -> Dict:
+    # dir:Characters/Hero requires every component; dir:A,B either directory
+    alternatives = []
+    for value in values:
+        names = directory_names(value)
+        if not names:
+            raise FilterSyntaxError(f"无效的目录: {value}")
+        op = '$not_contains' if negate else '$contains'
+        alternatives.append(combine_where(*({'dir_names': {op: name}} for name in names)))
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return {'$and' if negate else '$or': alternatives}
+
+
+def _compare(field: str, op: str, value: float) -> Dict:
+    operator = {'>': '$gt', '>=': '$gte', '<': '$lt', '<=': '$lte', ':': '$eq', '=': '$eq'}[op]
+    return {field: {operator: value}}
+
+
+def _parse_size(value: str) -> int:
+    match = _SIZE_VALUE.match(value)
+    if not match or match.group(2).lower() not in SIZE_UNITS:
+        raise FilterSyntaxError(f"无效的文件大小: {value} (示例: 500KB, 1.5MB, 2GB)")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def _modified_clause(op: str, value: str, now: float) -> Dict:
+    if _DATE_VALUE.match(value):
+        try:
+            # Local midnight, matching how file managers show dates
+            day_start = time.mktime(time.strptime(value, '%Y-%m-%d'))
+        except ValueError:
+            raise FilterSyntaxError(f"无效的日期: {value}")
+        day_end = day_start + 86400
+        if op in (':', '='):
+            return {'$and': [{'file_mtime': {'$gte': day_start}}, {'file_mtime': {'$lt': day_end}}]}
+        # "after a date" starts the day after it, "before" ends when it begins
+        bound = {'>': ('$gte', day_end), '>=': ('$gte', day_start),
+                 '<': ('$lt', day_start), '<=': ('$lt', day_end)}[op]
+        return {'file_mtime': {bound[0]: bound[1]}}
+
+    match = _AGE_VALUE.match(value)
+    if not match:
+        raise FilterSyntaxError(f"无效的修改时间: {value} (示例: 30min, 12h, 7d, 2w, 6mo, 1y, 2024-01-01)")
+    # Ages are compared against the current minute so repeated queries share cache entries
+    cutoff = (int(now) // 60) * 60 - float(match.group(1)) * AGE_UNITS[match.group(2).lower()]
+    # modified<7d: changed less than 7 days ago, i.e. mtime after the cutoff
+    operator = {'<': '$gt', '<=': '$gte', ':': '$gte', '=': '$gte', '>': '$lt', '>=': '$lte'}[op]
+    return {'file_mtime': {operator: cutoff}}
+
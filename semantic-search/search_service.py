@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+语义文件搜索服务
+常驻进程，保持 ChromaDB 集合和各级缓存处于加载状态，通过本地 HTTP 或 Unix socket 提供 JSON API
+
+用法:
+    python search_service.py                       # http://127.0.0.1:8765
+    python search_service.py --port 9000 --workers 16
+    python search_service.py --socket /tmp/semantic-search.sock
+
+接口:
+    GET  /health
+    GET  /stats
+    GET  /metrics  Prometheus 文本格式的计数器和延迟直方图（扫描、嵌入、存储写入、搜索、缓存）
+    GET  /search?q=<查询>&top_k=10&mode=hybrid&shards=<分片1>,<分片2>
+    POST /search   {"query": "..."} 或 {"queries": [...], "top_k": 10, "filters": {...}, "mode": "hybrid",
+                    "shards": [...]}
+    GET  /suggest?q=<前缀>&limit=10&shards=<分片>
+    POST /index    {"directory": "...", "incremental": true, "resume": false}   (后台运行，返回 202；每个目录一个分片)
+    GET  /index    当前/最近一次索引任务的状态
+
+查询中可以直接包含过滤条件，如 q=stone ext:tga dir:Characters size>1MB，与 filters 按 AND 组合
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import argparse
+import selectors
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import List, Dict, Optional
+
+try:
+    from config import Config
+    from embedding_providers import EmbeddingProvider, create_embedding_provider
+    from file_indexer import FileIndexer
+    from semantic_search import EmbeddingMismatchError
+    from sharded_search import ShardedSearchEngine, UnknownShardError
+    from query_filters import FilterSyntaxError
+    from index_pipeline import IndexPipeline
+    import metrics
+except ImportError as e:
+    print(f"导入模块失败: {e}")
+    print("请确保已安装所有依赖包：pip install -r requirements.txt")
+    sys.exit(1)
+
+
+class ServiceError(Exception):
+    """Request error reported to the client with an HTTP status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SearchService:
+    """
+    Request handlers around one warm ShardedSearchEngine
+    The engine, its caches and the loaded HNSW indexes are shared by all worker
+    threads; indexing runs as a single background job at a time.
+    """
+
+    def __init__(self, provider: EmbeddingProvider):
+        self.config = Config()
+        self.provider = provider
+        self.indexer = FileIndexer(provider)
+        self.engine = ShardedSearchEngine(provider)
+        self.started = time.time()
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        self._job_lock = threading.Lock()
+        self._job: Optional[Dict] = None
+        self._job_pipeline: Optional[IndexPipeline] = None
+
+    def warm_up(self):
+        """Run one vector query per shard so Chroma loads the HNSW indexes before the first request"""
+        for shard in self.engine.select():
+            collection = shard.collection
+            if not collection or not collection.count() or shard.signature_mismatch:
+                continue
+            start = time.perf_counter()
+            # Probe with a stored vector so the dimensions always match the collection
+            probe = collection.get(limit=1, include=['embeddings'])['embeddings'][0]
+            collection.query(query_embeddings=[probe], n_results=1, include=[])
+            print(f"向量索引已加载: {shard.collection_name} ({(time.perf_counter() - start) * 1000:.0f} 毫秒)")
+
+    def count_request(self):
+        with self._requests_lock:
+            self.requests += 1
+
+    # --- handlers ---
+
+    def search(self, body: Dict) -> Dict:
+        queries = body.get('queries')
+        single = queries is None
+        if single:
+            queries = [body.get('query', '')]
+        if not isinstance(queries, list) or not all(isinstance(q, str) and q.strip() for q in queries):
+            raise ServiceError(400, "query/queries 必须是非空字符串")
+
+        top_k = body.get('top_k')
+        if top_k is not None and (not isinstance(top_k, int) or top_k <= 0):
+            raise ServiceError(400, "top_k 必须是正整数")
+        mode = body.get('mode')
+        if mode is not None and mode not in ('hybrid', 'vector', 'lexical'):
+            raise ServiceError(400, "mode 可选: hybrid, vector, lexical")
+        filters = body.get('filters')
+        if filters is not None and not isinstance(filters, dict):
+            raise ServiceError(400, "filters 必须是 JSON 对象（Chroma where 子句）")
+        shards = self._shards(body.get('shards'))
+
+        start = time.perf_counter()
+        try:
+            results = self.engine.search_many(queries, top_k=top_k, filters=filters, mode=mode,
+                                              raise_errors=True, shards=shards)
+        except EmbeddingMismatchError as e:
+            raise ServiceError(409, str(e))
+        except FilterSyntaxError as e:
+            raise ServiceError(400, f"过滤条件错误: {e}")
+        except UnknownShardError as e:
+            raise ServiceError(404, str(e))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if single:
+            return {'query': queries[0], 'results': results[0], 'elapsed_ms': elapsed_ms}
+        return {'results': [{'query': q, 'results': r} for q, r in zip(queries, results)], 'elapsed_ms': elapsed_ms}
+
+    def suggest(self, params: Dict) -> Dict:
+        prefix = params.get('q', '')
+        try:
+            limit = int(params.get('limit', 10))
+        except ValueError:
+            raise ServiceError(400, "limit 必须是整数")
+        try:
+            suggestions = self.engine.suggest(prefix, limit, shards=self._shards(params.get('shards')))
+        except UnknownShardError as e:
+            raise ServiceError(404, str(e))
+        return {'query': prefix, 'suggestions': suggestions}
+
+    @staticmethod
+    def _shards(value) -> Optional[List[str]]:
+        """Shard selection from a JSON list or a comma-separated query parameter"""
+        if value is None or value == '':
+            return None
+        if isinstance(value, str):
+            value = [item.strip() for item in value.split(',') if item.strip()]
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ServiceError(400, "shards 必须是分片名或目录的列表")
+        return value
+
+    def start_index(self, body: Dict) -> Dict:
+        directory = body.get('directory')
+        if isinstance(directory, str):
+            directory = os.path.abspath(os.path.expanduser(directory))
+        if not isinstance(directory, str) or not os.path.isdir(directory):
+            raise ServiceError(400, f"目录不存在: {directory}")
+
+        with self._job_lock:
+            if self._job and self._job['state'] == 'running':
+                raise ServiceError(409, f"已有索引任务在运行: {self._job['directory']}")
+
+            shard = self.engine.shard_for_root(directory)
+            incremental = bool(body.get('incremental', self.config.INCREMENTAL_INDEXING))
+            incremental = incremental and shard.can_index_incrementally()
+            self._job_pipeline = IndexPipeline(
+                self.indexer,
+                shard,
+                chunk_size=self.config.PIPELINE_CHUNK_SIZE,
+                queue_size=self.config.PIPELINE_QUEUE_SIZE,
+                journal=self.config.INDEX_JOURNAL_ENABLED,
+                checkpoint_interval=self.config.INDEX_CHECKPOINT_SECONDS
+            )
+            self._job = {
+                'id': int(time.time() * 1000),
+                'directory': directory,
+                'shard': shard.collection_name,
+                'incremental': incremental,
+                'resume': bool(body.get('resume', False)),
+                'state': 'running',
+                'started': time.time(),
+                'finished': None,
+                'report': None,
+                'error': None
+            }
+            job, pipeline = self._job, self._job_pipeline
+
+        threading.Thread(target=self._run_index_job, args=(job, pipeline), daemon=True, name='index-job').start()
+        return self.index_status()
+
+    def _run_index_job(self, job: Dict, pipeline: IndexPipeline):
+        try:
+            job['report'] = pipeline.run(job['directory'], incremental=job['incremental'], resume=job['resume'])
+            job['state'] = 'done'
+        except Exception as e:
+            job['error'] = str(e)
+            job['state'] = 'failed'
+        finally:
+            job['finished'] = time.time()
+
+    def index_status(self) -> Dict:
+        with self._job_lock:
+            if not self._job:
+                return {'job': None}
+            job = dict(self._job)
+            pipeline = self._job_pipeline
+        if pipeline is not None and job['state'] == 'running':
+            job['progress'] = {
+                'discovered': pipeline.discovered,
+                'written': pipeline.written,
+                'unchanged': pipeline.unchanged,
+                'failed': len(pipeline.failures)
+            }
+        return {'job': job}
+
+    def stats(self) -> Dict:
+        stats = {
+            'collection': self.engine.get_collection_stats(),
+            'embedding_provider': self.provider.describe(),
+            'signature_mismatch': self.engine.signature_mismatches() or None,
+            'uptime_seconds': time.time() - self.started,
+            'requests': self.requests
+        }
+        if self.engine.query_cache:
+            stats['query_cache'] = self.engine.query_cache.stats()
+        if self.indexer.embedding_cache:
+            stats['embedding_cache'] = self.indexer.embedding_cache.stats()
+        stats['metrics'] = metrics.REGISTRY.snapshot()
+        return stats
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    One handler per connection, driven one request at a time by _WorkerPoolMixin
+    Keep-alive lets editor plugins reuse one connection; between requests the
+    connection waits in the server's selector instead of holding a worker.
+    """
+    protocol_version = 'HTTP/1.1'
+    # Limit for reading a request once it has started arriving
+    timeout = 15
+
+    def __init__(self, request, client_address, server):
+        # Unlike BaseRequestHandler, only set up here; see handle_next()
+        self.request = request
+        self.client_address = client_address
+        self.server = server
+        self.setup()
+
+    def handle_next(self) -> bool:
+        """Handle one request; True when the connection stays open for another"""
+        self.close_connection = True
+        self.handle_one_request()
+        return not self.close_connection
+
+    def has_buffered_request(self) -> bool:
+        """Whether the next request has already arrived (pipelining), checked without blocking"""
+        try:
+            self.connection.setblocking(False)
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def setup(self):
+        super().setup()
+        if isinstance(self.client_address, tuple):
+            # Headers and body are separate writes; without this, delayed ACKs add ~40 ms per reply
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, True)
+
+    def _send_json(self, status: int, payload: Dict):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                   'application/json; charset=utf-8')
+
+    def _send(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            raise ServiceError(400, "请求体不是有效的 JSON")
+        if not isinstance(body, dict):
+            raise ServiceError(400, "请求体必须是 JSON 对象")
+        return body
+
+    def _dispatch(self, method: str):
+        service: SearchService = self.server.service  # type: ignore
+        service.count_request()
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if method == 'GET' and url.path == '/metrics':
+            self._send(200, metrics.REGISTRY.prometheus_text().encode('utf-8'),
+                       'text/plain; version=0.0.4; charset=utf-8')
+            return
+
+        try:
+            if method == 'GET' and url.path == '/health':
+                status, payload = 200, {'status': 'ok'}
+            elif method == 'GET' and url.path == '/stats':
+                status, payload = 200, service.stats()
+            elif url.path == '/search':
+                body = self._read_json() if method == 'POST' else {
+                    'query': params.get('q', ''),
+                    'top_k': int(params['top_k']) if params.get('top_k', '').isdigit() else None,
+                    'mode': params.get('mode'),
+                    'shards': params.get('shards')
+                }
+                status, payload = 200, service.search(body)
+            elif method == 'GET' and url.path == '/suggest':
+                status, payload = 200, service.suggest(params)
+            elif method == 'POST' and url.path == '/index':
+                status, payload = 202, service.start_index(self._read_json())
+            elif method == 'GET' and url.path == '/index':
+                status, payload = 200, service.index_status()
+            else:
+                status, payload = 404, {'error': f"未知接口: {method} {url.path}"}
+        except ServiceError as e:
+            status, payload = e.status, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': f"服务内部错误: {e}"}
+
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def address_string(self) -> str:
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        # One line per request is too noisy for a local service
+        pass
+
+
+class _WorkerPoolMixin:
+    """
+    Serve requests on a fixed-size thread pool; a worker is only busy while a request is handled
+    Idle keep-alive connections are parked in a selector watched by one thread, which hands a
+    connection back to the pool when its next request arrives and closes it after `idle_timeout`
+    seconds without one, so idle clients can't occupy the workers.
+    """
+
+    def init_pool(self, service: SearchService, workers: int, idle_timeout: float = 15.0):
+        self.service = service
+        self.idle_timeout = idle_timeout
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='service')
+        self._parked: queue.Queue = queue.Queue()
+        self._closing = False
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._idle_thread = threading.Thread(target=self._watch_idle, daemon=True, name='service-idle')
+        self._idle_thread.start()
+
+    def process_request(self, request, client_address):
+        # New connections wait in the selector too, until their first request arrives
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        self._park(handler)
+
+    def _park(self, handler: _RequestHandler):
+        self._parked.put(handler)
+        self._wakeup_send.send(b'\0')
+
+    def _serve(self, handler: _RequestHandler):
+        try:
+            keep_open = handler.handle_next()
+            while keep_open and handler.has_buffered_request():
+                keep_open = handler.handle_next()
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+            keep_open = False
+        if keep_open and not self._closing:
+            self._park(handler)
+        else:
+            self._close(handler)
+
+    def _close(self, handler: _RequestHandler):
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        self.shutdown_request(handler.request)
+
+    def _watch_idle(self):
+        """Only this thread touches the selector; workers hand connections over via _parked"""
+        selector = selectors.DefaultSelector()
+        selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        deadlines: Dict[_RequestHandler, float] = {}
+        while not self._closing:
+            timeout = max(0.0, min(deadlines.values()) - time.monotonic()) if deadlines else None
+            for key, _ in selector.select(timeout):
+                if key.data is None:
+                    self._wakeup_recv.recv(4096)
+                    continue
+                handler = key.data
+                selector.unregister(handler.connection)
+                del deadlines[handler]
+                try:
+                    self.pool.submit(self._serve, handler)
+                except RuntimeError:
+                    # Pool shut down
+                    self._close(handler)
+
+            while True:
+                try:
+                    handler = self._parked.get_nowait()
+                except queue.Empty:
+                    break
+                selector.register(handler.connection, selectors.EVENT_READ, handler)
+                deadlines[handler] = time.monotonic() + self.idle_timeout
+
+            now = time.monotonic()
+            for handler in [handler for handler, deadline in deadlines.items() if deadline <= now]:
+                selector.unregister(handler.connection)
+                del deadlines[handler]
+                self._close(handler)
+
+        for handler in deadlines:
+            self._close(handler)
+        selector.close()
+
+    def server_close(self):
+        super().server_close()
+        self._closing = True
+        self._wakeup_send.send(b'\0')
+        self.pool.shutdown(wait=False)
+
+
+class PooledHTTPServer(_WorkerPoolMixin, HTTPServer):
+    pass
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class PooledUnixHTTPServer(_WorkerPoolMixin, socketserver.UnixStreamServer):
+        pass
+else:
+    PooledUnixHTTPServer = None
+
+
+def create_server(service: SearchService, host: str, port: int, socket_path: Optional[str], workers: int,
+                  idle_timeout: float = 15.0):
+    if socket_path:
+        if PooledUnixHTTPServer is None:
+            raise RuntimeError("当前平台不支持 Unix socket，请改用 --port")
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = PooledUnixHTTPServer(socket_path, _RequestHandler)
+    else:
+        server = PooledHTTPServer((host, port), _RequestHandler)
+    server.init_pool(service, workers, idle_timeout)
+    return server
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="语义文件搜索服务")
+    parser.add_argument('--host', default=config.SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVICE_PORT)
+    parser.add_argument('--socket', default=config.SERVICE_SOCKET, help="监听 Unix socket 而不是 TCP 端口")
+    parser.add_argument('--workers', type=int, default=config.SERVICE_WORKERS, help="处理请求的线程数")
+    args = parser.parse_args()
+
+    try:
+        config.validate_config()
+        service = SearchService(create_embedding_provider(config))
+        service.warm_up()
+        server = create_server(service, args.host, args.port, args.socket, args.workers,
+                               config.SERVICE_IDLE_TIMEOUT)
+    except Exception as e:
+        print(f"✗ 服务启动失败: {e}")
+        sys.exit(1)
+
+    address = args.socket if args.socket else f"http://{args.host}:{args.port}"
+    print(f"✓ 搜索服务已启动: {address} ({args.workers} 个工作线程)，按 Ctrl+C 停止")
+    writer = None
+    if config.METRICS_PROMETHEUS_FILE:
+        writer = metrics.MetricsFileWriter(config.METRICS_PROMETHEUS_FILE, config.METRICS_WRITE_INTERVAL).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        if writer is not None:
+            writer.stop()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
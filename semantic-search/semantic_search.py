@@ -1,170 +1,710 @@
 import os
+import json
 import subprocess
 import platform
 import sys
-from typing import List, Dict, Tuple, Optional
-
-try:
-    import chromadb
-    from chromadb.config import Settings
-except ImportError:
-    print("错误: chromadb 模块未安装")
-    print("请运行: pip install chromadb")
-    sys.exit(1)
-
-try:
-    import openai
-except ImportError:
-    print("错误: openai 模块未安装")
-    print("请运行: pip install openai")
-    sys.exit(1)
+import threading
+from typing import List, Dict, Tuple, Optional, Callable
 
 try:
     from config import Config
+    from index_manifest import IndexManifest
+    from embedding_cache import EmbeddingCache
+    from query_cache import QueryCache
+    from embedding_providers import EmbeddingProvider
+    from lexical_index import LexicalIndex, reciprocal_rank_fusion
+    from typeahead_index import TypeaheadIndex
+    from query_filters import parse_query, combine_where, FilterSyntaxError
+    from chroma_writer import ChunkedWriter, ChunkWriteError, WriteStats, client_max_batch_size
+    from vector_store import VectorStore, HNSW_PARAMS, open_vector_store
+    from metrics import QUERY_EMBED_SECONDS, QUERY_VECTOR_SECONDS
 except ImportError:
     print("错误: 无法导入 config 模块")
     sys.exit(1)
 
+class EmbeddingMismatchError(RuntimeError):
+    """The collection was built by a different embedding provider/model than the current one"""
+
+
+def create_query_cache(config: Config, provider: EmbeddingProvider) -> Optional[QueryCache]:
+    """Query cache configured from Config, or None when disabled"""
+    if not config.QUERY_CACHE_ENABLED:
+        return None
+    persistent = None
+    if config.EMBEDDING_CACHE_ENABLED:
+        # Query and file texts share one cache: identical text, identical vector
+        persistent = EmbeddingCache(
+            config.EMBEDDING_CACHE_PATH,
+            model=provider.cache_model,
+            dimensions=provider.requested_dimensions,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.EMBEDDING_CACHE_TTL_DAYS * 86400 if config.EMBEDDING_CACHE_TTL_DAYS else None
+        )
+    return QueryCache(
+        persistent,
+        embedding_cache_size=config.QUERY_EMBEDDING_CACHE_SIZE,
+        result_cache_size=config.QUERY_RESULT_CACHE_SIZE
+    )
+
+
 class SemanticSearchEngine:
-    def __init__(self, openai_client):
-        self.client = openai_client
+    """
+    Vector search over the files of one collection (one shard)
+    The collection lives in the vector store selected by Config.VECTOR_STORE
+    (Chroma, or the memory-mapped NumPy store). Nothing heavy happens in the
+    constructor: the store is opened (importing chromadb for Chroma) on first
+    use of `collection`, and the manifest and side indexes are loaded on first
+    use, so lexical fast-path queries and suggest() never wait for it.
+    """
+    
+    def __init__(self, provider: EmbeddingProvider, collection_name: Optional[str] = None,
+                 root: Optional[str] = None, query_cache: Optional[QueryCache] = None):
+        """
+        collection_name: defaults to Config.COLLECTION_NAME
+        root:            directory this collection indexes (selects HNSW_COLLECTION_PARAMS overrides)
+        query_cache:     share one cache between shards; built from Config when omitted
+        """
+        self.provider = provider
         self.config = Config()
-        self.chroma_client = None
-        self.collection = None
-        self._initialize_chroma()
+        self.collection_name = collection_name or self.config.COLLECTION_NAME
+        self.root = root
+        self._vector_store: Optional[VectorStore] = None
+        self._collection = None
+        self._writer: Optional[ChunkedWriter] = None
+        # Set when the collection was built by a different embedder than the current one
+        self._signature_mismatch: Optional[str] = None
+        self._manifest: Optional[IndexManifest] = None
+        # Separate locks, so e.g. suggest() doesn't wait for the vector store to open in the background
+        self._store_lock = threading.RLock()
+        self._manifest_lock = threading.Lock()
+        self._side_indexes_lock = threading.RLock()
+        self._side_indexes_loaded = False
+        self.query_cache: Optional[QueryCache] = (query_cache if query_cache is not None
+                                                  else create_query_cache(self.config, provider))
+        self._lexical_index: Optional[LexicalIndex] = None
+        if self.config.LEXICAL_INDEX_ENABLED:
+            self._lexical_index = LexicalIndex(self._state_path('lexical.json'))
+        self._typeahead_index: Optional[TypeaheadIndex] = None
+        if self.config.TYPEAHEAD_ENABLED:
+            self._typeahead_index = TypeaheadIndex(self._state_path('typeahead.json'),
+                                                   max_edit_distance=self.config.TYPEAHEAD_MAX_EDIT_DISTANCE)
+        self._index_version = 0
+        self._index_version_mtime = None
+    
+    # --- lazily opened state ---
     
-    def _initialize_chroma(self):
-        """Initialize ChromaDB client and collection"""
+    @property
+    def vector_store(self) -> VectorStore:
+        self._ensure_store()
+        return self._vector_store
+    
+    @property
+    def collection(self):
+        self._ensure_store()
+        return self._collection
+    
+    @property
+    def signature_mismatch(self) -> Optional[str]:
+        self._ensure_store()
+        return self._signature_mismatch
+    
+    @property
+    def manifest(self) -> IndexManifest:
+        if self._manifest is None:
+            with self._manifest_lock:
+                if self._manifest is None:
+                    self._manifest = IndexManifest(self._manifest_path())
+        return self._manifest
+    
+    @property
+    def lexical_index(self) -> Optional[LexicalIndex]:
+        self._ensure_side_indexes()
+        return self._lexical_index
+    
+    @property
+    def typeahead_index(self) -> Optional[TypeaheadIndex]:
+        self._ensure_side_indexes()
+        return self._typeahead_index
+    
+    def _ensure_store(self, verbose: bool = True):
+        if self._vector_store is None:
+            with self._store_lock:
+                if self._vector_store is None:
+                    self._initialize_store(verbose)
+    
+    def _ensure_side_indexes(self):
+        if not self._side_indexes_loaded:
+            with self._side_indexes_lock:
+                if not self._side_indexes_loaded:
+                    self._load_side_indexes()
+                    self._side_indexes_loaded = True
+    
+    def open_in_background(self):
+        """Start opening the vector store and loading the local indexes so the first query doesn't wait"""
+        def warm():
+            try:
+                self._ensure_side_indexes()
+                self._ensure_store(verbose=False)
+            except Exception:
+                # The foreground access reports the error
+                pass
+        threading.Thread(target=warm, daemon=True, name='engine-open').start()
+    
+    def _state_path(self, suffix: str) -> str:
+        """Side files (manifest, lexical index, ...) live next to the collection they describe"""
+        return os.path.join(self.config.CHROMA_DB_PATH, f"{self.collection_name}.{suffix}")
+    
+    def _manifest_path(self) -> str:
+        return self._state_path('manifest.json')
+    
+    def _version_path(self) -> str:
+        return self._state_path('version')
+    
+    def journal_path(self) -> str:
+        """Journal of an unfinished index run (see IndexJournal)"""
+        return self._state_path('journal')
+    
+    def index_version(self) -> int:
+        """
+        Version counter bumped on every collection write
+        Kept in a file so writes from other processes also invalidate cached results
+        """
         try:
-            # Create ChromaDB client with persistent storage
-            self.chroma_client = chromadb.PersistentClient(
-                path=self.config.CHROMA_DB_PATH,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
+            mtime = os.stat(self._version_path()).st_mtime_ns
+        except OSError:
+            return self._index_version
+        
+        if mtime != self._index_version_mtime:
+            try:
+                with open(self._version_path(), 'r', encoding='utf-8') as f:
+                    self._index_version = int(f.read().strip() or 0)
+                self._index_version_mtime = mtime
+            except (OSError, ValueError):
+                pass
+        return self._index_version
+    
+    def _bump_index_version(self):
+        version = self.index_version() + 1
+        os.makedirs(self.config.CHROMA_DB_PATH, exist_ok=True)
+        with open(self._version_path(), 'w', encoding='utf-8') as f:
+            f.write(str(version))
+        self._index_version = version
+        self._index_version_mtime = None
+        if self.query_cache:
+            self.query_cache.results.clear()
+    
+    def _initialize_store(self, verbose: bool = True):
+        """Open the vector store and the collection"""
+        try:
+            store = open_vector_store(self.config)
             
             # Get or create collection
-            self.collection = self.chroma_client.get_or_create_collection(
-                name=self.config.COLLECTION_NAME,
-                metadata={"hnsw:space": "cosine"}  # Use cosine similarity
+            self._collection = store.get_or_create_collection(
+                name=self.collection_name,
+                metadata=self._collection_metadata()
             )
+            self._vector_store = store
+            self._check_embedding_signature()
+            
+            params = self.hnsw_params()
+            store.configure_search(self._collection, params['search_ef'])
             
-            print(f"ChromaDB 已初始化，集合中有 {self.collection.count()} 个文档")
+            if verbose:
+                print(f"向量数据库 ({store.name}) 已初始化，集合 {self.collection_name} 中有 "
+                      f"{self._collection.count()} 个文档")
+                if self._signature_mismatch:
+                    print(f"警告: {self._signature_mismatch}")
+                built = store.index_params(self._collection)
+                if built and any(built[name] != params[name] for name in ('M', 'construction_ef')):
+                    print(f"提示: 集合的 HNSW 参数 (M={built['M']}, construction_ef={built['construction_ef']}) "
+                          f"与配置不同，使用 --full 重新索引后生效")
             
         except Exception as e:
-            print(f"初始化 ChromaDB 失败: {e}")
+            self._vector_store = None
+            self._collection = None
+            print(f"初始化向量数据库失败: {e}")
             raise
     
-    def index_files(self, embeddings_data: List[Tuple[str, List[float], Dict]]):
+    def _side_indexes(self) -> List:
+        """In-memory indexes derived from collection metadata (lexical, typeahead)"""
+        return [index for index in (self._lexical_index, self._typeahead_index) if index is not None]
+    
+    def _load_side_indexes(self):
         """
-        Index files into ChromaDB
-        embeddings_data: List of (id, embedding, metadata) tuples
+        Load the persisted side indexes, rebuilding stale ones from the collection
+        They are saved together with the manifest, so the manifest size is the
+        consistency check and the vector store is only opened when a rebuild is needed
         """
-        if not self.chroma_client:
-            raise RuntimeError("ChromaDB 客户端未初始化")
-            
-        if not embeddings_data:
-            print("没有文件需要索引")
+        expected = len(self.manifest)
+        stale = [index for index in self._side_indexes() if not index.load() or len(index) != expected]
+        if not stale:
             return
         
-        print(f"正在索引 {len(embeddings_data)} 个文件到向量数据库...")
+        for index in stale:
+            index.clear()
+        count = self.collection.count()
+        if count:
+            print(f"正在从向量数据库重建本地索引 ({count} 个文档)...")
+            page_size = 5000
+            for offset in range(0, count, page_size):
+                page = self.collection.get(include=['metadatas'], limit=page_size, offset=offset)  # type: ignore
+                for file_id, metadata in zip(page['ids'], page['metadatas'] or []):
+                    for index in stale:
+                        index.add(file_id, metadata)
+        for index in stale:
+            index.save()
+    
+    def _record_documents(self, documents: List[Tuple[str, Dict]], deleted_ids: Optional[List[str]] = None):
+        """Mirror a collection write into the manifest and side indexes"""
+        deleted_ids = deleted_ids or []
+        # Never apply changes to (and later save) indexes that were not loaded yet
+        self._ensure_side_indexes()
+        for file_id, metadata in documents:
+            self.manifest.record(file_id, metadata)
+        self.manifest.remove(deleted_ids)
+        for index in self._side_indexes():
+            for file_id, metadata in documents:
+                index.add(file_id, metadata)
+            index.remove(deleted_ids)
+    
+    def save_state(self):
+        """Persist the manifest, side indexes and buffered store writes (whatever was never loaded is unchanged)"""
+        if self._collection is not None:
+            self._vector_store.flush(self._collection)
+        if self._manifest is not None:
+            self._manifest.save()
+        if self._side_indexes_loaded:
+            for index in self._side_indexes():
+                index.save()
+    
+    def hnsw_params(self) -> Dict:
+        """HNSW parameters of this collection: the Config defaults with any per-shard override"""
+        params = {'M': self.config.HNSW_M, 'construction_ef': self.config.HNSW_CONSTRUCTION_EF,
+                  'search_ef': self.config.HNSW_SEARCH_EF}
+        root = os.path.normcase(os.path.abspath(self.root)) if self.root else None
+        for key, override in (self.config.HNSW_COLLECTION_PARAMS or {}).items():
+            if key != self.collection_name and (root is None or
+                                                os.path.normcase(os.path.abspath(os.path.expanduser(key))) != root):
+                continue
+            unknown = set(override) - set(HNSW_PARAMS)
+            if unknown:
+                raise ValueError(f"HNSW_COLLECTION_PARAMS[{key!r}] 中有未知参数: {', '.join(sorted(unknown))} "
+                                 f"(可选: {', '.join(HNSW_PARAMS)})")
+            params.update(override)
+        return params
+    
+    def _collection_metadata(self) -> Dict:
+        """Collection metadata: distance function, HNSW graph parameters and the embedder that builds it"""
+        metadata = {"hnsw:space": "cosine"}  # Use cosine similarity
+        metadata.update({f"hnsw:{name}": value for name, value in self.hnsw_params().items() if value})
+        metadata.update(self.provider.signature())
+        return metadata
+    
+    def _check_embedding_signature(self):
+        """Refuse to mix vectors from different providers, models or dimensions"""
+        self._signature_mismatch = None
+        stored = {key: value for key, value in (self.collection.metadata or {}).items()
+                  if key.startswith('embedding:')}
+        
+        if not stored:
+            if self.collection.count() == 0:
+                # Empty collection from an older version: recreate it with a signature
+                self.reset_collection()
+                return
+            # Collections from before providers existed were always built with OpenAI
+            if self.provider.name != 'openai':
+                self._signature_mismatch = (f"当前集合由 openai 构建，与当前嵌入提供方 "
+                                            f"{self.provider.describe()} 不一致，请重新索引")
+            return
+        
+        expected = self.provider.signature()
+        # Optional keys (the endpoint of a stand-in server) must match in both directions
+        if stored.keys() != expected.keys() or any(stored[key] != value for key, value in expected.items()):
+            built_with = (f"{stored.get('embedding:provider')} / {stored.get('embedding:model')} "
+                          f"({stored.get('embedding:dimensions')} 维)")
+            if stored.get('embedding:endpoint'):
+                built_with += f" @ {stored['embedding:endpoint']}"
+            self._signature_mismatch = (f"当前集合由 {built_with} 构建，与当前嵌入提供方 "
+                                        f"{self.provider.describe()} 不一致，请重新索引")
+    
+    def reset_collection(self):
+        """Drop and recreate the collection, forgetting its manifest"""
+        if not self.vector_store:
+            raise RuntimeError("向量数据库未初始化")
         
         # Clear existing collection
         try:
-            self.chroma_client.delete_collection(self.config.COLLECTION_NAME)
+            self.vector_store.delete_collection(self.collection_name)
         except Exception:
             # Collection might not exist, which is fine
             pass
         
-        self.collection = self.chroma_client.create_collection(
-            name=self.config.COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"}
+        self._collection = self.vector_store.create_collection(
+            name=self.collection_name,
+            metadata=self._collection_metadata()
         )
+        self._signature_mismatch = None
         
-        # Prepare data for ChromaDB
-        ids = []
-        embeddings = []
-        metadatas = []
-        documents = []
-        
-        for file_id, embedding, metadata in embeddings_data:
-            ids.append(file_id)
-            embeddings.append(embedding)
-            metadatas.append(metadata)
-            documents.append(metadata['searchable_text'])
+        self.manifest.clear()
+        for index in self._side_indexes():
+            index.clear()
+        self._side_indexes_loaded = True
+        self.save_state()
+        self._bump_index_version()
+    
+    def has_indexed_files(self) -> bool:
+        """Cheap emptiness check: the manifest answers without opening the vector store"""
+        return len(self.manifest) > 0 or self.collection.count() > 0
+    
+    def can_index_incrementally(self) -> bool:
+        """
+        Incremental updates are only safe when the manifest matches the collection,
+        e.g. not after chroma_db was deleted or the manifest was lost
+        """
+        if not self.collection or not len(self.manifest) or self.signature_mismatch:
+            return False
         
-        # Add to collection
         try:
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                documents=documents
+            return self.collection.count() == len(self.manifest)
+        except Exception:
+            return False
+    
+    def _chunked_writer(self) -> ChunkedWriter:
+        if self._writer is None:
+            self._writer = ChunkedWriter(
+                client_max_batch_size(self.vector_store, self.config.CHROMA_WRITE_BATCH_SIZE),
+                max_retries=self.config.CHROMA_WRITE_MAX_RETRIES,
+                retry_base_delay=self.config.CHROMA_WRITE_RETRY_DELAY
             )
-            print(f"成功索引 {len(embeddings_data)} 个文件")
-        except Exception as e:
-            print(f"索引文件时出错: {e}")
-            raise
+        return self._writer
+    
+    def _upsert_chunk(self, chunk: List[Tuple[str, List[float], Dict]]):
+        self.collection.upsert(
+            ids=[file_id for file_id, _, _ in chunk],
+            embeddings=[embedding for _, embedding, _ in chunk],
+            metadatas=[metadata for _, _, metadata in chunk],
+            documents=[metadata['searchable_text'] for _, _, metadata in chunk]
+        )
+    
+    def _update_chunk(self, chunk: List[Tuple[str, Dict]]):
+        self.collection.update(
+            ids=[file_id for file_id, _ in chunk],
+            metadatas=[metadata for _, metadata in chunk]
+        )
     
-    def search(self, query: str, top_k: Optional[int] = None) -> List[Dict]:
+    def apply_incremental_update(self, embeddings_data: List[Tuple[str, List[float], Dict]],
+                                 metadata_updates: List[Tuple[str, Dict]],
+                                 deleted_ids: List[str], save_state: bool = True,
+                                 stats: Optional[WriteStats] = None):
         """
-        Search for files similar to the query
-        Returns list of search results with metadata and scores
+        Apply an incremental change set to the existing collection
+        embeddings_data:  (id, embedding, metadata) tuples for new or re-embedded files
+        metadata_updates: (id, metadata) tuples for files whose text did not change
+        deleted_ids:      ids of files that no longer exist
+        save_state:       streaming callers save manifest/side indexes once at the end instead
+        stats:            accumulates rows/chunks/retries/time of the writes
+        Writes go out in chunks sized to the client's max batch size; each chunk
+        is mirrored into the manifest once it landed. Chunks that fail after all
+        retries raise ChunkWriteError at the end, after the rest was written.
         """
         if not self.collection:
-            print("错误: 还没有索引任何文件")
-            return []
-            
-        if top_k is None:
-            top_k = self.config.TOP_K_RESULTS
+            raise RuntimeError("向量数据库未初始化")
+        if self.signature_mismatch and embeddings_data:
+            raise RuntimeError(self.signature_mismatch)
+        
+        writer = self._chunked_writer()
+        failed = writer.write(
+            embeddings_data, self._upsert_chunk,
+            on_written=lambda chunk: self._record_documents([(file_id, metadata) for file_id, _, metadata in chunk]),
+            stats=stats, operation='upsert'
+        )
+        failed += writer.write(metadata_updates, self._update_chunk,
+                               on_written=self._record_documents, stats=stats, operation='update')
+        failed += writer.write(deleted_ids, lambda chunk: self.collection.delete(ids=chunk),
+                               on_written=lambda chunk: self._record_documents([], chunk), stats=stats,
+                               operation='delete')
         
+        if save_state:
+            self.save_state()
+        self._bump_index_version()
+        if failed:
+            print(f"增量更新索引时出错: {failed[0][1]}")
+            raise ChunkWriteError(failed)
+    
+    def search(self, query: str, top_k: Optional[int] = None, filters: Optional[Dict] = None,
+               mode: Optional[str] = None) -> List[Dict]:
+        """
+        Search for files similar to the query
+        query:   free text plus optional filters, e.g. "stone ext:tga dir:Characters size>1MB"
+                 (see query_filters.parse_query); filters are evaluated inside the index
+        filters: optional Chroma `where` clause over file metadata, ANDed with the query's filters
+        mode:    'hybrid' (vector + BM25 fused), 'vector' or 'lexical'; defaults to Config.SEARCH_MODE
+        Returns list of search results with metadata and scores
+        """
         print(f"正在搜索: '{query}'")
         
         try:
-            # Generate embedding for the query
-            response = self.client.embeddings.create(
-                input=[query],
-                model=self.config.EMBEDDING_MODEL
-            )
-            query_embedding = response.data[0].embedding
-            
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                include=['metadatas', 'documents', 'distances']  # type: ignore
-            )
-            
-            # Format results
-            search_results = []
-            if results and 'metadatas' in results and results['metadatas'] and results['metadatas'][0]:
-                metadatas = results['metadatas'][0]  # type: ignore
-                distances = results['distances'][0] if 'distances' in results and results['distances'] else []  # type: ignore
-                
-                for i, metadata in enumerate(metadatas):
-                    similarity_score = 1 - distances[i] if distances and i < len(distances) else 0.5
-                    result = {
-                        'file_path': metadata['file_path'],
-                        'file_name': metadata['file_name'],
-                        'file_stem': metadata['file_stem'],
-                        'file_extension': metadata['file_extension'],
-                        'file_parent': metadata['file_parent'],
-                        'searchable_text': metadata['searchable_text'],
-                        'similarity_score': similarity_score,
-                        'rank': i + 1
-                    }
-                    search_results.append(result)
-            
+            search_results = self._search_batch([query], top_k, filters, mode)[0]
             print(f"找到 {len(search_results)} 个相关结果")
             return search_results
             
+        except EmbeddingMismatchError as e:
+            print(f"错误: {e}")
+            return []
+        except FilterSyntaxError as e:
+            print(f"过滤条件错误: {e}")
+            return []
         except Exception as e:
             print(f"搜索时出错: {e}")
             return []
     
-    def open_file_location(self, file_path: str):
+    def search_many(self, queries: List[str], top_k: Optional[int] = None,
+                    filters: Optional[Dict] = None, mode: Optional[str] = None,
+                    raise_errors: bool = False) -> List[List[Dict]]:
+        """
+        Search several queries at once
+        All uncached queries are embedded in one API request and run through
+        a single batched collection.query
+        raise_errors: propagate failures instead of printing them and returning empty lists
+        Returns one ranked result list per query, in the same format as search()
+        """
+        if not queries:
+            return []
+        
+        try:
+            return self._search_batch(queries, top_k, filters, mode)
+        except Exception as e:
+            if raise_errors:
+                raise
+            if isinstance(e, EmbeddingMismatchError):
+                print(f"错误: {e}")
+            elif isinstance(e, FilterSyntaxError):
+                print(f"过滤条件错误: {e}")
+            else:
+                print(f"批量搜索时出错: {e}")
+            return [[] for _ in queries]
+    
+    def _search_batch(self, queries: List[str], top_k: Optional[int], filters: Optional[Dict],
+                      mode: Optional[str] = None,
+                      embed_queries: Optional[Callable[[List[str]], List[List[float]]]] = None) -> List[List[Dict]]:
+        """
+        Shared implementation of search() and search_many()
+        embed_queries: replaces _embed_queries, e.g. so shards searched together embed each query once
+        """
+        if top_k is None:
+            top_k = self.config.TOP_K_RESULTS
+        mode = (mode or self.config.SEARCH_MODE).lower()
+        if self.lexical_index is None:
+            mode = 'vector'
+        
+        # Split each query into free text and its filter tokens (ext:, dir:, type:, size, modified)
+        parsed: Dict[str, Tuple[str, Optional[Dict]]] = {}
+        for query in dict.fromkeys(queries):
+            text, where = parse_query(query)
+            parsed[query] = (text, combine_where(filters, where))
+        
+        results_by_query: Dict[str, List[Dict]] = {}
+        result_keys: Dict[str, tuple] = {}
+        
+        if self.query_cache:
+            version = self.index_version()
+            for query, (text, where) in parsed.items():
+                result_keys[query] = QueryCache.result_key(text, top_k, where, version, mode,
+                                                           scope=self.collection_name)
+                cached_results = self.query_cache.get_results(result_keys[query])
+                if cached_results is not None:
+                    results_by_query[query] = cached_results
+        
+        # One batched vector query per distinct where clause
+        needs_vector: Dict[str, List[str]] = {}
+        for query, (text, where) in parsed.items():
+            if query in results_by_query:
+                continue
+            
+            if not text:
+                # Filters only: list matching files straight from the index
+                results_by_query[query] = self._filter_results(where, top_k)
+            elif mode == 'lexical':
+                results_by_query[query] = self._lexical_results(text, top_k, where)
+            elif (mode == 'hybrid' and self.config.LEXICAL_FAST_PATH
+                  and self.lexical_index.is_exact_token_query(text)):
+                # Identifier-like query: answer from the inverted index, no API call
+                results = self._lexical_results(text, top_k, where, require_all=True)
+                if results:
+                    results_by_query[query] = results
+                else:
+                    needs_vector.setdefault(json.dumps(where, sort_keys=True), []).append(query)
+            else:
+                needs_vector.setdefault(json.dumps(where, sort_keys=True), []).append(query)
+        
+        # Fetch extra candidates when they will be fused with lexical hits
+        n_results = top_k if mode == 'vector' else max(top_k * 2, 20)
+        for group in needs_vector.values():
+            where = parsed[group[0]][1]
+            vector_hits = self._vector_query([parsed[query][0] for query in group], n_results, where,
+                                             embed_queries)
+            
+            for query, hits in zip(group, vector_hits):
+                if mode == 'hybrid':
+                    results_by_query[query] = self._fuse_results(parsed[query][0], hits, n_results, top_k, where)
+                else:
+                    vector_scores = {file_id: score for file_id, _, score in hits}
+                    results_by_query[query] = self._format_results(hits[:top_k], 'vector', vector_scores=vector_scores)
+        
+        if self.query_cache:
+            for query, results in results_by_query.items():
+                self.query_cache.put_results(result_keys[query], results)
+        
+        return [[dict(result) for result in results_by_query[query]] for query in queries]
+    
+    def _vector_query(self, queries: List[str], n_results: int, filters: Optional[Dict],
+                      embed_queries: Optional[Callable[[List[str]], List[List[float]]]] = None
+                      ) -> List[List[Tuple[str, Dict, float]]]:
+        """Batched nearest-neighbour query; returns (id, metadata, similarity) hits per query"""
+        if self.signature_mismatch:
+            raise EmbeddingMismatchError(self.signature_mismatch)
+        with QUERY_EMBED_SECONDS.time():
+            query_embeddings = (embed_queries or self._embed_queries)(queries)
+        
+        # Search in the vector store
+        query_args = {
+            'query_embeddings': query_embeddings,
+            'n_results': n_results,
+            'include': ['metadatas', 'documents', 'distances']
+        }
+        if filters:
+            query_args['where'] = filters
+        with QUERY_VECTOR_SECONDS.time():
+            results = self.collection.query(**query_args)  # type: ignore
+        
+        all_ids = results.get('ids') or []
+        all_metadatas = results.get('metadatas') or []
+        all_distances = results.get('distances') or []
+        hits_per_query = []
+        for i in range(len(queries)):
+            ids = all_ids[i] if i < len(all_ids) else []
+            metadatas = all_metadatas[i] if i < len(all_metadatas) else []
+            distances = all_distances[i] if i < len(all_distances) else []
+            hits = []
+            for j, metadata in enumerate(metadatas or []):
+                similarity_score = 1 - distances[j] if distances and j < len(distances) else 0.5
+                hits.append((ids[j], metadata, similarity_score))
+            hits_per_query.append(hits)
+        return hits_per_query
+    
+    def _filter_results(self, filters: Optional[Dict], top_k: int) -> List[Dict]:
+        """Files matching a filter-only query, fetched from the vector store with the where clause pushed down"""
+        if not filters:
+            return []
+        results = self.collection.get(where=filters, limit=top_k, include=['metadatas'])
+        hits = [(file_id, metadata, 1.0) for file_id, metadata in zip(results['ids'], results['metadatas'] or [])]
+        return self._format_results(hits, 'filter')
+    
+    def _lexical_hits(self, query: str, top_k: int, filters: Optional[Dict],
+                      require_all: bool = False) -> List[Tuple[str, Dict, float, float]]:
+        """BM25 hits as (id, metadata, score normalized to 0-1 against the best hit, raw BM25 score)"""
+        ranked = self.lexical_index.search(query, top_k, filters, require_all=require_all)
+        if not ranked:
+            return []
+        best = ranked[0][2] or 1.0
+        return [(file_id, metadata, score / best, score) for file_id, metadata, score in ranked]
+    
+    def _lexical_results(self, query: str, top_k: int, filters: Optional[Dict],
+                         require_all: bool = False) -> List[Dict]:
+        hits = self._lexical_hits(query, top_k, filters, require_all)
+        return self._format_results([(file_id, metadata, score) for file_id, metadata, score, _ in hits], 'lexical',
+                                    lexical_scores={file_id: raw for file_id, _, _, raw in hits})
+    
+    def _fuse_results(self, query: str, vector_hits: List[Tuple[str, Dict, float]], n_candidates: int,
+                      top_k: int, filters: Optional[Dict]) -> List[Dict]:
+        """Reciprocal rank fusion of vector and BM25 rankings"""
+        lexical_hits = self._lexical_hits(query, n_candidates, filters)
+        vector_by_id = {file_id: (metadata, score) for file_id, metadata, score in vector_hits}
+        lexical_by_id = {file_id: (metadata, score) for file_id, metadata, score, _ in lexical_hits}
+        
+        fused = reciprocal_rank_fusion(
+            [[file_id for file_id, _, _ in vector_hits], [file_id for file_id, _, _, _ in lexical_hits]],
+            k=self.config.RRF_K
+        )
+        
+        hits = []
+        for file_id, _ in fused[:top_k]:
+            if file_id in vector_by_id:
+                metadata, score = vector_by_id[file_id]
+                match_type = 'hybrid' if file_id in lexical_by_id else 'vector'
+            else:
+                metadata, score = lexical_by_id[file_id]
+                match_type = 'lexical'
+            hits.append((file_id, metadata, score, match_type))
+        
+        results = self._format_results([(file_id, metadata, score) for file_id, metadata, score, _ in hits],
+                                       vector_scores={file_id: score for file_id, _, score in vector_hits},
+                                       lexical_scores={file_id: raw for file_id, _, _, raw in lexical_hits})
+        for result, hit in zip(results, hits):
+            result['match_type'] = hit[3]
+        return results
+    
+    def _format_results(self, hits: List[Tuple[str, Dict, float]], match_type: str = 'vector',
+                        vector_scores: Optional[Dict[str, float]] = None,
+                        lexical_scores: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """
+        Convert (id, metadata, score) hits into search result dicts
+        vector_scores / lexical_scores: raw similarity and BM25 score per id; unlike
+        similarity_score (normalized per collection for lexical hits) these compare
+        across shards, see ShardedSearchEngine._merge
+        """
+        vector_scores = vector_scores or {}
+        lexical_scores = lexical_scores or {}
+        search_results = []
+        for i, (file_id, metadata, similarity_score) in enumerate(hits):
+            result = {
+                'file_path': metadata['file_path'],
+                'file_name': metadata['file_name'],
+                'file_stem': metadata['file_stem'],
+                'file_extension': metadata['file_extension'],
+                'file_parent': metadata['file_parent'],
+                'searchable_text': metadata['searchable_text'],
+                'similarity_score': similarity_score,
+                'rank': i + 1,
+                'match_type': match_type,
+                'vector_score': vector_scores.get(file_id),
+                'lexical_score': lexical_scores.get(file_id)
+            }
+            search_results.append(result)
+        return search_results
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed queries, served from the query caches when possible; misses share one API request"""
+        embeddings: Dict[str, List[float]] = {}
+        if self.query_cache:
+            for query in queries:
+                cached = self.query_cache.get_embedding(query)
+                if cached is not None:
+                    embeddings[query] = cached
+        
+        missing = [query for query in queries if query not in embeddings]
+        if missing:
+            # Generate embeddings for the queries
+            for query, embedding in zip(missing, self.provider.embed(missing)):
+                embeddings[query] = embedding
+                if self.query_cache:
+                    self.query_cache.put_embedding(query, embedding)
+        
+        return [embeddings[query] for query in queries]
+    
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """
+        Typeahead suggestions for a partially typed file name
+        Served from the in-memory prefix/trigram index: no API call, no vector query.
+        Returns dicts with file_stem, file_name, file_path and match
+        ('prefix', 'substring' or 'fuzzy').
+        """
+        if self.typeahead_index is None:
+            return []
+        return self.typeahead_index.suggest(prefix, limit)
+    
+    @staticmethod
+    def open_file_location(file_path: str):
         """
         Open Windows Explorer and select the specified file
         """
@@ -192,7 +732,8 @@ class SemanticSearchEngine:
         except Exception as e:
             print(f"意外错误: {e}")
     
-    def display_search_results(self, results: List[Dict]):
+    @staticmethod
+    def display_search_results(results: List[Dict]):
         """
         Display search results in a formatted way
         """
@@ -221,9 +762,16 @@ class SemanticSearchEngine:
         
         try:
             count = self.collection.count()
+            metadata = self.collection.metadata or {}
             return {
                 "count": count,
-                "collection_name": self.config.COLLECTION_NAME
+                "collection_name": self.collection_name,
+                "root": self.root,
+                "vector_store": self.vector_store.name,
+                "hnsw": self.vector_store.index_params(self.collection),
+                "embedding_provider": metadata.get('embedding:provider', 'openai'),
+                "embedding_model": metadata.get('embedding:model', ''),
+                "embedding_dimensions": metadata.get('embedding:dimensions', 0)
             }
         except Exception as e:
             print(f"获取统计信息失败: {e}")
@@ -0,0 +1,389 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional, Callable, Iterable
+
+try:
+    from config import Config
+    from embedding_providers import EmbeddingProvider
+    from index_manifest import IndexManifest
+    from query_filters import parse_query, FilterSyntaxError
+    from semantic_search import SemanticSearchEngine, EmbeddingMismatchError, create_query_cache
+    from lexical_index import reciprocal_rank_fusion
+    from metrics import SEARCH_SECONDS
+except ImportError:
+    print("错误: 无法导入 config 模块")
+    sys.exit(1)
+
+# Suggestion stages in the order TypeaheadIndex.suggest ranks them
+SUGGESTION_ORDER = {'prefix': 0, 'substring': 1, 'fuzzy': 2}
+
+
+class UnknownShardError(ValueError):
+    """A shard selector matched neither a shard name nor an indexed root"""
+
+
+class ShardRegistry:
+    """
+    Persisted map of shard (collection) name -> indexed root directory
+    Stored as shards.json next to the collections it describes
+    """
+
+    VERSION = 1
+
+    def __init__(self, registry_path: str):
+        self.registry_path = registry_path
+        self.shards: Dict[str, Dict] = {}
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.registry_path)
+
+    def load(self):
+        self.shards = {}
+        if not self.exists():
+            return
+        try:
+            with open(self.registry_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.shards = data.get('shards', {})
+        except (OSError, ValueError) as e:
+            print(f"读取分片列表失败: {e}")
+
+    def save(self):
+        """Atomically write the registry to disk"""
+        directory = os.path.dirname(self.registry_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.registry_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'shards': self.shards}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def add(self, name: str, root: Optional[str]):
+        self.shards[name] = {'root': root}
+
+    def remove(self, name: str):
+        self.shards.pop(name, None)
+
+    def find_by_root(self, root: str) -> Optional[str]:
+        key = os.path.normcase(os.path.abspath(root))
+        for name, entry in self.shards.items():
+            if entry.get('root') and os.path.normcase(entry['root']) == key:
+                return name
+        return None
+
+
+class ShardedSearchEngine:
+    """
+    Search over several indexed roots, each in its own collection (shard)
+    Shards are indexed, rebuilt and removed independently. Searches fan out to
+    all shards, or a chosen subset, in parallel and the per-shard top-k lists
+    are merged by score. Shards share one query cache, and a query is embedded
+    once however many shards it is sent to.
+    """
+
+    def __init__(self, provider: EmbeddingProvider):
+        self.provider = provider
+        self.config = Config()
+        self.query_cache = create_query_cache(self.config, provider)
+        self.registry = ShardRegistry(os.path.join(self.config.CHROMA_DB_PATH, 'shards.json'))
+        self._engines: Dict[str, SemanticSearchEngine] = {}
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if not self.registry.exists():
+            self._adopt_legacy_collection()
+
+    # --- shard management ---
+
+    def _adopt_legacy_collection(self):
+        """Register the single collection of earlier versions as a shard, keeping its vectors"""
+        name = self.config.COLLECTION_NAME
+        manifest = IndexManifest(os.path.join(self.config.CHROMA_DB_PATH, f"{name}.manifest.json"))
+        if not len(manifest):
+            return
+        parents = {os.path.dirname(entry['path']) for entry in manifest.entries.values()}
+        try:
+            root = os.path.commonpath(list(parents))
+        except ValueError:
+            # Files on different drives
+            root = None
+        self.registry.add(name, root)
+        self.registry.save()
+
+    def _shard_name(self, root: str) -> str:
+        """Readable, stable collection name for a root (Chroma allows [A-Za-z0-9._-])"""
+        slug = re.sub(r'[^A-Za-z0-9_-]+', '_', os.path.basename(root.rstrip('\\/'))).strip('_-')[:40]
+        digest = hashlib.md5(os.path.normcase(root).encode('utf-8')).hexdigest()[:8]
+        return f"{self.config.COLLECTION_NAME}-{slug or 'root'}-{digest}"
+
+    @property
+    def shard_names(self) -> List[str]:
+        return list(self.registry.shards)
+
+    def shard(self, name: str) -> SemanticSearchEngine:
+        """Engine for a registered shard (opened lazily, like any SemanticSearchEngine)"""
+        with self._lock:
+            if name not in self.registry.shards:
+                raise UnknownShardError(f"未知的分片: {name}")
+            engine = self._engines.get(name)
+            if engine is None:
+                engine = SemanticSearchEngine(self.provider, collection_name=name,
+                                              root=self.registry.shards[name].get('root'),
+                                              query_cache=self.query_cache)
+                self._engines[name] = engine
+            return engine
+
+    def shard_for_root(self, root: str) -> SemanticSearchEngine:
+        """Shard indexing exactly this directory, registered on first use"""
+        root = os.path.abspath(root)
+        with self._lock:
+            name = self.registry.find_by_root(root)
+            if name is None:
+                name = self._shard_name(root)
+                self.registry.add(name, root)
+                self.registry.save()
+            return self.shard(name)
+
+    def select(self, selectors: Optional[Iterable[str]] = None) -> List[SemanticSearchEngine]:
+        """Shards by name or root directory; all shards when no selectors are given"""
+        if not selectors:
+            return [self.shard(name) for name in self.shard_names]
+        engines = []
+        for selector in selectors:
+            name = selector if selector in self.registry.shards else self.registry.find_by_root(selector)
+            if name is None:
+                raise UnknownShardError(f"未知的分片: {selector} (可用: {', '.join(self.shard_names) or '无'})")
+            engine = self.shard(name)
+            if engine not in engines:
+                engines.append(engine)
+        return engines
+
+    def remove_shard(self, selector: str) -> str:
+        """Drop a shard's collection and side files; returns its name"""
+        engine = self.select([selector])[0]
+        name = engine.collection_name
+        try:
+            engine.vector_store.delete_collection(name)
+        except Exception:
+            # Never created, which is fine
+            pass
+        for suffix in ('manifest.json', 'lexical.json', 'typeahead.json', 'version', 'journal'):
+            try:
+                os.remove(engine._state_path(suffix))
+            except OSError:
+                pass
+        with self._lock:
+            self.registry.remove(name)
+            self.registry.save()
+            self._engines.pop(name, None)
+        return name
+
+    # --- search ---
+
+    def search(self, query: str, top_k: Optional[int] = None, filters: Optional[Dict] = None,
+               mode: Optional[str] = None, shards: Optional[List[str]] = None) -> List[Dict]:
+        """Search all shards (or the selected ones); same arguments and results as SemanticSearchEngine.search"""
+        print(f"正在搜索: '{query}'")
+
+        try:
+            search_results = self._search_batch([query], top_k, filters, mode, shards)[0]
+            print(f"找到 {len(search_results)} 个相关结果")
+            return search_results
+        except EmbeddingMismatchError as e:
+            print(f"错误: {e}")
+            return []
+        except (FilterSyntaxError, UnknownShardError) as e:
+            print(f"错误: {e}")
+            return []
+        except Exception as e:
+            print(f"搜索时出错: {e}")
+            return []
+
+    def search_many(self, queries: List[str], top_k: Optional[int] = None,
+                    filters: Optional[Dict] = None, mode: Optional[str] = None,
+                    raise_errors: bool = False, shards: Optional[List[str]] = None) -> List[List[Dict]]:
+        """Batched search over the shards; each shard embeds nothing itself, see _shared_embedder"""
+        if not queries:
+            return []
+
+        try:
+            return self._search_batch(queries, top_k, filters, mode, shards)
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"批量搜索时出错: {e}")
+            return [[] for _ in queries]
+
+    def _search_batch(self, queries: List[str], top_k: Optional[int], filters: Optional[Dict],
+                      mode: Optional[str], shards: Optional[List[str]]) -> List[List[Dict]]:
+        with SEARCH_SECONDS.time(mode=(mode or self.config.SEARCH_MODE).lower()):
+            return self._search_shards(queries, top_k, filters, mode, shards)
+
+    def _search_shards(self, queries: List[str], top_k: Optional[int], filters: Optional[Dict],
+                       mode: Optional[str], shards: Optional[List[str]]) -> List[List[Dict]]:
+        engines = self.select(shards)
+        if top_k is None:
+            top_k = self.config.TOP_K_RESULTS
+        # Invalid filters fail once here rather than once per shard
+        for query in queries:
+            parse_query(query)
+        if not engines:
+            return [[] for _ in queries]
+
+        embed_queries = self._shared_embedder(engines[0])
+        outcomes = self._fan_out(lambda engine: engine._search_batch(queries, top_k, filters, mode, embed_queries),
+                                 engines)
+
+        per_shard, mismatched = [], []
+        for engine, outcome in outcomes:
+            if isinstance(outcome, EmbeddingMismatchError):
+                mismatched.append((engine, outcome))
+            elif isinstance(outcome, Exception):
+                raise outcome
+            else:
+                per_shard.append((engine, outcome))
+        if mismatched and not per_shard:
+            raise mismatched[0][1]
+        for engine, error in mismatched:
+            # The other shards still answer; this one needs re-indexing
+            print(f"跳过分片 {engine.collection_name}: {error}")
+
+        return [self._merge([(engine, results[i]) for engine, results in per_shard], top_k,
+                            parse_query(query)[0])
+                for i, query in enumerate(queries)]
+
+    def _shared_embedder(self, engine: SemanticSearchEngine) -> Callable[[List[str]], List[List[float]]]:
+        """Embeds each distinct query text once per batch, whichever shard asks first"""
+        embeddings: Dict[str, List[float]] = {}
+        lock = threading.Lock()
+
+        def embed_queries(texts: List[str]) -> List[List[float]]:
+            with lock:
+                missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+                if missing:
+                    embeddings.update(zip(missing, engine._embed_queries(missing)))
+                return [embeddings[text] for text in texts]
+        return embed_queries
+
+    def _fan_out(self, call: Callable[[SemanticSearchEngine], object],
+                 engines: List[SemanticSearchEngine]) -> List[Tuple[SemanticSearchEngine, object]]:
+        """Run call on every shard in parallel; exceptions are returned, not raised"""
+        def guarded(engine):
+            try:
+                return engine, call(engine)
+            except Exception as e:
+                return engine, e
+
+        if len(engines) == 1:
+            return [guarded(engines[0])]
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.config.SHARD_SEARCH_WORKERS,
+                                                        thread_name_prefix='shard-search')
+        return list(self._executor.map(guarded, engines))
+
+    def _merge(self, shard_results: List[Tuple[SemanticSearchEngine, List[Dict]]], top_k: int,
+               text: str = '') -> List[Dict]:
+        """
+        Merge per-shard rankings into one; a file indexed by overlapping roots is kept once
+        A single shard keeps its own order. Otherwise the candidates are re-ranked globally,
+        because lexical and hybrid scores are normalized or fused per shard and don't compare:
+        by vector similarity, by raw BM25 score and (filter-only hits) by rank within their
+        shard, fused with reciprocal rank fusion like the two sides of a hybrid search.
+        Files whose stem is the query text (without filters) still rank first, as within a shard.
+        """
+        candidates = []
+        for engine, results in shard_results:
+            for result in results:
+                result['shard'] = engine.collection_name
+                candidates.append(result)
+
+        if len(shard_results) == 1:
+            ranked = candidates
+        else:
+            def ranking(key):
+                return sorted((i for i, result in enumerate(candidates) if key(result) is not None),
+                              key=lambda i: -key(candidates[i]))
+
+            by_vector = ranking(lambda result: result.get('vector_score'))
+            by_lexical = ranking(lambda result: result.get('lexical_score'))
+            unscored = sorted((i for i, result in enumerate(candidates)
+                               if result.get('vector_score') is None and result.get('lexical_score') is None),
+                              key=lambda i: candidates[i]['rank'])
+            fused = reciprocal_rank_fusion([ids for ids in (by_vector, by_lexical, unscored) if ids],
+                                           k=self.config.RRF_K)
+            exact = text.strip().lower()
+            ranked = sorted((candidates[i] for i, _ in fused),
+                            key=lambda result: result.get('file_stem', '').lower() != exact)
+
+        merged, seen = [], set()
+        for result in ranked:
+            if result['file_path'] in seen:
+                continue
+            seen.add(result['file_path'])
+            result['rank'] = len(merged) + 1
+            merged.append(result)
+            if len(merged) >= top_k:
+                break
+        return merged
+
+    def suggest(self, prefix: str, limit: int = 10, shards: Optional[List[str]] = None) -> List[Dict]:
+        """Typeahead suggestions from all shards, best match stage first"""
+        outcomes = self._fan_out(lambda engine: engine.suggest(prefix, limit), self.select(shards))
+        suggestions = [suggestion for _, outcome in outcomes if not isinstance(outcome, Exception)
+                       for suggestion in outcome]
+        suggestions.sort(key=lambda suggestion: SUGGESTION_ORDER.get(suggestion['match'], len(SUGGESTION_ORDER)))
+        merged, seen = [], set()
+        for suggestion in suggestions:
+            if suggestion['file_path'] not in seen:
+                seen.add(suggestion['file_path'])
+                merged.append(suggestion)
+        return merged[:limit]
+
+    # --- state and statistics ---
+
+    def has_indexed_files(self, shards: Optional[List[str]] = None) -> bool:
+        return any(engine.has_indexed_files() for engine in self.select(shards))
+
+    def indexed_count(self) -> int:
+        """Files across all shards according to their manifests (doesn't open Chroma)"""
+        return sum(len(engine.manifest) for engine in self.select())
+
+    def open_in_background(self):
+        for engine in self.select():
+            engine.open_in_background()
+
+    def save_state(self):
+        for engine in self._engines.values():
+            engine.save_state()
+
+    def signature_mismatches(self) -> Dict[str, str]:
+        """Shard name -> reason, for shards built by a different embedder"""
+        return {engine.collection_name: engine.signature_mismatch
+                for engine in self.select() if engine.signature_mismatch}
+
+    def get_collection_stats(self, shards: Optional[List[str]] = None) -> Dict:
+        """Total count plus per-shard statistics"""
+        per_shard = []
+        for engine in self.select(shards):
+            stats = engine.get_collection_stats()
+            stats.setdefault('collection_name', engine.collection_name)
+            stats.setdefault('root', engine.root)
+            stats['indexed_files'] = len(engine.manifest)
+            stats['signature_mismatch'] = engine.signature_mismatch
+            per_shard.append(stats)
+        return {'count': sum(stats['count'] for stats in per_shard), 'shards': per_shard}
+
+    # Stateless helpers shared with the single-collection engine
+    open_file_location = staticmethod(SemanticSearchEngine.open_file_location)
+    display_search_results = staticmethod(SemanticSearchEngine.display_search_results)
@@ -30,6 +30,11 @@ def test_imports():
     # Test ChromaDB
     try:
         import chromadb
+        # dir_names is stored as array metadata, which older releases reject on upsert
+        version = tuple(int(part) for part in chromadb.__version__.split('.')[:2] if part.isdigit())
+        if version < (1, 5):
+            print(f"❌ ChromaDB 版本过低 ({chromadb.__version__}) - 需要 1.5.0 及以上: pip install -U \"chromadb>=1.5.0\"")
+            return False
         print("✅ ChromaDB: OK")
     except ImportError:
         print("❌ ChromaDB 模块未安装 - 请运行: pip install chromadb")
@@ -0,0 +1,45 @@
+import pytest
+
+import main
+from config import Config
+from index_journal import IndexJournal
+
+
+@pytest.fixture(autouse=True)
+def local_setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'EMBEDDING_PROVIDER', 'local')
+    monkeypatch.setattr(Config, 'CHROMA_DB_PATH', str(tmp_path / 'db'))
+    monkeypatch.setattr(Config, 'VECTOR_STORE', 'numpy')
+    monkeypatch.setattr(Config, 'EMBEDDING_CACHE_ENABLED', False)
+
+
+@pytest.mark.parametrize('where', ['{bad json', '["ext", ".tga"]'])
+def test_invalid_where_is_a_usage_error(where, capsys):
+    assert main.run_cli(['search', 'stone', '--where', where]) == main.EXIT_USAGE
+    assert '--where' in capsys.readouterr().err
+
+
+def test_resume_with_every_directory_settled_reports_success(tmp_path, monkeypatch, capsys):
+    root = tmp_path / 'Content'
+    root.mkdir()
+    (root / 'T_Rock.tga').write_text('x')
+    app = main.SemanticFileSearchApp()
+    shard = app.search_engine.shard_for_root(str(root))
+    rows = app.indexer.generate_embeddings(app.indexer.discover_files(str(root)), verbose=False)
+
+    # An interrupted run that embedded every file and settled every directory before stopping
+    journal = IndexJournal(shard.journal_path())
+    journal.start({'root': str(root), 'collection': shard.collection_name, 'incremental': False,
+                   'signature': shard.provider.signature()})
+    journal.record_reset()
+    journal.record_batch(1, rows)
+    journal.checkpoint({str(root): []})
+    journal.close()
+    monkeypatch.setattr('builtins.input', lambda prompt='': 'y')
+    capsys.readouterr()
+
+    assert app.index_directory(str(root))
+    out = capsys.readouterr().out
+    assert '没有找到可索引的文件' not in out
+    assert '写入 1 条上次生成的嵌入向量' in out
+    assert shard.collection.count() == 1
@@ -0,0 +1,54 @@
+import time
+
+from embedding_cache import EmbeddingCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return EmbeddingCache(str(tmp_path / 'cache.sqlite3'), 'test-model', dimensions=4, **kwargs)
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put_many([('t stone', [0.5, 1.0, -2.0, 0.25])])
+
+    assert cache.get_many(['t stone', 't wood']) == {'t stone': [0.5, 1.0, -2.0, 0.25]}
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 1, 1)
+
+
+def test_keys_include_model_and_dimensions(tmp_path):
+    make_cache(tmp_path).put_many([('t stone', [1.0] * 4)])
+
+    other = EmbeddingCache(str(tmp_path / 'cache.sqlite3'), 'test-model', dimensions=8)
+    assert other.get_many(['t stone']) == {}
+
+
+def test_evicts_least_recently_used_without_counting_every_write(tmp_path):
+    cache = make_cache(tmp_path, max_entries=10)
+    counts = []
+    cache._conn.set_trace_callback(lambda sql: counts.append(sql) if 'COUNT(*)' in sql else None)
+
+    for i in range(10):
+        cache.put_many([(f'text {i}', [float(i)] * 4)])
+        time.sleep(0.001)
+    cache.get_many(['text 0'])  # recently used, survives eviction
+    cache.put_many([('text 10', [10.0] * 4)])
+
+    # One count when the cache is first written, one when the estimate passes max_entries
+    assert len(counts) == 2
+    remaining = cache.get_many([f'text {i}' for i in range(11)])
+    assert len(remaining) == 9
+    assert 'text 0' in remaining and 'text 10' in remaining and 'text 1' not in remaining
+
+
+def test_expired_entries_are_purged(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    cache.put_many([('old', [1.0] * 4)])
+    cache._conn.execute('UPDATE embeddings SET created = ?', (time.time() - 120,))
+    cache._conn.commit()
+
+    assert cache.get_many(['old']) == {}
+    cache._next_expiry = 0.0
+    cache.put_many([('new', [2.0] * 4)])
+    assert cache.stats()['entries'] == 1
+    assert cache.evictions == 1
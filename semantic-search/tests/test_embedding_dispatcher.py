@@ -0,0 +1,67 @@
+from embedding_dispatcher import API_MAX_BATCH_INPUTS, BatchSizer, estimate_tokens
+
+
+def test_fast_full_batches_grow_up_to_max_inputs():
+    sizer = BatchSizer(batch_size=100, max_inputs=300, target_seconds=4.0)
+
+    sizer.record_success(100, 1.0, was_full=True)
+    assert sizer.size == 200
+    sizer.record_success(200, 1.0, was_full=True)
+    assert sizer.size == 300
+
+
+def test_partial_or_moderately_slow_batches_keep_size():
+    sizer = BatchSizer(batch_size=100, target_seconds=4.0)
+
+    sizer.record_success(40, 0.5, was_full=False)
+    sizer.record_success(100, 3.0, was_full=True)
+    assert sizer.size == 100
+
+
+def test_slow_batches_and_errors_shrink_down_to_min_size():
+    sizer = BatchSizer(batch_size=100, target_seconds=4.0, min_size=30)
+
+    sizer.record_success(100, 5.0, was_full=True)
+    assert sizer.size == 50
+    sizer.record_error()
+    assert sizer.size == 30
+    sizer.record_error()
+    assert sizer.size == 30
+
+
+def test_fixed_mode_never_changes_size():
+    sizer = BatchSizer(batch_size=100, adaptive=False)
+
+    sizer.record_success(100, 0.1, was_full=True)
+    sizer.record_error()
+    assert sizer.size == 100
+
+
+def test_size_is_capped_by_the_api_limit():
+    assert BatchSizer(batch_size=10_000).size == API_MAX_BATCH_INPUTS
+
+
+def test_next_batch_fills_to_size():
+    sizer = BatchSizer(batch_size=3, min_size=1)
+
+    assert sizer.next_batch([1] * 10, 0, cap=100) == (3, 3, True)
+    assert sizer.next_batch([1] * 10, 9, cap=100) == (10, 1, False)
+
+
+def test_next_batch_stops_at_token_budget():
+    sizer = BatchSizer(batch_size=10, max_tokens=100, min_size=1)
+
+    assert sizer.next_batch([40, 40, 40, 40], 0, cap=100) == (2, 80, False)
+    # A single oversized text still goes out alone rather than never
+    assert sizer.next_batch([500, 1], 0, cap=100) == (1, 500, False)
+
+
+def test_next_batch_cap_is_not_a_full_batch():
+    sizer = BatchSizer(batch_size=10, min_size=1)
+
+    assert sizer.next_batch([1] * 20, 0, cap=4) == (4, 4, False)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 1
+    assert estimate_tokens('a' * 40) == 11
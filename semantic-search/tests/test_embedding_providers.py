@@ -0,0 +1,20 @@
+import pytest
+
+from embedding_providers import EmbeddingProvider, HashingEmbeddingProvider
+
+
+def test_provider_without_embed_fails_on_construction():
+    class PartialProvider(EmbeddingProvider):
+        name = 'partial'
+
+    with pytest.raises(TypeError, match='embed'):
+        PartialProvider('model', 8)
+
+
+def test_hashing_provider_is_deterministic():
+    provider = HashingEmbeddingProvider(dimensions=32)
+
+    first, second = provider.embed(['t stone wall', 't stone wall'])
+    assert len(first) == 32
+    assert first == second
+    assert provider.signature()['embedding:dimensions'] == 32
@@ -0,0 +1,91 @@
+import pytest
+
+from index_journal import IndexJournal
+
+
+def rows(file_id, value):
+    return [(file_id, [value, 0.5, -1.0], {'file_path': f'/content/{file_id}.tga'})]
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = IndexJournal(str(tmp_path / 'collection.journal'))
+    journal.start({'root': '/content', 'incremental': True})
+    yield journal
+    journal.close()
+
+
+def reload(journal):
+    loaded = IndexJournal(journal.path)
+    assert loaded.load()
+    return loaded
+
+
+def test_batches_replay_in_order(journal):
+    journal.record_batch(2, rows('b', 2.0))
+    journal.record_batch(1, rows('a', 1.0))
+
+    loaded = reload(journal)
+    assert loaded.header['root'] == '/content'
+    assert loaded.pending_batches() == [(1, rows('a', 1.0)), (2, rows('b', 2.0))]
+
+
+def test_checkpoint_drops_written_batches_and_keeps_settled(journal):
+    journal.record_batch(1, rows('a', 1.0))
+    journal.record_batch(2, rows('b', 2.0))
+    journal.record_written(1)
+
+    # Written batches stay on disk until the store was saved and a checkpoint taken
+    assert [batch for batch, _ in reload(journal).pending_batches()] == [1, 2]
+
+    journal.checkpoint({'/content/props': ['/content/props/rocks']})
+    loaded = reload(journal)
+    assert [batch for batch, _ in loaded.pending_batches()] == [2]
+    assert loaded.settled == {'/content/props': ['/content/props/rocks']}
+
+
+def test_torn_last_line_is_ignored(journal):
+    journal.record_batch(1, rows('a', 1.0))
+    journal.record_batch(2, rows('b', 2.0))
+    journal.close()
+    with open(journal.path, 'r+', encoding='utf-8') as f:
+        content = f.read()
+        f.seek(0)
+        f.truncate()
+        f.write(content[:-20])
+
+    assert reload(journal).pending_batches() == [(1, rows('a', 1.0))]
+
+
+def test_reset_is_remembered_across_checkpoints(journal):
+    journal.record_reset()
+    journal.checkpoint({})
+
+    assert reload(journal).reset_done
+
+
+def test_resumed_run_keeps_appending(journal):
+    journal.record_batch(1, rows('a', 1.0))
+    journal.close()
+
+    resumed = reload(journal)
+    resumed.start()
+    resumed.record_batch(2, rows('b', 2.0))
+    resumed.close()
+    assert [batch for batch, _ in reload(journal).pending_batches()] == [1, 2]
+
+
+def test_unusable_journals_do_not_load(tmp_path):
+    missing = IndexJournal(str(tmp_path / 'missing.journal'))
+    assert not missing.load()
+
+    path = tmp_path / 'old.journal'
+    path.write_text('{"type": "run", "version": 0}\n')
+    assert not IndexJournal(str(path)).load()
+
+
+def test_discard_removes_the_file(journal):
+    journal.record_batch(1, rows('a', 1.0))
+    journal.discard()
+
+    assert not journal.exists()
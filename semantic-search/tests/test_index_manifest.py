@@ -0,0 +1,57 @@
+import pytest
+
+from index_manifest import IndexManifest
+
+
+def metadata(text='t stone wall', size=100, mtime=1.0, version=IndexManifest.METADATA_VERSION):
+    return {'file_path': '/content/T_Stone_Wall.tga', 'file_size': size, 'file_mtime': mtime,
+            'searchable_text': text, 'metadata_version': version}
+
+
+def file_info(size=100, mtime=1.0):
+    return {'id': 'stone', 'path': '/content/T_Stone_Wall.tga', 'size': size, 'modified_time': mtime}
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = IndexManifest(str(tmp_path / 'test.manifest.json'))
+    manifest.record('stone', metadata())
+    return manifest
+
+
+def test_classify_new_file(tmp_path):
+    assert IndexManifest(str(tmp_path / 'empty.json')).classify(file_info(), 't stone wall') == 'added'
+
+
+@pytest.mark.parametrize('info, text, expected', [
+    (file_info(), 't stone wall', 'unchanged'),
+    (file_info(), 't stone wall mossy', 'changed'),
+    (file_info(size=200), 't stone wall', 'metadata_only'),
+    (file_info(mtime=2.0), 't stone wall', 'metadata_only'),
+    (file_info(size=200), 't brick wall', 'changed'),
+])
+def test_classify_recorded_file(manifest, info, text, expected):
+    assert manifest.classify(info, text) == expected
+
+
+def test_outdated_metadata_version_needs_metadata_update(tmp_path):
+    manifest = IndexManifest(str(tmp_path / 'old.json'))
+    manifest.record('stone', metadata(version=IndexManifest.METADATA_VERSION - 1))
+
+    assert manifest.classify(file_info(), 't stone wall') == 'metadata_only'
+
+
+def test_save_load_and_remove(manifest):
+    manifest.save()
+    loaded = IndexManifest(manifest.manifest_path)
+    assert loaded.entries == manifest.entries
+
+    loaded.remove(['stone', 'unknown'])
+    assert len(loaded) == 0
+
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    path = tmp_path / 'broken.json'
+    path.write_text('{not json')
+
+    assert len(IndexManifest(str(path))) == 0
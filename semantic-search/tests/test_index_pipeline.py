@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+import fast_scanner
+import file_indexer
+from config import Config
+from embedding_providers import HashingEmbeddingProvider
+from file_indexer import FileIndexer
+from index_pipeline import IndexPipeline
+from semantic_search import SemanticSearchEngine
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'CHROMA_DB_PATH', str(tmp_path / 'db'))
+    monkeypatch.setattr(Config, 'VECTOR_STORE', 'numpy')
+    monkeypatch.setattr(Config, 'VECTOR_QUANTIZATION', None)
+    monkeypatch.setattr(Config, 'EMBEDDING_CACHE_ENABLED', False)
+    monkeypatch.setattr(Config, 'QUERY_CACHE_ENABLED', False)
+    root = tmp_path / 'Content'
+    for directory, names in {'Rocks': ['T_Rock_A.tga', 'T_Rock_B.tga'],
+                             'Trees': ['T_Oak.tga', 'T_Pine.tga', 'T_Birch.tga']}.items():
+        (root / directory).mkdir(parents=True)
+        for name in names:
+            (root / directory / name).write_text('x')
+    return str(root)
+
+
+def run_index(root: str, incremental: bool) -> tuple:
+    provider = HashingEmbeddingProvider(dimensions=64)
+    engine = SemanticSearchEngine(provider, collection_name='test_pipeline', root=root)
+    pipeline = IndexPipeline(FileIndexer(provider), engine, chunk_size=2, journal=False)
+    return pipeline.run(root, incremental=incremental), engine
+
+
+def test_incremental_run_deletes_removed_files(tree):
+    run_index(tree, incremental=False)
+    os.remove(os.path.join(tree, 'Trees', 'T_Oak.tga'))
+
+    report, engine = run_index(tree, incremental=True)
+
+    assert report['deleted'] == 1
+    assert len(engine.manifest) == 4
+
+
+def test_unreadable_directory_keeps_its_files(tree, monkeypatch):
+    run_index(tree, incremental=False)
+    scan_directory = fast_scanner._scan_directory
+
+    def scan_with_denied_directory(directory, extensions):
+        if os.path.basename(directory) == 'Trees':
+            return [], [], [(directory, PermissionError(13, 'Permission denied', directory))]
+        return scan_directory(directory, extensions)
+
+    monkeypatch.setattr(fast_scanner, '_scan_directory', scan_with_denied_directory)
+    report, engine = run_index(tree, incremental=True)
+
+    assert report['discovered'] == 2
+    assert report['deleted'] == 0
+    assert len(engine.manifest) == 5
+
+
+def test_interrupted_walk_skips_deletions(tree, monkeypatch):
+    run_index(tree, incremental=False)
+    scan_tree = fast_scanner.scan_tree
+
+    def failing_scan_tree(*args, **kwargs):
+        for count, record in enumerate(scan_tree(*args, **kwargs)):
+            if count == 1:
+                raise OSError('network share disconnected')
+            yield record
+
+    monkeypatch.setattr(file_indexer, 'scan_tree', failing_scan_tree)
+    report, engine = run_index(tree, incremental=True)
+
+    assert report['deleted'] == 0
+    assert len(engine.manifest) == 5
+
+
+def test_embedding_batches_grow_past_the_scan_chunk(tmp_path, monkeypatch, tree):
+    monkeypatch.setattr(Config, 'EMBEDDING_BATCH_SIZE', 16)
+    monkeypatch.setattr(Config, 'EMBEDDING_MAX_BATCH_INPUTS', 256)
+    root = tmp_path / 'Many'
+    root.mkdir()
+    for i in range(1200):
+        (root / f'T_Asset_{i}.tga').write_text('x')
+
+    provider = HashingEmbeddingProvider(dimensions=64)
+    indexer = FileIndexer(provider)
+    indexer.dispatcher.max_workers = 4
+    batch_sizes = []
+    embed_fn = indexer.dispatcher.embed_fn
+
+    def recording_embed(texts):
+        batch_sizes.append(len(texts))
+        return embed_fn(texts)
+
+    indexer.dispatcher.embed_fn = recording_embed
+    engine = SemanticSearchEngine(provider, collection_name='test_batches', root=str(root))
+    report = IndexPipeline(indexer, engine, chunk_size=50, journal=False).run(str(root), incremental=False)
+
+    assert report['added'] == 1200
+    assert sum(batch_sizes) == 1200
+    # Batches grow past the 50-file scan chunk (split over 4 workers it used to cap them at 16)
+    assert 50 < max(batch_sizes) <= 256
@@ -0,0 +1,89 @@
+import pytest
+
+from lexical_index import LexicalIndex, tokenize, reciprocal_rank_fusion, matches_where
+
+
+def make_index(tmp_path, names):
+    index = LexicalIndex(str(tmp_path / 'lexical.json'))
+    for name in names:
+        stem = name.rsplit('.', 1)[0]
+        index.add(name, {'searchable_text': ' '.join(tokenize(stem)), 'file_stem': stem, 'file_extension': '.tga'})
+    return index
+
+
+def test_tokenize_splits_separators_and_camel_case():
+    assert tokenize('T_StoneWall-Normal.tga') == ['t', 'stone', 'wall', 'normal', 'tga']
+
+
+def test_bm25_prefers_rare_tokens_and_short_documents(tmp_path):
+    index = make_index(tmp_path, ['T_Stone.tga', 'T_Wood.tga', 'T_Wood_Planks.tga', 'T_Stone_Wall_Moss_Large.tga'])
+
+    ranked = [doc_id for doc_id, _, _ in index.search('stone', top_k=10)]
+
+    assert ranked == ['T_Stone.tga', 'T_Stone_Wall_Moss_Large.tga']
+    scores = {doc_id: score for doc_id, _, score in index.search('t wood', top_k=10)}
+    # 'wood' is rarer than 't', which every document contains
+    assert scores['T_Wood.tga'] > scores['T_Wood_Planks.tga'] > scores['T_Stone.tga']
+
+
+def test_exact_stem_ranks_first(tmp_path):
+    index = make_index(tmp_path, ['T_Stone_Wall_Normal.tga', 'T_Stone_Wall_Normal_Old.tga', 'T_Wall.tga'])
+
+    assert index.search('T_Stone_Wall_Normal_Old', top_k=1)[0][0] == 'T_Stone_Wall_Normal_Old.tga'
+
+
+def test_require_all_matches_full_scoring(tmp_path):
+    names = [f'T_Stone_Wall_{i}.tga' for i in range(5)] + [f'T_Stone_{i}.tga' for i in range(5)] + ['T_Wall.tga']
+    index = make_index(tmp_path, names)
+
+    strict = {doc_id: score for doc_id, _, score in index.search('stone wall', top_k=20, require_all=True)}
+    loose = {doc_id: score for doc_id, _, score in index.search('stone wall', top_k=20)}
+
+    assert set(strict) == {f'T_Stone_Wall_{i}.tga' for i in range(5)}
+    for doc_id, score in strict.items():
+        assert score == pytest.approx(loose[doc_id])
+    assert index.search('stone missing', top_k=5, require_all=True) == []
+
+
+def test_is_exact_token_query(tmp_path):
+    index = make_index(tmp_path, ['T_Stone_Wall_Normal.tga'])
+
+    assert index.is_exact_token_query('T_Stone_Wall_Normal')
+    assert not index.is_exact_token_query('stone wall')
+    assert not index.is_exact_token_query('T_Brick_Wall')
+
+
+def test_search_applies_where(tmp_path):
+    index = make_index(tmp_path, ['T_Stone.tga'])
+    index.add('T_Stone.png', {'searchable_text': 't stone', 'file_stem': 'T_Stone', 'file_extension': '.png'})
+
+    hits = index.search('stone', top_k=5, where={'file_extension': '.png'})
+
+    assert [(doc_id, metadata['file_extension']) for doc_id, metadata, _ in hits] == [('T_Stone.png', '.png')]
+
+
+def test_hits_outlive_removal(tmp_path):
+    index = make_index(tmp_path, ['T_Stone.tga', 'T_Stone_Wall.tga'])
+
+    hits = index.search('stone', top_k=5)
+    # A re-index on another thread must not invalidate hits that were already returned
+    index.remove(['T_Stone.tga'])
+    index.clear()
+
+    assert [metadata['file_stem'] for _, metadata, _ in hits] == ['T_Stone', 'T_Stone_Wall']
+
+
+def test_matches_where_operators():
+    metadata = {'file_extension': '.tga', 'file_size': 2048, 'dir_names': ['content', 'rocks']}
+
+    assert matches_where(metadata, {'$and': [{'file_size': {'$gte': 1024}}, {'dir_names': {'$contains': 'rocks'}}]})
+    assert matches_where(metadata, {'$or': [{'file_extension': '.png'}, {'file_extension': {'$in': ['.tga']}}]})
+    assert not matches_where(metadata, {'file_size': {'$lt': 1024}})
+    assert not matches_where(metadata, {'modified_days': {'$gt': 1}})
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'd']], k=60)
+
+    assert [doc_id for doc_id, _ in fused] == ['b', 'a', 'd', 'c']
+    assert dict(fused)['b'] == pytest.approx(1 / 62 + 1 / 61)
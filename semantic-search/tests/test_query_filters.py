@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from query_filters import (FilterSyntaxError, asset_type_for, combine_where, directory_names,
+                           parse_query)
+
+NOW = 1_700_000_040.0  # a whole minute
+MINUTE = (int(NOW) // 60) * 60
+
+
+def test_plain_query_has_no_where():
+    assert parse_query('  stone   wall ') == ('stone wall', None)
+
+
+@pytest.mark.parametrize('query, where', [
+    ('ext:tga', {'file_extension': {'$eq': '.tga'}}),
+    ('ext:.TGA,png,tga', {'file_extension': {'$in': ['.tga', '.png']}}),
+    ('-ext:txt', {'file_extension': {'$ne': '.txt'}}),
+    ('-ext:txt,log', {'file_extension': {'$nin': ['.txt', '.log']}}),
+    ('type:tex', {'asset_type': {'$eq': 'texture'}}),
+    ('type:mesh', {'asset_type': {'$in': ['static_mesh', 'skeletal_mesh']}}),
+    ('dir:Characters', {'dir_names': {'$contains': 'characters'}}),
+    ('dir:"Characters/Hero"', {'$and': [{'dir_names': {'$contains': 'characters'}},
+                                        {'dir_names': {'$contains': 'hero'}}]}),
+    ('dir:A,B', {'$or': [{'dir_names': {'$contains': 'a'}}, {'dir_names': {'$contains': 'b'}}]}),
+    ('-dir:Temp', {'dir_names': {'$not_contains': 'temp'}}),
+    ('size>1MB', {'file_size': {'$gt': 1024 ** 2}}),
+    ('size<=1.5kb', {'file_size': {'$lte': 1536}}),
+    ('modified<7d', {'file_mtime': {'$gt': MINUTE - 7 * 86400}}),
+    ('modified>30min', {'file_mtime': {'$lt': MINUTE - 30 * 60}}),
+])
+def test_single_filter_where(query, where):
+    assert parse_query(query, now=NOW) == ('', where)
+
+
+def test_modified_date_is_a_local_day():
+    day_start = time.mktime(time.strptime('2024-01-01', '%Y-%m-%d'))
+
+    assert parse_query('modified:2024-01-01', now=NOW)[1] == {
+        '$and': [{'file_mtime': {'$gte': day_start}}, {'file_mtime': {'$lt': day_start + 86400}}]}
+    assert parse_query('modified>2024-01-01', now=NOW)[1] == {'file_mtime': {'$gte': day_start + 86400}}
+    assert parse_query('modified<2024-01-01', now=NOW)[1] == {'file_mtime': {'$lt': day_start}}
+
+
+def test_filters_are_anded_and_text_is_kept():
+    text, where = parse_query('stone ext:tga wall size>1k', now=NOW)
+
+    assert text == 'stone wall'
+    assert where == {'$and': [{'file_extension': {'$eq': '.tga'}}, {'file_size': {'$gt': 1024}}]}
+
+
+@pytest.mark.parametrize('query', ['C:\\Game\\Content', 'note:todo', 'context:menu', 'a-ext:txt'])
+def test_unknown_keys_stay_in_text(query):
+    assert parse_query(query, now=NOW) == (query, None)
+
+
+@pytest.mark.parametrize('query', [
+    'ext>tga', 'ext:,', 'type:sprite', 'size>huge', 'size>1XB', '-size>1MB',
+    'modified<7x', 'modified>2024-13-40', 'dir:/',
+])
+def test_invalid_filter_raises(query):
+    with pytest.raises(FilterSyntaxError):
+        parse_query(query, now=NOW)
+
+
+def test_combine_where_flattens_and_splits():
+    assert combine_where(None, {}) is None
+    assert combine_where({'a': 1}) == {'a': 1}
+    assert combine_where({'$and': [{'a': 1}, {'b': 2}]}, {'c': 3, 'd': 4}) == {
+        '$and': [{'a': 1}, {'b': 2}, {'c': 3}, {'d': 4}]}
+
+
+def test_asset_type_and_directory_names():
+    assert asset_type_for('SM_Rock') == 'static_mesh'
+    assert asset_type_for('MI_Rock') == 'material'
+    assert asset_type_for('rock') == 'other'
+    assert directory_names('/Game/Content\\Props/') == ['game', 'content', 'props']
@@ -0,0 +1,103 @@
+import json
+import socket
+import threading
+import time
+import http.client
+
+import pytest
+
+from config import Config
+from embedding_providers import HashingEmbeddingProvider
+from search_service import SearchService, create_server
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'CHROMA_DB_PATH', str(tmp_path / 'db'))
+    monkeypatch.setattr(Config, 'VECTOR_STORE', 'numpy')
+    monkeypatch.setattr(Config, 'VECTOR_QUANTIZATION', None)
+    monkeypatch.setattr(Config, 'EMBEDDING_CACHE_ENABLED', False)
+    monkeypatch.setattr(Config, 'INDEX_JOURNAL_ENABLED', False)
+    return SearchService(HashingEmbeddingProvider(dimensions=32))
+
+
+@pytest.fixture
+def server(service):
+    servers = []
+
+    def start(workers=2, idle_timeout=15.0):
+        srv = create_server(service, '127.0.0.1', 0, None, workers, idle_timeout)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+        return srv.server_address[1]
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def request(port, method, path, body=None, connection=None):
+    connection = connection or http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    connection.request(method, path, json.dumps(body) if body is not None else None,
+                       {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_non_object_filters_are_rejected(server):
+    port = server()
+
+    status, payload = request(port, 'POST', '/search', {'query': 'stone', 'filters': 'bad'})
+
+    assert status == 400
+    assert 'filters' in payload['error']
+
+
+def test_index_expands_user_directory(service, tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    (tmp_path / 'Content').mkdir()
+    (tmp_path / 'Content' / 'T_Stone.tga').write_text('x')
+
+    status = service.start_index({'directory': '~/Content'})
+
+    assert status['job']['directory'] == str(tmp_path / 'Content')
+    while service.index_status()['job']['state'] == 'running':
+        time.sleep(0.05)
+    assert service.index_status()['job']['report']['added'] == 1
+
+
+def test_idle_connections_do_not_hold_workers(server):
+    port = server(workers=2)
+    # More idle clients than workers: some never sent anything, some are between keep-alive requests
+    silent = [socket.create_connection(('127.0.0.1', port)) for _ in range(4)]
+    kept_alive = [http.client.HTTPConnection('127.0.0.1', port, timeout=5) for _ in range(4)]
+    for connection in kept_alive:
+        assert request(port, 'GET', '/health', connection=connection)[0] == 200
+
+    start = time.perf_counter()
+    assert request(port, 'GET', '/health')[0] == 200
+    assert time.perf_counter() - start < 1.0
+    # The parked connections are still usable
+    assert request(port, 'GET', '/health', connection=kept_alive[0])[0] == 200
+    for sock in silent:
+        sock.close()
+
+
+def test_idle_connections_are_closed_after_timeout(server):
+    port = server(idle_timeout=0.2)
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(b'GET /health HTTP/1.1\r\nHost: x\r\n\r\n')
+    sock.settimeout(5)
+    received = b''
+    start = time.perf_counter()
+    # Headers and body arrive in separate writes; the server then closes the idle connection
+    while True:
+        data = sock.recv(4096)
+        if not data:
+            break
+        received += data
+
+    assert b'200 OK' in received and received.endswith(b'{"status": "ok"}')
+    assert time.perf_counter() - start < 2.0
+    sock.close()
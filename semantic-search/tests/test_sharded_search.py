@@ -0,0 +1,67 @@
+from config import Config
+from embedding_providers import HashingEmbeddingProvider
+from sharded_search import ShardedSearchEngine
+
+
+class FakeShard:
+    def __init__(self, name):
+        self.collection_name = name
+
+
+def result(path, similarity, vector_score=None, lexical_score=None, rank=1):
+    return {'file_path': path, 'file_stem': path.rsplit('/', 1)[-1], 'similarity_score': similarity,
+            'vector_score': vector_score, 'lexical_score': lexical_score, 'rank': rank}
+
+
+def make_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'CHROMA_DB_PATH', str(tmp_path / 'db'))
+    return ShardedSearchEngine(HashingEmbeddingProvider(dimensions=32))
+
+
+def test_merge_ranks_lexical_hits_by_raw_bm25(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path, monkeypatch)
+    large = [result('/big/T_Stone_Wall', 1.0, lexical_score=12.0), result('/big/T_Stone', 0.9, lexical_score=10.8, rank=2)]
+    # The best hit of a small shard is normalized to 1.0 as well, but is a weak match
+    small = [result('/small/T_Wall_Old', 1.0, lexical_score=2.0)]
+
+    merged = engine._merge([(FakeShard('big'), large), (FakeShard('small'), small)], top_k=10)
+
+    assert [r['file_path'] for r in merged] == ['/big/T_Stone_Wall', '/big/T_Stone', '/small/T_Wall_Old']
+    assert [r['rank'] for r in merged] == [1, 2, 3]
+    assert merged[2]['shard'] == 'small'
+
+
+def test_merge_fuses_vector_and_lexical_rankings_across_shards(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path, monkeypatch)
+    first = [result('/a/both', 0.8, vector_score=0.8, lexical_score=5.0),
+             result('/a/vector', 0.7, vector_score=0.7, rank=2)]
+    second = [result('/b/lexical', 1.0, lexical_score=9.0),
+              result('/b/weak', 0.3, vector_score=0.3, rank=2)]
+
+    merged = engine._merge([(FakeShard('a'), first), (FakeShard('b'), second)], top_k=3)
+
+    assert [r['file_path'] for r in merged] == ['/a/both', '/b/lexical', '/a/vector']
+
+
+def test_merge_keeps_single_shard_order_and_drops_duplicates(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path, monkeypatch)
+    fused = [result('/a/x', 0.2, vector_score=0.2), result('/a/y', 0.9, vector_score=0.9, rank=2)]
+
+    assert [r['file_path'] for r in engine._merge([(FakeShard('a'), fused)], top_k=5)] == ['/a/x', '/a/y']
+
+    overlapping = [result('/a/x', 0.9, vector_score=0.9)]
+    merged = engine._merge([(FakeShard('a'), [result('/a/x', 0.9, vector_score=0.9)]),
+                            (FakeShard('b'), overlapping)], top_k=5)
+    assert [r['file_path'] for r in merged] == ['/a/x']
+
+
+def test_merge_ranks_exact_stem_first(tmp_path, monkeypatch):
+    engine = make_engine(tmp_path, monkeypatch)
+    # Answered by the lexical fast path in one shard, by hybrid search in the other
+    exact = [result('/a/T_A_Stone_3', 1.0, lexical_score=20.0)]
+    hybrid = [result('/b/T_B_Stone_3', 0.8, vector_score=0.8, lexical_score=4.0),
+              result('/b/T_B_Stone_30', 0.7, vector_score=0.7, lexical_score=3.5, rank=2)]
+
+    merged = engine._merge([(FakeShard('a'), exact), (FakeShard('b'), hybrid)], top_k=3, text='t_a_stone_3')
+
+    assert [r['file_path'] for r in merged] == ['/a/T_A_Stone_3', '/b/T_B_Stone_3', '/b/T_B_Stone_30']
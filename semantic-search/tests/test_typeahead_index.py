@@ -0,0 +1,81 @@
+import pytest
+
+from typeahead_index import TypeaheadIndex, bounded_edit_distance
+
+STEMS = ['T_Stone_Wall_Normal', 'T_Stone_Floor', 'SM_Rock_Large', 'MI_Cobblestone', 'BP_Door']
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TypeaheadIndex(str(tmp_path / 'typeahead.json'))
+    for stem in STEMS:
+        index.add(stem, {'file_stem': stem, 'file_name': stem + '.uasset',
+                         'file_path': f'/content/{stem}.uasset'})
+    return index
+
+
+def stems(results):
+    return [result['file_stem'] for result in results]
+
+
+def test_whole_stem_prefix_ranks_first(index):
+    results = index.suggest('t_stone_w')
+
+    assert stems(results) == ['T_Stone_Wall_Normal']
+    assert results[0]['match'] == 'prefix'
+    assert results[0]['file_path'] == '/content/T_Stone_Wall_Normal.uasset'
+
+
+def test_name_part_prefix_requires_every_word(index):
+    results = index.suggest('stone')
+    # Name-part prefixes first, then stems that only contain the word
+    assert sorted(stems(results[:2])) == ['T_Stone_Floor', 'T_Stone_Wall_Normal']
+    assert [result['match'] for result in results] == ['prefix', 'prefix', 'substring']
+    assert results[2]['file_stem'] == 'MI_Cobblestone'
+    assert stems(index.suggest('stone fl')) == ['T_Stone_Floor']
+    assert index.suggest('door fl') == []
+
+
+def test_substring_and_fuzzy_matches(index):
+    substring = index.suggest('blest')
+    assert stems(substring) == ['MI_Cobblestone']
+    assert substring[0]['match'] == 'substring'
+
+    fuzzy = index.suggest('rokc')
+    assert stems(fuzzy) == ['SM_Rock_Large']
+    assert fuzzy[0]['match'] == 'fuzzy'
+
+
+def test_limit_and_empty_query(index):
+    assert len(index.suggest('t', limit=1)) == 1
+    assert index.suggest('   ') == []
+    assert index.suggest('stone', limit=0) == []
+
+
+def test_remove_and_reload(index):
+    index.remove(['T_Stone_Floor'])
+    assert stems(index.suggest('stone fl')) == []
+
+    index.save()
+    loaded = TypeaheadIndex(index.index_path)
+    assert loaded.load()
+    assert len(loaded) == len(STEMS) - 1
+    assert stems(loaded.suggest('stone w')) == ['T_Stone_Wall_Normal']
+    assert loaded.suggest('stone fl') == []
+
+
+@pytest.mark.parametrize('a, b, expected', [
+    ('stone', 'stone', 0),
+    ('stnoe', 'stone', 1),
+    ('ston', 'stone', 1),
+    ('stane', 'stone', 1),
+    ('sotne', 'stone', 1),
+    ('abc', 'xyz', 3),
+])
+def test_bounded_edit_distance(a, b, expected):
+    assert bounded_edit_distance(a, b, 3) == expected
+
+
+def test_bounded_edit_distance_gives_up_early():
+    assert bounded_edit_distance('stone', 'granite', 1) == 2
+    assert bounded_edit_distance('a', 'abcdef', 2) == 3
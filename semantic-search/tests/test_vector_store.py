@@ -0,0 +1,21 @@
+import pytest
+
+from numpy_vector_store import NumpyVectorStore
+from vector_store import VectorStore
+
+
+def test_incomplete_backend_fails_on_construction():
+    class PartialStore(VectorStore):
+        def get_or_create_collection(self, name, metadata=None):
+            return None
+
+    with pytest.raises(TypeError, match='create_collection'):
+        PartialStore()
+
+
+def test_numpy_store_implements_the_interface(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+
+    collection = store.create_collection('test_store')
+    assert collection.count() == 0
+    assert store.get_max_batch_size() > 0
@@ -0,0 +1,271 @@
+import os
+import json
+import bisect
+import threading
+from typing import List, Dict, Tuple, Optional, Iterable, Set
+
+from lexical_index import tokenize
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f'^{word}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Edit distance counting an adjacent transposition (stnoe -> stone) as one edit,
+    giving up early once it exceeds max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before_previous: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before_previous[j - 2] + 1)
+            current.append(cost)
+        if min(current) > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+class TypeaheadIndex:
+    """
+    Instant filename suggestions while the user types, without any API call
+    - prefix:    binary search over sorted lower-case stems and name parts
+    - substring: trigram index over the (small) vocabulary of name parts
+    - fuzzy:     trigram candidates verified with a bounded edit distance
+    Only the vocabulary is trigram-indexed, so memory stays proportional to
+    the number of distinct name parts rather than the number of files.
+    """
+
+    VERSION = 1
+
+    def __init__(self, index_path: str, max_edit_distance: int = 2):
+        self.index_path = index_path
+        self.max_edit_distance = max_edit_distance
+        self.entries: Dict[str, Tuple[str, str, str]] = {}  # id -> (stem, name, path)
+        self.stem_ids: Dict[str, Set[str]] = {}
+        self.token_ids: Dict[str, Set[str]] = {}
+        self.token_trigrams: Dict[str, Set[str]] = {}
+        self._sorted_stems: List[str] = []
+        self._sorted_tokens: List[str] = []
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # --- maintenance ---
+
+    def add(self, doc_id: str, metadata: Dict):
+        with self._lock:
+            if doc_id in self.entries:
+                self._remove_entry(doc_id)
+
+            stem = metadata.get('file_stem', '')
+            self.entries[doc_id] = (stem, metadata.get('file_name', ''), metadata.get('file_path', ''))
+            self.stem_ids.setdefault(stem.lower(), set()).add(doc_id)
+            for token in set(tokenize(stem)):
+                ids = self.token_ids.get(token)
+                if ids is None:
+                    ids = self.token_ids[token] = set()
+                    for trigram in _trigrams(token):
+                        self.token_trigrams.setdefault(trigram, set()).add(token)
+                ids.add(doc_id)
+            self._dirty = True
+
+    def remove(self, doc_ids: Iterable[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id in self.entries:
+                    self._remove_entry(doc_id)
+                    self._dirty = True
+
+    def _remove_entry(self, doc_id: str):
+        stem = self.entries.pop(doc_id)[0]
+        self._discard(self.stem_ids, stem.lower(), doc_id)
+        for token in set(tokenize(stem)):
+            if self._discard(self.token_ids, token, doc_id):
+                for trigram in _trigrams(token):
+                    self._discard(self.token_trigrams, trigram, token)
+
+    @staticmethod
+    def _discard(mapping: Dict[str, Set[str]], key: str, value: str) -> bool:
+        """Remove value from mapping[key]; returns True if the key became empty and was dropped"""
+        values = mapping.get(key)
+        if values is None:
+            return False
+        values.discard(value)
+        if not values:
+            del mapping[key]
+            return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+            self.stem_ids = {}
+            self.token_ids = {}
+            self.token_trigrams = {}
+            self._sorted_stems = []
+            self._sorted_tokens = []
+            self._dirty = False
+
+    def _ensure_sorted(self):
+        # Writes come in large batches, so re-sort lazily on the next lookup
+        if self._dirty:
+            self._sorted_stems = sorted(self.stem_ids)
+            self._sorted_tokens = sorted(self.token_ids)
+            self._dirty = False
+
+    # --- persistence ---
+
+    def save(self):
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            data = {'version': self.VERSION, 'entries': self.entries}
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def load(self) -> bool:
+        """Load from disk; returns False if missing or unreadable"""
+        self.clear()
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取输入提示索引失败，将重新构建: {e}")
+            return False
+        if data.get('version') != self.VERSION:
+            return False
+
+        for doc_id, (stem, name, path) in data.get('entries', {}).items():
+            self.add(doc_id, {'file_stem': stem, 'file_name': name, 'file_path': path})
+        return True
+
+    # --- lookups ---
+
+    @staticmethod
+    def _prefixed(sorted_keys: List[str], prefix: str) -> Iterable[str]:
+        for i in range(bisect.bisect_left(sorted_keys, prefix), len(sorted_keys)):
+            key = sorted_keys[i]
+            if not key.startswith(prefix):
+                return
+            yield key
+
+    def _substring_tokens(self, fragment: str) -> List[str]:
+        """Vocabulary tokens containing fragment (fragment must be 3+ characters)"""
+        candidates: Optional[Set[str]] = None
+        # Inner trigrams only: the fragment may sit anywhere inside the token
+        for i in range(len(fragment) - 2):
+            tokens = self.token_trigrams.get(fragment[i:i + 3])
+            if not tokens:
+                return []
+            candidates = set(tokens) if candidates is None else candidates & tokens
+            if not candidates:
+                return []
+        return sorted((token for token in candidates or () if fragment in token), key=lambda t: (len(t), t))
+
+    def _fuzzy_tokens(self, word: str) -> List[Tuple[int, str]]:
+        """Vocabulary tokens within a small edit distance, as (distance, token)"""
+        max_distance = 1 if len(word) < 8 else self.max_edit_distance
+        trigrams = _trigrams(word)
+        # Each edit (a transposition included) destroys at most 4 trigrams
+        needed = len(trigrams) - 4 * max_distance
+        counts: Dict[str, int] = {}
+        for trigram in trigrams:
+            for token in self.token_trigrams.get(trigram, ()):
+                counts[token] = counts.get(token, 0) + 1
+
+        matches = []
+        for token, shared in counts.items():
+            if shared < needed or abs(len(token) - len(word)) > max_distance:
+                continue
+            distance = bounded_edit_distance(word, token, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, token))
+        matches.sort(key=lambda match: (match[0], len(match[1]), match[1]))
+        return matches
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """
+        Suggestions for a partially typed name, best first
+        Full-stem prefix matches rank first, then name-part prefix matches
+        (every typed word must match), then substring and fuzzy matches.
+        """
+        query = prefix.strip().lower()
+        if not query or limit <= 0:
+            return []
+
+        with self._lock:
+            self._ensure_sorted()
+            results: List[Dict] = []
+            seen: Set[str] = set()
+
+            def collect(ids: Iterable[str], match: str) -> bool:
+                for doc_id in ids:
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    stem, name, path = self.entries[doc_id]
+                    results.append({'file_stem': stem, 'file_name': name, 'file_path': path, 'match': match})
+                    if len(results) >= limit:
+                        return True
+                return False
+
+            # 1. Whole-stem prefix: "t_stone_w" -> T_Stone_Wall_Normal
+            for stem in self._prefixed(self._sorted_stems, query):
+                if collect(self.stem_ids[stem], 'prefix'):
+                    return results
+
+            # 2. Name parts: "stone wa" -> every word matches a part, the last one as a prefix
+            words = tokenize(query)
+            if not words:
+                return results
+            *complete, last = words
+            required: Optional[Set[str]] = None
+            if complete:
+                id_sets = [self.token_ids.get(word) for word in complete]
+                if not all(id_sets):
+                    return results
+                # Start from the rarest word so intermediate sets stay small
+                id_sets.sort(key=len)
+                required = id_sets[0].intersection(*id_sets[1:]) if len(id_sets) > 1 else id_sets[0]
+            for token in self._prefixed(self._sorted_tokens, last):
+                ids = self.token_ids[token]
+                if required is not None:
+                    # Lazy filter over the smaller set, so collect() can stop at `limit`
+                    small, large = (required, ids) if len(required) <= len(ids) else (ids, required)
+                    ids = (doc_id for doc_id in small if doc_id in large)
+                if collect(ids, 'prefix'):
+                    return results
+
+            if complete:
+                return results
+
+            # 3. Substring inside a name part: "tone" -> T_Stone_Wall
+            if len(last) >= 3:
+                for token in self._substring_tokens(last):
+                    if collect(self.token_ids[token], 'substring'):
+                        return results
+
+            # 4. Typos: "stnoe" -> stone
+            if len(last) >= 4:
+                for _, token in self._fuzzy_tokens(last):
+                    if collect(self.token_ids[token], 'fuzzy'):
+                        return results
+
+            return results
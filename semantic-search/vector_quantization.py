@@ -0,0 +1,130 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+QUANTIZATION_MODES = ('float32', 'float16', 'int8')
+
+# Rows scored per block, bounding the float32 copy made while scoring compressed codes
+_SCORE_BLOCK_ROWS = 4096
+
+
+def normalize_mode(mode: Optional[str]) -> str:
+    mode = (mode or 'float32').lower()
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"未知的量化方式: {mode} (可选: {', '.join(QUANTIZATION_MODES)})")
+    return mode
+
+
+def truncate_dimensions(matrix: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    Keep the first `dimensions` components and re-normalize
+    Matches what the OpenAI API returns for text-embedding-3 models when
+    asked for fewer dimensions, so reduced sizes can be evaluated offline.
+    """
+    reduced = np.ascontiguousarray(matrix[:, :dimensions], dtype=np.float32)
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return reduced / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the k highest scores in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class QuantizedVectors:
+    """
+    Compressed in-memory copy of L2-normalized vectors for exact in-process search
+    float16 halves the footprint with practically no change in ranking; int8
+    (symmetric, one scale per vector) quarters it. Candidates are ranked on the
+    compressed codes, then the best rescore_factor * k of them are rescored
+    against the full-precision vectors (typically a memory-mapped file that
+    stays on disk), so the final scores are exact.
+    """
+
+    def __init__(self, matrix: np.ndarray, mode: str = 'int8', full_precision: Optional[np.ndarray] = None):
+        """
+        matrix:         (n, dimensions) float vectors
+        full_precision: float32 vectors used for rescoring; without them compressed
+                        modes return approximate scores
+        """
+        self.mode = normalize_mode(mode)
+        matrix = np.asarray(matrix, dtype=np.float32)
+        self.scales: Optional[np.ndarray] = None
+        if self.mode == 'float32':
+            self.codes = matrix
+        elif self.mode == 'float16':
+            self.codes = matrix.astype(np.float16)
+        else:
+            scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.empty(0, dtype=np.float32)
+            scales[scales == 0] = 1.0
+            self.codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+        self.full_precision = full_precision
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the compressed codes (the full-precision copy is not counted)"""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, queries: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Approximate cosine scores of every stored vector, shape (n_queries, n)
+        Rows where the boolean mask is False score -inf.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.mode == 'float32':
+            out = queries @ self.codes.T
+        else:
+            out = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+            for start in range(0, len(self.codes), _SCORE_BLOCK_ROWS):
+                block = self.codes[start:start + _SCORE_BLOCK_ROWS].astype(np.float32)
+                block_scores = queries @ block.T
+                if self.scales is not None:
+                    block_scores *= self.scales[start:start + _SCORE_BLOCK_ROWS]
+                out[:, start:start + len(block)] = block_scores
+        if mask is not None:
+            out[:, ~mask] = -np.inf
+        return out
+
+    def search(self, queries: np.ndarray, k: int, rescore_factor: int = 4,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top k per query as (indices, scores), best first
+        With full-precision vectors available, rescore_factor * k candidates
+        are rescored exactly; rescore_factor <= 1 returns the approximate ranking.
+        Rows excluded by the mask score -inf; they only appear, and should be
+        dropped by the caller, when fewer than k rows match.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        if self.mode == 'float32' or self.full_precision is None or rescore_factor <= 1:
+            return top_k(self.scores(queries, mask), k)
+
+        candidates, _ = top_k(self.scores(queries, mask), k * rescore_factor)
+        indices = np.empty((len(queries), min(k, candidates.shape[1])), dtype=np.int64)
+        scores = np.empty(indices.shape, dtype=np.float32)
+        for row, (query, rows) in enumerate(zip(queries, candidates)):
+            # Sorted row order keeps reads from a memory-mapped file sequential
+            rows = np.sort(rows)
+            exact = np.asarray(self.full_precision[rows], dtype=np.float32) @ query
+            if mask is not None:
+                exact[~mask[rows]] = -np.inf
+            best, best_scores = top_k(exact[None, :], k)
+            indices[row] = rows[best[0]]
+            scores[row] = best_scores[0]
+        return indices, scores
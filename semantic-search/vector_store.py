@@ -0,0 +1,123 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+VECTOR_STORES = ('chroma', 'numpy')
+
+# Tunable HNSW parameters, as named in Config and in Chroma's legacy "hnsw:*" collection metadata
+HNSW_PARAMS = ('M', 'construction_ef', 'search_ef')
+
+
+class VectorStore(ABC):
+    """
+    Backend holding the vector collections, one per shard
+    Collections implement the part of Chroma's collection API the engine uses:
+    count(), metadata, upsert(), update(), delete(), get() and query() with
+    Chroma where clauses and cosine distances, so Chroma's own collections
+    are used as they are.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        """Open a collection, creating it with metadata when it does not exist"""
+
+    @abstractmethod
+    def create_collection(self, name: str, metadata: Optional[Dict] = None):
+        """Create a collection; raises ValueError when it already exists"""
+
+    @abstractmethod
+    def delete_collection(self, name: str):
+        """Drop a collection; raises ValueError when it does not exist"""
+
+    @abstractmethod
+    def get_max_batch_size(self) -> int:
+        """Most rows a single write call accepts"""
+
+    def flush(self, collection):
+        """Persist writes the store buffers in memory (stores that write through do nothing)"""
+
+    def configure_search(self, collection, search_ef: Optional[int]):
+        """Apply query-time index parameters (stores searching exactly ignore them)"""
+
+    def index_params(self, collection) -> Optional[Dict]:
+        """{'M', 'construction_ef', 'search_ef'} of the collection's HNSW index, None for exact stores"""
+        return None
+
+
+class ChromaVectorStore(VectorStore):
+    """Chroma PersistentClient: HNSW index with metadata in SQLite, every write is durable"""
+
+    name = 'chroma'
+
+    def __init__(self, path: str):
+        # Deferred: importing chromadb alone takes most of a second
+        try:
+            import chromadb
+            from chromadb.config import Settings
+        except ImportError:
+            raise ImportError("chromadb 模块未安装，请运行: pip install chromadb")
+
+        # Create ChromaDB client with persistent storage
+        self.client = chromadb.PersistentClient(
+            path=path,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None):
+        return self.client.get_or_create_collection(name=name, metadata=metadata)
+
+    def create_collection(self, name: str, metadata: Optional[Dict] = None):
+        return self.client.create_collection(name=name, metadata=metadata)
+
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name)
+
+    def get_max_batch_size(self) -> int:
+        return self.client.get_max_batch_size()
+
+    def configure_search(self, collection, search_ef: Optional[int]):
+        # Persisted in the collection configuration; a process only picks it up
+        # if it is changed before the collection's index is loaded by a query
+        if search_ef and (self.index_params(collection) or {}).get('search_ef') != search_ef:
+            collection.modify(configuration={'hnsw': {'ef_search': search_ef}})
+
+    def index_params(self, collection) -> Optional[Dict]:
+        hnsw = (getattr(collection, 'configuration', None) or {}).get('hnsw')
+        if hnsw:
+            return {'M': hnsw.get('max_neighbors'), 'construction_ef': hnsw.get('ef_construction'),
+                    'search_ef': hnsw.get('ef_search')}
+        # Older clients only know the legacy metadata keys
+        metadata = collection.metadata or {}
+        return {name: metadata.get(f'hnsw:{name}') for name in HNSW_PARAMS}
+
+
+
+# One store per backend and path, shared by every collection (shard) in the process;
+# chromadb can't construct two clients for the same path concurrently
+_stores: Dict[Tuple[str, str], VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_vector_store(config) -> VectorStore:
+    """The store selected by Config.VECTOR_STORE, at Config.CHROMA_DB_PATH"""
+    backend = (config.VECTOR_STORE or 'chroma').lower()
+    if backend not in VECTOR_STORES:
+        raise ValueError(f"未知的向量存储: {config.VECTOR_STORE} (可选: {', '.join(VECTOR_STORES)})")
+
+    key = (backend, config.CHROMA_DB_PATH)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if backend == 'chroma':
+                store = ChromaVectorStore(config.CHROMA_DB_PATH)
+            else:
+                from numpy_vector_store import NumpyVectorStore
+                store = NumpyVectorStore(config.CHROMA_DB_PATH, quantization=config.VECTOR_QUANTIZATION,
+                                         rescore_factor=config.VECTOR_RESCORE_FACTOR)
+            _stores[key] = store
+        return store